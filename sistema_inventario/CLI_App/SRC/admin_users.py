@@ -41,16 +41,14 @@ def listar_usuarios(db):
     input("\nPresione Enter para volver...")
 
 def crear_usuario(db):
-    usuarios = db.leer_datos()
     print("\n--- NUEVO USUARIO ---")
     nuevo_user = input("Username: ").strip()
     
     # Validación: No duplicados
-    for u in usuarios:
-        if u['username'] == nuevo_user:
-            print("¡Error! Ese usuario ya existe.")
-            input("Enter para continuar...")
-            return
+    if db.existe(nuevo_user):
+        print("¡Error! Ese usuario ya existe.")
+        input("Enter para continuar...")
+        return
 
     nuevo_pass = input("Password: ").strip()
     rol = input("Rol (admin/user): ").strip().lower()
@@ -60,43 +58,43 @@ def crear_usuario(db):
         rol = 'user'
 
     nuevo_id = 1
-    if usuarios:
-        nuevo_id = usuarios[-1]['id'] + 1
+    ultimo = db.ultimo()
+    if ultimo:
+        nuevo_id = ultimo['id'] + 1
 
-    usuarios.append({
-        "id": nuevo_id,
-        "username": nuevo_user,
-        "password": nuevo_pass,
-        "rol": rol
-    })
-    
-    if db.guardar_datos(usuarios):
+    try:
+        creado = db.insertar({
+            "id": nuevo_id,
+            "username": nuevo_user,
+            "password": nuevo_pass,
+            "rol": rol
+        })
+    except ValueError:
+        # Otra terminal lo creó mientras tanto
+        print("¡Error! Ese usuario ya existe.")
+        creado = False
+    if creado:
         print("Usuario creado exitosamente.")
     input("Enter para continuar...")
 
 def editar_usuario(db):
-    usuarios = db.leer_datos()
     print("\n--- CAMBIAR CONTRASEÑA ---")
     target_user = input("Ingrese el Username a editar: ")
     
-    usuario_encontrado = None
-    for u in usuarios:
-        if u['username'] == target_user:
-            usuario_encontrado = u
-            break
-            
+    usuario_encontrado = db.get(target_user)
     if not usuario_encontrado:
         print("Usuario no encontrado.")
     else:
         nueva_pass = input(f"Nueva contraseña para {target_user}: ")
-        usuario_encontrado['password'] = nueva_pass
-        db.guardar_datos(usuarios)
-        print("Contraseña actualizada.")
+        try:
+            if db.actualizar(target_user, lambda u: u.update(password=nueva_pass)):
+                print("Contraseña actualizada.")
+        except ValueError as e:
+            print(f"¡Error! {e}")
         
     input("Enter para continuar...")
 
 def eliminar_usuario(db, usuario_actual):
-    usuarios = db.leer_datos()
     print("\n--- ELIMINAR USUARIO ---")
     target_user = input("Ingrese el Username a eliminar: ")
     
@@ -106,16 +104,12 @@ def eliminar_usuario(db, usuario_actual):
         input("Enter para continuar...")
         return
 
-    # Filtramos la lista para quitar al usuario (List Comprehension)
-    # Esto crea una lista nueva SIN el usuario que queremos borrar
-    lista_nueva = [u for u in usuarios if u['username'] != target_user]
-    
-    if len(lista_nueva) == len(usuarios):
+    if not db.existe(target_user):
         print("Usuario no encontrado.")
     else:
         confirmacion = input(f"¿Seguro que desea eliminar a '{target_user}'? (s/n): ")
         if confirmacion.lower() == 's':
-            db.guardar_datos(lista_nueva)
+            db.delete(target_user)
             print("Usuario eliminado.")
         else:
             print("Operación cancelada.")
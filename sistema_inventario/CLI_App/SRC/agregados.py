@@ -0,0 +1,158 @@
+"""
+Totales del inventario mantenidos al día con cada cambio.
+
+En vez de recorrer todo el catálogo cada vez que se abre un reporte, se
+guardan las unidades, el valor (precio * cantidad), los subtotales por
+categoría y los productos con stock bajo. Se actualizan como
+observador de TablaIndexada y se escriben junto al archivo de datos
+('productos.json.agregados') con la firma de los archivos de los que salieron,
+así otro proceso puede leerlos sin cargar el catálogo si nada cambió.
+Se escriben cuando el archivo de datos se escribe entero (modo JSON,
+compactación del journal) y al cerrar el programa, no en cada cambio.
+"""
+import json
+import math
+import os
+
+STOCK_MINIMO = 5
+
+# Diferencia de valor que se tolera al verificar (sumas de float en otro orden)
+TOLERANCIA_VALOR = 0.005
+
+
+class AgregadosInventario:
+
+    def __init__(self, stock_minimo=STOCK_MINIMO):
+        self.stock_minimo = stock_minimo
+        self.productos = 0
+        self.unidades = 0
+        self.valor = 0.0
+        self.por_categoria = {}  # {categoria: {"productos", "unidades", "valor"}}
+        self.stock_bajo = {}  # {sku: {"sku", "nombre", "cantidad"}}, lo que muestra el reporte
+
+    @classmethod
+    def desde_tabla(cls, tabla, stock_minimo=STOCK_MINIMO):
+        agregados = cls.desde_registros(tabla.registros.values(), stock_minimo)
+        tabla.observadores.append(agregados)
+        return agregados
+
+    @classmethod
+    def desde_registros(cls, registros, stock_minimo=STOCK_MINIMO):
+        """Cálculo completo, de cero (también lo usa la verificación)."""
+        agregados = cls(stock_minimo)
+        for registro in registros:
+            agregados._sumar(registro, 1)
+        return agregados
+
+    def _sumar(self, registro, signo):
+        cantidad = registro.get("cantidad", 0)
+        valor = registro.get("precio", 0) * cantidad
+        self.productos += signo
+        self.unidades += signo * cantidad
+        self.valor += signo * valor
+
+        categoria = registro.get("categoria")
+        subtotal = self.por_categoria.setdefault(categoria, {"productos": 0, "unidades": 0, "valor": 0.0})
+        subtotal["productos"] += signo
+        subtotal["unidades"] += signo * cantidad
+        subtotal["valor"] += signo * valor
+        if subtotal["productos"] == 0:
+            del self.por_categoria[categoria]
+
+        if cantidad < self.stock_minimo:
+            if signo > 0:
+                self.stock_bajo[registro["sku"]] = {
+                    "sku": registro["sku"], "nombre": registro.get("nombre"), "cantidad": cantidad}
+            else:
+                self.stock_bajo.pop(registro["sku"], None)
+
+    def al_upsert(self, clave, anterior, nuevo):
+        if anterior is not None:
+            self._sumar(anterior, -1)
+        self._sumar(nuevo, 1)
+
+    def al_eliminar(self, clave, anterior):
+        self._sumar(anterior, -1)
+
+    def a_dict(self):
+        return {
+            "stock_minimo": self.stock_minimo,
+            "productos": self.productos,
+            "unidades": self.unidades,
+            "valor": self.valor,
+            "por_categoria": self.por_categoria,
+            "stock_bajo": self.stock_bajo,
+        }
+
+    @classmethod
+    def desde_dict(cls, datos):
+        agregados = cls(datos["stock_minimo"])
+        agregados.productos = datos["productos"]
+        agregados.unidades = datos["unidades"]
+        agregados.valor = datos["valor"]
+        agregados.por_categoria = datos["por_categoria"]
+        agregados.stock_bajo = {sku: {"sku": sku, "nombre": nombre, "cantidad": cantidad}
+                                for sku, nombre, cantidad in datos["stock_bajo"]}
+        return agregados
+
+    def diferencias(self, otro):
+        """
+        Lista de textos describiendo en qué difiere de 'otro' (vacía si
+        coinciden). Se usa para comparar lo mantenido contra un recálculo.
+        """
+        diferencias = []
+        for campo in ("productos", "unidades"):
+            if getattr(self, campo) != getattr(otro, campo):
+                diferencias.append(f"{campo}: {getattr(self, campo)} != {getattr(otro, campo)}")
+        if not math.isclose(self.valor, otro.valor, abs_tol=TOLERANCIA_VALOR):
+            diferencias.append(f"valor: {self.valor:.2f} != {otro.valor:.2f}")
+
+        for categoria in sorted(set(self.por_categoria) | set(otro.por_categoria), key=str):
+            a = self.por_categoria.get(categoria)
+            b = otro.por_categoria.get(categoria)
+            if (a is None or b is None or a["productos"] != b["productos"] or a["unidades"] != b["unidades"]
+                    or not math.isclose(a["valor"], b["valor"], abs_tol=TOLERANCIA_VALOR)):
+                diferencias.append(f"categoría {categoria}: {a} != {b}")
+
+        if self.stock_bajo != otro.stock_bajo:
+            sobran = set(self.stock_bajo) - set(otro.stock_bajo)
+            faltan = set(otro.stock_bajo) - set(self.stock_bajo)
+            distintos = [s for s in set(self.stock_bajo) & set(otro.stock_bajo)
+                         if self.stock_bajo[s] != otro.stock_bajo[s]]
+            diferencias.append(f"stock bajo: sobran {sorted(sobran)}, faltan {sorted(faltan)}, "
+                               f"desactualizados {sorted(distintos)}")
+        return diferencias
+
+
+def ruta_agregados(ruta_datos):
+    return ruta_datos + ".agregados"
+
+
+def guardar_agregados(ruta, agregados, firma):
+    """
+    Barato: json.dumps (el codificador en C) y sin fsync. Si se pierde o
+    queda viejo no pasa nada: la firma no coincide y se recalcula.
+    """
+    datos = agregados.a_dict()
+    datos["stock_bajo"] = [[p["sku"], p["nombre"], p["cantidad"]] for p in agregados.stock_bajo.values()]
+    datos["firma"] = firma
+    with open(ruta + ".tmp", 'w', encoding='utf-8') as archivo:
+        archivo.write(json.dumps(datos, ensure_ascii=False, separators=(",", ":")))
+    os.replace(ruta + ".tmp", ruta)
+
+
+def leer_agregados(ruta, firma):
+    """Agregados guardados si fueron calculados sobre exactamente estos archivos; si no, None."""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as archivo:
+            datos = json.load(archivo)
+    except (FileNotFoundError, ValueError):
+        return None
+    # JSON no tiene tuplas: la firma vuelve como listas
+    guardada = tuple(tuple(f) if f is not None else None for f in datos.get("firma", ()))
+    if guardada != firma:
+        return None
+    try:
+        return AgregadosInventario.desde_dict(datos)
+    except (KeyError, ValueError, TypeError):
+        return None
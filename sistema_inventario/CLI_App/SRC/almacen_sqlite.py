@@ -0,0 +1,260 @@
+"""
+Almacenamiento en una base SQLite embebida (data/inventario.db).
+
+Cada archivo lógico (productos.json, usuarios.json) es una tabla con sus
+columnas, clave primaria e índices. Los campos que no están en el esquema
+se guardan en la columna 'extra' (JSON), así no se pierde nada.
+Cada escritura (un upsert, un delete o un lote entero) es una transacción:
+o se aplica completa o no se aplica.
+
+Migración:
+    python almacen_sqlite.py migrar     # productos.json/usuarios.json -> inventario.db
+    python almacen_sqlite.py exportar   # inventario.db -> productos.json/usuarios.json
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from almacenes import AlmacenJSON, AlmacenJournal, escribir_atomico
+from concurrencia import bloqueo_exclusivo, ruta_bloqueo
+
+NOMBRE_BASE = "inventario.db"
+
+# {archivo lógico: (tabla, [(columna, tipo)], clave, [columnas con índice])}
+ESQUEMAS = {
+    "productos.json": (
+        "productos",
+        [("sku", "TEXT NOT NULL"), ("nombre", "TEXT"), ("categoria", "TEXT"),
+         ("precio", "REAL"), ("cantidad", "INTEGER")],
+        "sku",
+        ["categoria", "nombre"],
+    ),
+    "usuarios.json": (
+        "usuarios",
+        [("id", "INTEGER"), ("username", "TEXT NOT NULL"), ("password", "TEXT"), ("rol", "TEXT")],
+        "username",
+        ["id"],
+    ),
+}
+
+# Una conexión por base y por proceso, compartida por todos los GestorDatos
+_conexiones = {}
+_lock_conexiones = threading.Lock()
+
+
+def conectar(ruta_db):
+    with _lock_conexiones:
+        conexion = _conexiones.get(ruta_db)
+        if conexion is None:
+            conexion = sqlite3.connect(ruta_db, isolation_level=None, check_same_thread=False)
+            # Modo de journal clásico: la base es un solo archivo y cada commit
+            # la modifica, así la firma de archivos de GestorDatos detecta cambios.
+            conexion.execute("PRAGMA journal_mode=DELETE")
+            conexion.execute("PRAGMA synchronous=FULL")
+            conexion.execute("PRAGMA busy_timeout=5000")
+            _conexiones[ruta_db] = conexion
+        return conexion
+
+
+def crear_tabla(conexion, nombre_archivo):
+    tabla, columnas, clave, indices = ESQUEMAS[nombre_archivo]
+    definicion = ", ".join(f"{c} {t}" for c, t in columnas)
+    conexion.execute(f"CREATE TABLE IF NOT EXISTS {tabla} ({definicion}, extra TEXT, PRIMARY KEY ({clave}))")
+    for columna in indices:
+        conexion.execute(f"CREATE INDEX IF NOT EXISTS idx_{tabla}_{columna} ON {tabla} ({columna})")
+
+
+def copiar_base(origen, destino):
+    """Copia consistente de una base abierta (API de backup de SQLite)."""
+    fuente = sqlite3.connect(origen)
+    copia = sqlite3.connect(destino)
+    try:
+        fuente.backup(copia)
+    finally:
+        copia.close()
+        fuente.close()
+
+
+class AlmacenSQLite:
+    """Misma interfaz que AlmacenJSON/AlmacenJournal, sobre una tabla SQLite."""
+
+    def __init__(self, ruta_db, nombre_archivo):
+        if nombre_archivo not in ESQUEMAS:
+            raise ValueError(f"{nombre_archivo} no tiene esquema SQLite definido")
+        self.ruta = ruta_db
+        self.tabla, columnas, self.clave, _ = ESQUEMAS[nombre_archivo]
+        self.columnas = [c for c, _ in columnas]
+        self.conexion = conectar(ruta_db)
+        with _lock_conexiones:
+            crear_tabla(self.conexion, nombre_archivo)
+
+        lista = ", ".join(self.columnas)
+        marcas = ", ".join("?" for _ in range(len(self.columnas) + 1))
+        actualizar = ", ".join(f"{c} = excluded.{c}" for c in self.columnas if c != self.clave)
+        self._sql_select = f"SELECT {lista}, extra FROM {self.tabla} ORDER BY rowid"
+        # ON CONFLICT ... DO UPDATE conserva el rowid: el orden no cambia al editar
+        self._sql_upsert = (f"INSERT INTO {self.tabla} ({lista}, extra) VALUES ({marcas}) "
+                            f"ON CONFLICT ({self.clave}) DO UPDATE SET {actualizar}, extra = excluded.extra")
+        self._sql_delete = f"DELETE FROM {self.tabla} WHERE {self.clave} = ?"
+
+    def archivos(self):
+        return [self.ruta]
+
+    def firma(self):
+        """
+        Además de inodo/tamaño/mtime se usa el contador de cambios que SQLite
+        guarda en la cabecera (bytes 24-27) y sube con cada commit: un commit
+        que no cambia el tamaño del archivo igual cambia la firma.
+        """
+        try:
+            st = os.stat(self.ruta)
+            with open(self.ruta, 'rb') as base:
+                base.seek(24)
+                contador = int.from_bytes(base.read(4), "big")
+        except FileNotFoundError:
+            return (None,)
+        return ((st.st_ino, st.st_size, st.st_mtime_ns, contador),)
+
+    def _a_fila(self, registro):
+        if registro.get(self.clave) is None:
+            raise ValueError(f"Registro sin campo '{self.clave}'")
+        extra = {k: v for k, v in registro.items() if k not in self.columnas}
+        return [registro.get(c) for c in self.columnas] + [json.dumps(extra, ensure_ascii=False) if extra else None]
+
+    def _a_registro(self, fila):
+        registro = {c: v for c, v in zip(self.columnas, fila) if v is not None or c == self.clave}
+        if fila[-1]:
+            registro.update(json.loads(fila[-1]))
+        return registro
+
+    def _transaccion(self, operaciones):
+        """Ejecuta [(sql, parametros), ...] en una sola transacción."""
+        with _lock_conexiones:
+            self.conexion.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, parametros in operaciones:
+                    self.conexion.execute(sql, parametros)
+                self.conexion.execute("COMMIT")
+            except BaseException:
+                self.conexion.execute("ROLLBACK")
+                raise
+
+    def cargar(self):
+        with _lock_conexiones:
+            filas = self.conexion.execute(self._sql_select).fetchall()
+        return [self._a_registro(f) for f in filas]
+
+    def iterar(self):
+        """
+        Registros de a uno con un cursor propio (conexión de solo lectura),
+        así un recorrido largo no frena las escrituras de este proceso.
+        """
+        if not os.path.exists(self.ruta):
+            return
+        conexion = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True)
+        try:
+            cursor = conexion.execute(self._sql_select)
+            while True:
+                filas = cursor.fetchmany(1000)
+                if not filas:
+                    return
+                for fila in filas:
+                    yield self._a_registro(fila)
+        finally:
+            conexion.close()
+
+    def guardar(self, datos):
+        claves = [r.get(self.clave) for r in datos]
+        if len(set(claves)) != len(claves):
+            raise ValueError(f"Hay registros con '{self.clave}' duplicado")
+        operaciones = [(f"DELETE FROM {self.tabla}", ())]
+        operaciones += [(self._sql_upsert, self._a_fila(r)) for r in datos]
+        self._transaccion(operaciones)
+
+    def aplicar(self, cambios, registros):
+        """Aplica solo los registros que cambiaron, todos en una transacción."""
+        operaciones = []
+        for cambio in cambios:
+            if cambio["op"] == "upsert":
+                operaciones.append((self._sql_upsert, self._a_fila(cambio["datos"])))
+            else:
+                operaciones.append((self._sql_delete, (cambio["clave"],)))
+        self._transaccion(operaciones)
+
+
+# --- Migración desde/hacia JSON ---
+
+def almacen_json(carpeta_data, nombre):
+    """El almacén JSON de ese archivo, con journal si tiene un .wal pendiente."""
+    ruta = os.path.join(carpeta_data, nombre)
+    if os.path.exists(ruta + ".wal"):
+        return AlmacenJournal(ruta, ESQUEMAS[nombre][2])
+    return AlmacenJSON(ruta)
+
+
+def migrar_desde_json(carpeta_data, ruta_db=None):
+    """
+    Copia productos.json y usuarios.json a la base (reemplaza lo que hubiera
+    en sus tablas). Los JSON no se tocan. Devuelve {archivo: registros}.
+    """
+    ruta_db = ruta_db or os.path.join(carpeta_data, NOMBRE_BASE)
+    resumen = {}
+    for nombre in ESQUEMAS:
+        if not os.path.exists(os.path.join(carpeta_data, nombre)):
+            continue
+        datos = almacen_json(carpeta_data, nombre).cargar()
+        AlmacenSQLite(ruta_db, nombre).guardar(datos)
+        resumen[nombre] = len(datos)
+    return resumen
+
+
+def exportar_a_json(carpeta_data, ruta_db=None):
+    """
+    Escribe cada tabla de la base como su archivo JSON (formato clásico).
+    Se hace con el bloqueo de cada archivo tomado y subiendo su versión,
+    así los procesos que trabajan sobre los JSON recargan.
+    """
+    ruta_db = ruta_db or os.path.join(carpeta_data, NOMBRE_BASE)
+    if not os.path.exists(ruta_db):
+        raise FileNotFoundError(f"No existe la base {ruta_db}")
+    resumen = {}
+    for nombre in ESQUEMAS:
+        datos = AlmacenSQLite(ruta_db, nombre).cargar()
+        ruta = os.path.join(carpeta_data, nombre)
+        with bloqueo_exclusivo(ruta_bloqueo(ruta)) as bloqueo:
+            escribir_atomico(ruta, datos)
+            # Un .wal viejo se aplicaría encima del JSON recién exportado
+            if os.path.exists(ruta + ".wal"):
+                os.remove(ruta + ".wal")
+            bloqueo.incrementar()
+        resumen[nombre] = len(datos)
+    return resumen
+
+
+def main(argv=None):
+    from logger import ruta_carpeta_data
+    parser = argparse.ArgumentParser(description="Migración entre los archivos JSON y la base SQLite")
+    parser.add_argument("accion", choices=["migrar", "exportar"])
+    parser.add_argument("--data", default=ruta_carpeta_data(), help="Carpeta de datos")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.accion == "migrar":
+            resumen = migrar_desde_json(args.data)
+            print("Migrado a SQLite:")
+        else:
+            resumen = exportar_a_json(args.data)
+            print("Exportado a JSON:")
+    except (OSError, ValueError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        return 1
+    for nombre, cantidad in resumen.items():
+        print(f"  {nombre}: {cantidad} registros")
+    if args.accion == "migrar":
+        print("Use INVENTARIO_BACKEND=sqlite para trabajar sobre la base.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
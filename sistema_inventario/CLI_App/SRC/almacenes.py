@@ -0,0 +1,342 @@
+import json
+import os
+import re
+from formatos import MAGIA, codificar, decodificar
+
+# Tamaño del log (en bytes) a partir del cual se compacta en un snapshot nuevo.
+UMBRAL_COMPACTACION = 1024 * 1024
+
+
+def escribir_atomico(ruta, datos, formato="json"):
+    """
+    Escribe la lista en un archivo temporal y lo renombra encima del original.
+    Si el programa se cae a mitad de escritura, el archivo viejo sigue intacto.
+    'formato' es uno de formatos.CODECS (por defecto JSON legible).
+    """
+    contenido = codificar(datos, formato)
+    ruta_tmp = ruta + ".tmp"
+    with open(ruta_tmp, 'wb') as archivo:
+        archivo.write(contenido)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+    os.replace(ruta_tmp, ruta)
+
+
+def firma_archivos(rutas):
+    """(inodo, tamaño, mtime) de cada archivo; None si no existe."""
+    firma = []
+    for ruta in rutas:
+        try:
+            st = os.stat(ruta)
+            firma.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            firma.append(None)
+    return tuple(firma)
+
+
+def leer_json(ruta):
+    """
+    Lee una lista desde un archivo de datos (JSON o binario, se detecta
+    solo). Si no existe o es un JSON vacío, lista vacía.
+    """
+    if not os.path.exists(ruta):
+        return []
+    with open(ruta, 'rb') as archivo:
+        contenido = archivo.read()
+    try:
+        return decodificar(contenido)
+    except json.JSONDecodeError:
+        return []
+
+
+def es_binario(ruta):
+    try:
+        with open(ruta, 'rb') as archivo:
+            return archivo.read(len(MAGIA)) == MAGIA
+    except FileNotFoundError:
+        return False
+
+
+def iterar_archivo(ruta):
+    """
+    Registros de a uno. El JSON se lee de a bloques (iterar_json); los
+    formatos binarios no se pueden recorrer por partes y se cargan enteros.
+    """
+    if es_binario(ruta):
+        return iter(leer_json(ruta))
+    return iterar_json(ruta)
+
+
+_ESPACIOS = re.compile(r"[ \t\r\n]*")
+
+
+def iterar_json(ruta, tamano_bloque=64 * 1024):
+    """
+    Recorre un archivo con una lista JSON devolviendo un elemento a la vez.
+    Lee de a 'tamano_bloque' caracteres y decodifica cada elemento apenas
+    está completo, así que la memoria usada depende del tamaño de un
+    registro y no del archivo. Si se corta el recorrido, el archivo se cierra.
+    """
+    if not os.path.exists(ruta):
+        return
+    decodificador = json.JSONDecoder()
+    with open(ruta, 'r', encoding='utf-8') as archivo:
+        buffer = ""
+        pos = 0
+        fin_archivo = False
+        empezado = False
+        tras_elemento = False  # después de un elemento solo puede venir ',' o ']'
+
+        while True:
+            pos = _ESPACIOS.match(buffer, pos).end()
+            if pos >= len(buffer) or (not fin_archivo and len(buffer) - pos < tamano_bloque // 2):
+                if not fin_archivo:
+                    bloque = archivo.read(tamano_bloque)
+                    fin_archivo = not bloque
+                    buffer = buffer[pos:] + bloque
+                    pos = 0
+                    continue
+                if pos >= len(buffer):
+                    if empezado:
+                        raise ValueError(f"{ruta}: la lista JSON no está cerrada")
+                    return  # archivo vacío
+
+            caracter = buffer[pos]
+            if not empezado:
+                if caracter != "[":
+                    raise ValueError(f"{ruta}: se esperaba una lista JSON")
+                empezado = True
+                pos += 1
+                continue
+            if caracter == "]":
+                return
+            if caracter == ",":
+                tras_elemento = False
+                pos = _ESPACIOS.match(buffer, pos + 1).end()
+                if pos >= len(buffer):
+                    continue
+            elif tras_elemento:
+                raise ValueError(f"{ruta}: falta una coma entre elementos")
+            try:
+                elemento, fin = decodificador.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if fin_archivo:
+                    raise
+                # El elemento sigue en el próximo bloque
+                bloque = archivo.read(tamano_bloque)
+                fin_archivo = not bloque
+                buffer = buffer[pos:] + bloque
+                pos = 0
+                continue
+            pos = fin
+            tras_elemento = True
+            yield elemento
+
+
+class AlmacenJSON:
+    """
+    Modo clásico: todo el catálogo vive en un único archivo JSON.
+
+    Si una sesión en modo journal dejó cambios en '<archivo>.wal', se leen
+    igual (snapshot + log) y, antes de la primera escritura, se vuelcan al
+    snapshot y el log queda vacío. Si no, esos cambios se perderían acá y el
+    log viejo se aplicaría después encima de datos más nuevos. Para eso hace
+    falta la clave primaria; sin ella el .wal no se mira.
+    """
+
+    def __init__(self, ruta, formato="json", clave=None):
+        self.ruta = ruta
+        self.formato = formato
+        self.clave = clave
+        self.ruta_log = ruta + ".wal"
+
+    def archivos(self):
+        """Archivos que forman el estado guardado (para validar la caché)."""
+        return [self.ruta, self.ruta_log] if self.clave else [self.ruta]
+
+    def firma(self):
+        """Cambia con cada escritura; GestorDatos la usa para validar su caché."""
+        return firma_archivos(self.archivos())
+
+    def _journal_pendiente(self):
+        """AlmacenJournal si quedó un .wal con cambios; si no, None."""
+        if self.clave and os.path.exists(self.ruta_log) and os.path.getsize(self.ruta_log) > 0:
+            return AlmacenJournal(self.ruta, self.clave, formato=self.formato)
+        return None
+
+    def _volcar_log(self):
+        # Primero el snapshot con el log aplicado y el log vacío (como al
+        # compactar): si se corta acá, no queda un log viejo frente a datos nuevos
+        journal = self._journal_pendiente()
+        if journal is not None:
+            journal.compactar()
+
+    def cargar(self):
+        journal = self._journal_pendiente()
+        return journal.cargar() if journal is not None else leer_json(self.ruta)
+
+    def iterar(self):
+        """Registros de a uno, leídos del disco sin cargar la lista entera."""
+        journal = self._journal_pendiente()
+        return journal.iterar() if journal is not None else iterar_archivo(self.ruta)
+
+    def guardar(self, datos):
+        self._volcar_log()
+        escribir_atomico(self.ruta, datos, self.formato)
+
+    def aplicar(self, cambios, registros):
+        """Un archivo JSON plano no admite cambios parciales: se reescribe entero."""
+        registros = list(registros)
+        self._volcar_log()
+        escribir_atomico(self.ruta, registros, self.formato)
+
+
+class AlmacenJournal:
+    """
+    Modo journal: el archivo JSON es un snapshot y los cambios se agregan
+    como registros pequeños (JSON Lines) en '<archivo>.wal'.
+
+    - cargar():  snapshot + replay del log.
+    - guardar(): compara contra el último estado conocido y solo agrega al
+      log los registros que cambiaron o se borraron.
+    - compactar(): vuelca el estado en un snapshot nuevo y vacía el log.
+      Se hace solo cuando el log supera UMBRAL_COMPACTACION.
+    """
+
+    def __init__(self, ruta, clave, umbral_compactacion=UMBRAL_COMPACTACION, formato="json"):
+        self.ruta = ruta
+        self.formato = formato
+        self.ruta_log = ruta + ".wal"
+        self.clave = clave
+        self.umbral_compactacion = umbral_compactacion
+        # Último estado leído o escrito: {clave: registro}
+        self._base = None
+
+    def archivos(self):
+        return [self.ruta, self.ruta_log]
+
+    def firma(self):
+        return firma_archivos(self.archivos())
+
+    def _reproducir(self):
+        """Carga el snapshot y le aplica, en orden, cada registro del log."""
+        registros = {}
+        for registro in leer_json(self.ruta):
+            registros[registro[self.clave]] = registro
+
+        if os.path.exists(self.ruta_log):
+            with open(self.ruta_log, 'r', encoding='utf-8') as log:
+                for linea in log:
+                    try:
+                        cambio = json.loads(linea)
+                    except json.JSONDecodeError:
+                        # Última línea a medio escribir (corte de luz, etc.)
+                        break
+                    if cambio["op"] == "upsert":
+                        registros[cambio["clave"]] = cambio["datos"]
+                    elif cambio["op"] == "delete":
+                        registros.pop(cambio["clave"], None)
+        return registros
+
+    def cargar(self):
+        self._base = self._reproducir()
+        # Copias, para que los cambios que haga el llamador no toquen la base
+        return [dict(r) for r in self._base.values()]
+
+    def iterar(self):
+        """
+        Como cargar(), pero de a un registro: se recorre el snapshot y se le
+        superponen los cambios del log (que es chico: se compacta al pasar
+        el umbral). Los registros nuevos del log salen al final; el orden solo
+        difiere del de cargar() si un registro se borró y se volvió a crear.
+        """
+        cambios = {}
+        if os.path.exists(self.ruta_log):
+            with open(self.ruta_log, 'r', encoding='utf-8') as log:
+                for linea in log:
+                    try:
+                        cambio = json.loads(linea)
+                    except json.JSONDecodeError:
+                        break
+                    if cambio["op"] == "delete":
+                        cambios[cambio["clave"]] = None
+                    else:
+                        cambios[cambio["clave"]] = cambio["datos"]
+
+        for registro in iterar_archivo(self.ruta):
+            clave = registro[self.clave]
+            if clave in cambios:
+                registro = cambios.pop(clave)
+                if registro is None:
+                    continue
+            yield registro
+        for registro in cambios.values():
+            if registro is not None:
+                yield registro
+
+    def _calcular_cambios(self, nuevos):
+        """Devuelve los registros del log necesarios para pasar de la base a 'nuevos'."""
+        base = self._base if self._base is not None else self._reproducir()
+        cambios = []
+        for clave, registro in nuevos.items():
+            if base.get(clave) != registro:
+                cambios.append({"op": "upsert", "clave": clave, "datos": registro})
+        for clave in base:
+            if clave not in nuevos:
+                cambios.append({"op": "delete", "clave": clave})
+        return cambios
+
+    def agregar_al_log(self, cambios):
+        """Agrega los cambios al log con una sola escritura y un solo fsync."""
+        if not cambios:
+            return
+        lineas = "".join(json.dumps(c, ensure_ascii=False) + "\n" for c in cambios)
+        with open(self.ruta_log, 'a', encoding='utf-8') as log:
+            log.write(lineas)
+            log.flush()
+            os.fsync(log.fileno())
+
+    def guardar(self, datos):
+        nuevos = {}
+        for registro in datos:
+            if self.clave not in registro:
+                raise ValueError(f"Registro sin campo '{self.clave}'")
+            nuevos[registro[self.clave]] = dict(registro)
+        if len(nuevos) != len(datos):
+            raise ValueError(f"Hay registros con '{self.clave}' duplicado")
+
+        # Se compara contra lo que hay en disco: otro proceso pudo haber escrito
+        self._base = self._reproducir()
+        self.agregar_al_log(self._calcular_cambios(nuevos))
+        self._base = nuevos
+
+        if self.tamano_log() > self.umbral_compactacion:
+            self.compactar()
+
+    def aplicar(self, cambios, registros):
+        """Agrega al log cambios ya calculados (upsert/delete de un registro)."""
+        self.agregar_al_log(cambios)
+        if self._base is not None:
+            for cambio in cambios:
+                if cambio["op"] == "upsert":
+                    self._base[cambio["clave"]] = dict(cambio["datos"])
+                else:
+                    self._base.pop(cambio["clave"], None)
+
+        if self.tamano_log() > self.umbral_compactacion:
+            self.compactar()
+
+    def tamano_log(self):
+        if not os.path.exists(self.ruta_log):
+            return 0
+        return os.path.getsize(self.ruta_log)
+
+    def compactar(self):
+        """Escribe un snapshot con el estado actual y vacía el log."""
+        registros = self._reproducir()
+        escribir_atomico(self.ruta, list(registros.values()), self.formato)
+        # Si nos caemos justo aquí, volver a aplicar el log sobre el snapshot
+        # nuevo da el mismo resultado: cada registro trae el estado completo.
+        with open(self.ruta_log, 'w', encoding='utf-8'):
+            pass
+        self._base = registros
@@ -0,0 +1,161 @@
+"""
+Análisis de inventario en una sola pasada.
+
+Se recorre el catálogo una vez para pasarlo a columnas
+(registros.ColumnasInventario) y todo lo demás se calcula sobre esas
+columnas:
+- unidades y valor por categoría,
+- percentiles de precio y de stock,
+- los N productos de mayor valor (precio * cantidad),
+- cuántos productos están sin stock,
+- clasificación ABC: A son los productos que juntan el primer 80 % del
+  valor, B los que llevan hasta el 95 % y C el resto.
+
+Con NumPy instalado los cálculos son vectorizados (las columnas se leen
+sin copiar con numpy.frombuffer); si no, se usa Python puro con el mismo
+resultado.
+"""
+import heapq
+import math
+import operator
+
+from registros import ColumnasInventario
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+PERCENTILES = (10, 25, 50, 75, 90)
+TOP_N = 10
+UMBRALES_ABC = (0.80, 0.95)
+CLASES_ABC = ("A", "B", "C")
+
+
+def analizar_inventario(registros, top=TOP_N, umbrales_abc=UMBRALES_ABC, usar_numpy=None):
+    """
+    Recorre 'registros' una vez y devuelve el análisis completo (un dict).
+    usar_numpy=None usa NumPy si está instalado.
+    """
+    columnas = ColumnasInventario.desde_registros(registros)
+    if usar_numpy is None:
+        usar_numpy = numpy is not None
+    if usar_numpy and numpy is None:
+        raise ValueError("NumPy no está instalado")
+    calcular = _analizar_numpy if usar_numpy else _analizar_python
+    resultado = calcular(columnas, top, umbrales_abc)
+    resultado["motor"] = "numpy" if usar_numpy else "python"
+    return resultado
+
+
+def percentil(ordenados, q):
+    """Percentil q (0-100) de una lista ordenada, interpolando como numpy.percentile."""
+    if not ordenados:
+        return None
+    posicion = (len(ordenados) - 1) * q / 100
+    abajo = math.floor(posicion)
+    arriba = min(abajo + 1, len(ordenados) - 1)
+    return ordenados[abajo] + (ordenados[arriba] - ordenados[abajo]) * (posicion - abajo)
+
+
+def _resumen_abc(clases, valores, total):
+    """{clase: {"productos", "valor", "porcentaje_valor"}} a partir de la clase de cada producto."""
+    resumen = {clase: {"productos": 0, "valor": 0.0, "porcentaje_valor": 0.0} for clase in CLASES_ABC}
+    for clase, valor in zip(clases, valores):
+        resumen[CLASES_ABC[clase]]["productos"] += 1
+        resumen[CLASES_ABC[clase]]["valor"] += valor
+    for datos in resumen.values():
+        datos["porcentaje_valor"] = 100 * datos["valor"] / total if total else 0.0
+    return resumen
+
+
+def _top(columnas, indices, valores):
+    return [{"sku": columnas.skus[i], "nombre": columnas.nombres[i], "cantidad": columnas.cantidades[i],
+             "valor": valores[i]} for i in indices]
+
+
+def _analizar_python(columnas, top, umbrales_abc):
+    valores = list(map(operator.mul, columnas.precios, columnas.cantidades))
+    total = math.fsum(valores)
+
+    por_categoria = [{"productos": 0, "unidades": 0, "valor": 0.0} for _ in columnas.categorias]
+    for codigo, cantidad, valor in zip(columnas.codigos_categoria, columnas.cantidades, valores):
+        subtotal = por_categoria[codigo]
+        subtotal["productos"] += 1
+        subtotal["unidades"] += cantidad
+        subtotal["valor"] += valor
+
+    precios = sorted(columnas.precios)
+    cantidades = sorted(columnas.cantidades)
+
+    # ABC: se recorre de mayor a menor valor mirando lo acumulado antes de cada producto
+    orden = sorted(range(len(valores)), key=valores.__getitem__, reverse=True)
+    clases = [0] * len(valores)
+    acumulado = 0.0
+    limite_a, limite_b = umbrales_abc[0] * total, umbrales_abc[1] * total
+    for i in orden:
+        clases[i] = 0 if acumulado < limite_a else 1 if acumulado < limite_b else 2
+        acumulado += valores[i]
+
+    return {
+        "productos": len(columnas),
+        "unidades": sum(columnas.cantidades),
+        "valor": total,
+        "sin_stock": columnas.cantidades.count(0),
+        "por_categoria": dict(zip(columnas.categorias, por_categoria)),
+        "percentiles": {
+            "precio": {q: percentil(precios, q) for q in PERCENTILES},
+            "cantidad": {q: percentil(cantidades, q) for q in PERCENTILES},
+        },
+        "top_valor": _top(columnas, heapq.nlargest(top, range(len(valores)), key=valores.__getitem__), valores),
+        "abc": _resumen_abc(clases, valores, total),
+    }
+
+
+def _analizar_numpy(columnas, top, umbrales_abc):
+    precios = numpy.frombuffer(columnas.precios, dtype=numpy.float64)
+    cantidades = numpy.frombuffer(columnas.cantidades, dtype=numpy.int64)
+    codigos = numpy.frombuffer(columnas.codigos_categoria, dtype=numpy.int64)
+    valores = precios * cantidades
+    # Suma por pares de NumPy: el error es del orden de fsum, sin recorrer en Python
+    total = float(valores.sum())
+
+    categorias = len(columnas.categorias)
+    productos_cat = numpy.bincount(codigos, minlength=categorias)
+    unidades_cat = numpy.bincount(codigos, weights=cantidades, minlength=categorias)
+    valor_cat = numpy.bincount(codigos, weights=valores, minlength=categorias)
+    por_categoria = {
+        categoria: {"productos": int(productos_cat[i]), "unidades": int(unidades_cat[i]), "valor": float(valor_cat[i])}
+        for i, categoria in enumerate(columnas.categorias)
+    }
+
+    def percentiles(columna):
+        if not len(columna):
+            return {q: None for q in PERCENTILES}
+        return {q: float(v) for q, v in zip(PERCENTILES, numpy.percentile(columna, PERCENTILES))}
+
+    # argsort estable sobre -valor: mismo orden de desempate que sorted(reverse=True)
+    orden = numpy.argsort(-valores, kind="stable")
+    ordenados = valores[orden]
+    previo = numpy.cumsum(ordenados) - ordenados
+    clases_ordenadas = numpy.searchsorted([umbrales_abc[0] * total, umbrales_abc[1] * total], previo, side="right")
+    clases = numpy.empty_like(clases_ordenadas)
+    clases[orden] = clases_ordenadas
+
+    abc = {}
+    for numero, clase in enumerate(CLASES_ABC):
+        elegidos = clases == numero
+        valor = float(valores[elegidos].sum())
+        abc[clase] = {"productos": int(elegidos.sum()), "valor": valor,
+                      "porcentaje_valor": 100 * valor / total if total else 0.0}
+
+    return {
+        "productos": len(columnas),
+        "unidades": int(cantidades.sum()),
+        "valor": total,
+        "sin_stock": int(numpy.count_nonzero(cantidades == 0)),
+        "por_categoria": por_categoria,
+        "percentiles": {"precio": percentiles(precios), "cantidad": percentiles(cantidades)},
+        "top_valor": _top(columnas, [int(i) for i in orden[:top]], {int(i): float(valores[i]) for i in orden[:top]}),
+        "abc": abc,
+    }
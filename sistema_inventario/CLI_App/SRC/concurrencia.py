@@ -0,0 +1,99 @@
+"""
+Bloqueo entre procesos y contador de versión para los archivos de datos.
+
+Cada archivo de datos tiene al lado '<archivo>.lock'. Ese archivo sirve
+para el bloqueo exclusivo (fcntl.flock en Linux/Mac, msvcrt.locking en
+Windows) y además guarda un número: la versión, que sube en cada escritura.
+
+GestorDatos anota la versión con la que cargó los datos y, al guardar,
+toma el bloqueo y compara (compare-and-swap): si otro proceso guardó en el
+medio, recarga y vuelve a aplicar solo sus operaciones antes de escribir.
+Leer no bloquea nunca.
+"""
+import os
+from contextlib import contextmanager
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+
+def ruta_bloqueo(ruta_datos):
+    return ruta_datos + ".lock"
+
+
+def leer_version(ruta_lock):
+    """Versión actual (0 si todavía no se escribió nunca)."""
+    try:
+        with open(ruta_lock, 'rb') as archivo:
+            return _leer_numero(archivo)
+    except FileNotFoundError:
+        return 0
+
+
+def _leer_numero(archivo):
+    archivo.seek(0)
+    try:
+        return int(archivo.read(32).strip() or 0)
+    except ValueError:
+        return 0
+
+
+def _bloquear(archivo):
+    if os.name == "nt":
+        archivo.seek(0)
+        while True:
+            try:
+                # LK_LOCK reintenta durante ~10 s y después falla: se sigue esperando
+                msvcrt.locking(archivo.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    fcntl.flock(archivo.fileno(), fcntl.LOCK_EX)
+
+
+def _desbloquear(archivo):
+    if os.name == "nt":
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_UNLCK, 1)
+    else:
+        fcntl.flock(archivo.fileno(), fcntl.LOCK_UN)
+
+
+class Bloqueo:
+    """Bloqueo tomado; permite leer la versión y dejar la siguiente."""
+
+    def __init__(self, archivo):
+        self._archivo = archivo
+
+    def version(self):
+        return _leer_numero(self._archivo)
+
+    def incrementar(self):
+        nueva = self.version() + 1
+        self._archivo.seek(0)
+        self._archivo.truncate()
+        self._archivo.write(str(nueva).encode("ascii"))
+        self._archivo.flush()
+        return nueva
+
+
+@contextmanager
+def bloqueo_exclusivo(ruta_lock):
+    """
+    Espera hasta tener el bloqueo exclusivo del archivo:
+
+        with bloqueo_exclusivo(ruta_bloqueo(ruta)) as bloqueo:
+            ...
+            bloqueo.incrementar()
+
+    Funciona también entre hilos del mismo proceso (cada uno abre su propio
+    descriptor). No es reentrante: no hay que anidarlo sobre el mismo archivo.
+    """
+    with open(ruta_lock, 'a+b') as archivo:
+        _bloquear(archivo)
+        try:
+            yield Bloqueo(archivo)
+        finally:
+            _desbloquear(archivo)
@@ -0,0 +1,130 @@
+"""
+Exportación del inventario a CSV, JSON Lines o texto de ancho fijo.
+
+Los productos se recorren de a uno (GestorDatos.iter_datos) y cada fila se
+escribe apenas se genera, así que la memoria usada no depende del tamaño
+del catálogo. La salida puede ir comprimida con gzip, a una carpeta
+elegida o a la salida estándar para encadenarla con otras herramientas.
+"""
+import csv
+import datetime
+import gzip
+import json
+import os
+import sys
+
+FORMATOS_EXPORTACION = {"csv": ".csv", "jsonl": ".jsonl", "txt": ".txt"}
+COLUMNAS_EXPORTACION = ["sku", "nombre", "categoria", "precio", "cantidad"]
+
+
+def filtrar_productos(productos, categoria=None, stock_maximo=None):
+    """
+    Deja pasar solo los productos de esa categoría (sin distinguir
+    mayúsculas) y/o con menos de 'stock_maximo' unidades.
+    """
+    if categoria:
+        categoria = categoria.strip().lower()
+    for p in productos:
+        if categoria and str(p.get("categoria", "")).lower() != categoria:
+            continue
+        if stock_maximo is not None and p["cantidad"] >= stock_maximo:
+            continue
+        yield p
+
+
+def escribir_csv(productos, salida):
+    escritor = csv.DictWriter(salida, fieldnames=COLUMNAS_EXPORTACION, extrasaction="ignore")
+    escritor.writeheader()
+    filas = 0
+    for p in productos:
+        escritor.writerow(p)
+        filas += 1
+    return filas
+
+
+def escribir_jsonl(productos, salida):
+    filas = 0
+    for p in productos:
+        salida.write(json.dumps(p, ensure_ascii=False) + "\n")
+        filas += 1
+    return filas
+
+
+def escribir_txt(productos, salida, titulo=None):
+    """El reporte de texto de siempre: encabezado, una línea por producto y pie."""
+    titulo = titulo or datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
+    salida.write("========================================\n")
+    salida.write(f" REPORTE DE INVENTARIO - {titulo}\n")
+    salida.write("========================================\n\n")
+
+    salida.write(f"{'SKU':<10} {'NOMBRE':<20} {'CANTIDAD':<10} {'PRECIO'}\n")
+    salida.write("-" * 55 + "\n")
+
+    filas = 0
+    for p in productos:
+        salida.write(f"{p['sku']:<10} {p['nombre']:<20} {p['cantidad']:<10} ${p['precio']}\n")
+        filas += 1
+
+    salida.write("\n========================================\n")
+    salida.write("FIN DEL REPORTE")
+    return filas
+
+
+ESCRITORES = {"csv": escribir_csv, "jsonl": escribir_jsonl, "txt": escribir_txt}
+
+
+def nombre_exportacion(formato, comprimir=False, fecha=None):
+    """Ej: reporte_inventario_2023-10-25_14-30.csv(.gz)"""
+    fecha = fecha or datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
+    nombre = f"reporte_inventario_{fecha}{FORMATOS_EXPORTACION[formato]}"
+    return nombre + ".gz" if comprimir else nombre
+
+
+def _abrir(ruta, comprimir):
+    if comprimir:
+        return gzip.open(ruta, 'wt', encoding='utf-8', newline='')
+    return open(ruta, 'w', encoding='utf-8', newline='')
+
+
+def exportar(productos, formato="txt", carpeta=None, ruta=None, comprimir=False):
+    """
+    Escribe 'productos' (cualquier iterable) en el formato pedido.
+
+    El destino es 'ruta' si se indica ('-' = salida estándar); si no, un
+    nombre con la fecha dentro de 'carpeta' (por defecto la actual). El
+    archivo se arma con un nombre temporal y se renombra al terminar, así
+    nunca queda un reporte a medias con el nombre final.
+    Devuelve (ruta_final, filas_escritas).
+    """
+    if formato not in ESCRITORES:
+        raise ValueError(f"Formato no soportado: '{formato}' (use {', '.join(ESCRITORES)})")
+    escribir = ESCRITORES[formato]
+
+    if ruta == "-":
+        if comprimir:
+            with gzip.open(sys.stdout.buffer, 'wt', encoding='utf-8', newline='') as salida:
+                return ruta, escribir(productos, salida)
+        return ruta, escribir(productos, sys.stdout)
+
+    if ruta is None:
+        carpeta = carpeta or os.getcwd()
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, nombre_exportacion(formato, comprimir))
+
+    temporal = ruta + ".tmp"
+    try:
+        with _abrir(temporal, comprimir) as salida:
+            filas = escribir(productos, salida)
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return ruta, filas
+
+
+def exportar_inventario(db, formato="txt", carpeta=None, ruta=None, comprimir=False,
+                        categoria=None, stock_maximo=None):
+    """Exporta los productos de 'db' aplicando los filtros indicados."""
+    productos = filtrar_productos(db.iter_datos(), categoria, stock_maximo)
+    return exportar(productos, formato, carpeta, ruta, comprimir)
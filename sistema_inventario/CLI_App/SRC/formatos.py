@@ -0,0 +1,201 @@
+"""
+Formatos de archivo para los datos (productos.json, usuarios.json).
+
+- json:          JSON con indent=4, legible (el formato de siempre).
+- json-compacto: JSON sin espacios; más chico y rápido de escribir.
+- orjson:        JSON compacto escrito con orjson (si está instalado).
+- pickle:        binario, pickle protocolo 5.
+- msgpack:       binario, MessagePack (si está instalado).
+
+Los binarios empiezan con una cabecera: MAGIA + una línea JSON con el
+formato, la versión del esquema y la cantidad de registros. Al leer se
+detecta el formato solo (cabecera o JSON), así que el archivo conserva su
+nombre y cualquier GestorDatos lo lee, escriba en el formato que escriba.
+El formato de escritura se elige con INVENTARIO_FORMATO.
+
+Conversión de los archivos existentes:
+    python formatos.py convertir pickle
+    python formatos.py convertir json       # de vuelta a JSON legible
+    python formatos.py info
+"""
+import argparse
+import io
+import json
+import os
+import pickle
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MAGIA = b"INVB"
+VERSION_ESQUEMA = 1
+FORMATO_POR_DEFECTO = "json"
+
+
+class _Desempaquetador(pickle.Unpickler):
+    """Los datos son solo listas, dicts, textos y números: no se carga ninguna clase."""
+
+    def find_class(self, modulo, nombre):
+        raise pickle.UnpicklingError(f"El archivo de datos referencia {modulo}.{nombre}")
+
+
+def _json_legible(datos):
+    return json.dumps(datos, indent=4, ensure_ascii=False).encode("utf-8")
+
+
+def _json_compacto(datos):
+    return json.dumps(datos, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# {formato: (codificar(datos) -> bytes, decodificar(bytes) -> datos o None si es JSON)}
+CODECS = {
+    "json": (_json_legible, None),
+    "json-compacto": (_json_compacto, None),
+    "pickle": (lambda datos: pickle.dumps(datos, protocol=5),
+               lambda contenido: _Desempaquetador(io.BytesIO(contenido)).load()),
+}
+if orjson is not None:
+    CODECS["orjson"] = (orjson.dumps, None)
+if msgpack is not None:
+    CODECS["msgpack"] = (lambda datos: msgpack.packb(datos, use_bin_type=True),
+                         lambda contenido: msgpack.unpackb(contenido, raw=False))
+
+FORMATOS_BINARIOS = ("pickle", "msgpack")
+
+
+def formato_configurado():
+    """Formato de escritura elegido con INVENTARIO_FORMATO (json si no hay)."""
+    return os.environ.get("INVENTARIO_FORMATO", FORMATO_POR_DEFECTO)
+
+
+def validar_formato(formato):
+    if formato not in CODECS:
+        disponibles = ", ".join(CODECS)
+        raise ValueError(f"Formato '{formato}' no disponible (disponibles: {disponibles})")
+    return formato
+
+
+def codificar(datos, formato=FORMATO_POR_DEFECTO):
+    codificador, _ = CODECS[validar_formato(formato)]
+    contenido = codificador(datos)
+    if formato not in FORMATOS_BINARIOS:
+        return contenido
+    cabecera = {"formato": formato, "version": VERSION_ESQUEMA,
+                "registros": len(datos) if isinstance(datos, list) else None}
+    return MAGIA + json.dumps(cabecera).encode("ascii") + b"\n" + contenido
+
+
+def leer_cabecera(contenido):
+    """(cabecera, inicio de los datos) de un archivo binario; None si es JSON."""
+    if not contenido.startswith(MAGIA):
+        return None
+    fin = contenido.find(b"\n", len(MAGIA))
+    if fin < 0:
+        raise ValueError("Cabecera de archivo binario incompleta")
+    return json.loads(contenido[len(MAGIA):fin]), fin + 1
+
+
+def decodificar(contenido):
+    """
+    Datos de un archivo en cualquiera de los formatos. Un JSON mal formado
+    lanza json.JSONDecodeError; un binario dañado o desconocido, ValueError.
+    """
+    cabecera = leer_cabecera(contenido)
+    if cabecera is None:
+        if orjson is not None:
+            return orjson.loads(contenido)
+        return json.loads(contenido.decode("utf-8"))
+
+    cabecera, inicio = cabecera
+    formato = cabecera.get("formato")
+    if formato not in FORMATOS_BINARIOS or formato not in CODECS:
+        raise ValueError(f"Formato binario '{formato}' no disponible")
+    if cabecera.get("version", 0) > VERSION_ESQUEMA:
+        raise ValueError(f"Versión de esquema {cabecera['version']} más nueva que la soportada")
+    _, decodificador = CODECS[formato]
+    try:
+        datos = decodificador(memoryview(contenido)[inicio:])
+    except Exception as e:
+        # Cada librería tiene sus propias excepciones: se informan todas igual
+        raise ValueError(f"Archivo {formato} dañado: {e}") from e
+    if cabecera.get("registros") is not None and len(datos) != cabecera["registros"]:
+        raise ValueError(f"Se esperaban {cabecera['registros']} registros y hay {len(datos)}")
+    return datos
+
+
+def detectar_formato(ruta):
+    """Formato de un archivo existente ('json' para cualquier JSON)."""
+    with open(ruta, 'rb') as archivo:
+        inicio = archivo.read(256)
+    cabecera = leer_cabecera(inicio)
+    return "json" if cabecera is None else cabecera[0].get("formato")
+
+
+# --- Conversión ---
+
+def convertir_archivos(carpeta_data, formato, archivos=("productos.json", "usuarios.json")):
+    """
+    Reescribe cada archivo de datos en 'formato'. Un .wal pendiente se
+    incorpora y se borra. Se hace con el bloqueo de cada archivo tomado y
+    subiendo su versión, así los procesos abiertos recargan.
+    Devuelve {archivo: registros}.
+    """
+    from almacenes import escribir_atomico
+    from almacen_sqlite import almacen_json
+    from concurrencia import bloqueo_exclusivo, ruta_bloqueo
+
+    validar_formato(formato)
+    resumen = {}
+    for nombre in archivos:
+        ruta = os.path.join(carpeta_data, nombre)
+        if not os.path.exists(ruta):
+            continue
+        with bloqueo_exclusivo(ruta_bloqueo(ruta)) as bloqueo:
+            datos = almacen_json(carpeta_data, nombre).cargar()
+            escribir_atomico(ruta, datos, formato=formato)
+            if os.path.exists(ruta + ".wal"):
+                os.remove(ruta + ".wal")
+            bloqueo.incrementar()
+        resumen[nombre] = len(datos)
+    return resumen
+
+
+def main(argv=None):
+    from logger import ruta_carpeta_data
+    parser = argparse.ArgumentParser(description="Formato de los archivos de datos")
+    parser.add_argument("--data", default=ruta_carpeta_data(), help="Carpeta de datos")
+    acciones = parser.add_subparsers(dest="accion", required=True)
+    p = acciones.add_parser("convertir", help="Reescribe los archivos en otro formato")
+    p.add_argument("formato", choices=list(CODECS))
+    acciones.add_parser("info", help="Muestra el formato de cada archivo")
+    args = parser.parse_args(argv)
+
+    if args.accion == "info":
+        for nombre in ("productos.json", "usuarios.json"):
+            ruta = os.path.join(args.data, nombre)
+            if os.path.exists(ruta):
+                print(f"  {nombre}: {detectar_formato(ruta)} ({os.path.getsize(ruta)} bytes)")
+        return 0
+
+    try:
+        resumen = convertir_archivos(args.data, args.formato)
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}")
+        return 1
+    print(f"Convertido a {args.formato}:")
+    for nombre, cantidad in resumen.items():
+        print(f"  {nombre}: {cantidad} registros")
+    if args.formato != formato_configurado():
+        print(f"Use INVENTARIO_FORMATO={args.formato} para seguir escribiendo en ese formato.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
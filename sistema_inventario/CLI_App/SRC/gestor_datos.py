@@ -1,22 +1,94 @@
-import json
+import atexit
 import os
+from contextlib import contextmanager
+from almacenes import AlmacenJSON, AlmacenJournal, firma_archivos
+from almacen_sqlite import AlmacenSQLite, ESQUEMAS, NOMBRE_BASE
+from formatos import CODECS, FORMATO_POR_DEFECTO, formato_configurado
+from indices import TablaIndexada
+from registros import Producto
+from indice_busqueda import IndiceTrigramas, buscar_en_flujo
+from agregados import AgregadosInventario, guardar_agregados, leer_agregados, ruta_agregados
+from concurrencia import bloqueo_exclusivo, leer_version, ruta_bloqueo
+
+# Campo que identifica cada registro de cada archivo. El modo journal lo usa
+# para guardar solo los registros que cambiaron, y get/upsert/delete para
+# encontrar un registro sin recorrer la lista.
+CLAVES_PRIMARIAS = {
+    "productos.json": "sku",
+    "usuarios.json": "username",
+}
+
+# Índices secundarios que se mantienen por defecto en cada archivo.
+INDICES_SECUNDARIOS = {
+    "productos.json": ("categoria",),
+}
+
+# Tipo compacto con el que se guarda cada registro en memoria (por defecto, dict).
+TIPOS_REGISTRO = {
+    "productos.json": Producto,
+}
+
+# Totales que se mantienen al día con cada cambio y se guardan junto al archivo.
+AGREGADOS = {
+    "productos.json": AgregadosInventario,
+}
+
+# Caché de lectura compartida por todas las instancias del proceso:
+# {ruta: (firma, tabla)}. Cada menú crea su propio GestorDatos, así que
+# guardarla en la instancia no serviría de mucho.
+_cache = {}
+_estadisticas_cache = {}
+# {ruta: GestorDatos} con agregados en memoria más nuevos que los del disco
+_agregados_pendientes = {}
+
 
 class GestorDatos:
-    def __init__(self, ruta_archivo):
+    def __init__(self, ruta_archivo, journal=None, indices_secundarios=None, backend=None, formato=None):
         # TRUCO: Obtenemos la ruta absoluta de este archivo (gestor_datos.py)
         # .../sistema_inventario/SRC/gestor_datos.py
         ruta_actual = os.path.abspath(__file__)
-        
+
         # Subimos un nivel para salir de SRC y llegar a 'sistema_inventario'
         carpeta_src = os.path.dirname(ruta_actual)
         carpeta_proyecto = os.path.dirname(carpeta_src)
-        
+
         # Definimos que la carpeta data SIEMPRE estará dentro de sistema_inventario
         self.ruta_carpeta_data = os.path.join(carpeta_proyecto, "data")
         self.ruta = os.path.join(self.ruta_carpeta_data, ruta_archivo)
-        
+        self.ruta_lock = ruta_bloqueo(self.ruta)
+
         self.asegurar_directorio()
 
+        self.clave = CLAVES_PRIMARIAS.get(ruta_archivo)
+        if indices_secundarios is None:
+            indices_secundarios = INDICES_SECUNDARIOS.get(ruta_archivo, ())
+        self.indices_secundarios = tuple(indices_secundarios)
+        self.clase_agregados = AGREGADOS.get(ruta_archivo)
+        self.tipo_registro = TIPOS_REGISTRO.get(ruta_archivo)
+
+        # Backend: "json", "journal" o "sqlite". Se elige por parámetro o con
+        # INVENTARIO_BACKEND; INVENTARIO_JOURNAL=1 sigue activando el journal.
+        if backend is None:
+            if journal is None:
+                journal = os.environ.get("INVENTARIO_JOURNAL", "0") == "1"
+            backend = "journal" if journal else os.environ.get("INVENTARIO_BACKEND", "json")
+        # Formato en que se escriben los archivos (ver formatos.py); al leer se
+        # detecta solo. Se elige por parámetro o con INVENTARIO_FORMATO.
+        self.formato = formato or formato_configurado()
+        if self.formato not in CODECS:
+            print(f"Formato '{self.formato}' no disponible; se escribe en {FORMATO_POR_DEFECTO}.")
+            self.formato = FORMATO_POR_DEFECTO
+        if backend == "sqlite" and ruta_archivo in ESQUEMAS:
+            self.almacen = AlmacenSQLite(os.path.join(self.ruta_carpeta_data, NOMBRE_BASE), ruta_archivo)
+        elif backend == "journal" and self.clave:
+            self.almacen = AlmacenJournal(self.ruta, self.clave, formato=self.formato)
+        else:
+            self.almacen = AlmacenJSON(self.ruta, self.formato, self.clave)
+
+        _estadisticas_cache.setdefault(self.ruta, {"aciertos": 0, "fallos": 0, "conflictos": 0})
+        # Dentro de un lote: {"tabla", "firma", "cambios", "operaciones"}; si no, None
+        self._lote = None
+
     def asegurar_directorio(self):
         """Si la carpeta 'data' no existe en la ruta calculada, la crea."""
         if not os.path.exists(self.ruta_carpeta_data):
@@ -25,26 +97,424 @@ class GestorDatos:
             except OSError as e:
                 print(f"Error creando carpeta data: {e}")
 
+    def _nueva_tabla(self, datos):
+        tabla = TablaIndexada.desde_lista(datos, self.clave, self.indices_secundarios, self.tipo_registro)
+        if self.clase_agregados:
+            tabla.agregados = self.clase_agregados.desde_tabla(tabla)
+        return tabla
+
+    def _firma(self):
+        """
+        Identifica la versión guardada: el contador de concurrencia.py más la
+        firma del almacén (que además detecta cambios hechos por fuera, como
+        una restauración). La versión se lee antes que los datos.
+        """
+        version = leer_version(self.ruta_lock)
+        return self.almacen.firma() + ((version,),)
+
+    def _tabla_y_firma(self):
+        """Tabla indexada vigente y la firma con la que se cargó."""
+        if self._lote is not None:
+            return self._lote["tabla"], self._lote["firma"]
+        firma = self._firma()
+        en_cache = _cache.get(self.ruta)
+        if en_cache and en_cache[0] == firma:
+            _estadisticas_cache[self.ruta]["aciertos"] += 1
+            return en_cache[1], firma
+
+        _estadisticas_cache[self.ruta]["fallos"] += 1
+        tabla = self._nueva_tabla(self.almacen.cargar())
+        _cache[self.ruta] = (firma, tabla)
+        return tabla, firma
+
+    def _tabla(self):
+        """Tabla indexada vigente; se recarga solo si los archivos cambiaron en disco."""
+        return self._tabla_y_firma()[0]
+
+    def _tabla_en_memoria(self):
+        """La tabla si ya está cargada y al día; None si habría que leerla del disco."""
+        if self._lote is not None:
+            return self._lote["tabla"]
+        en_cache = _cache.get(self.ruta)
+        if en_cache and en_cache[0] == self._firma():
+            return en_cache[1]
+        return None
+
+    def _actualizar_firma(self, tabla, escritura_completa=True):
+        """
+        Anota la tabla como vigente. Los agregados se escriben al disco solo
+        si el archivo se acaba de escribir entero (o se cargó entero): en
+        modo journal o SQLite cada cambio es chico y reescribirlos en cada
+        uno costaría mucho más que el cambio. En ese caso quedan pendientes y
+        se escriben al cerrar el programa (ver guardar_agregados_pendientes).
+        """
+        firma = self._firma()
+        _cache[self.ruta] = (firma, tabla)
+        if not self.clase_agregados:
+            return
+        if escritura_completa:
+            _agregados_pendientes.pop(self.ruta, None)
+            self._guardar_agregados(tabla.agregados, firma)
+        else:
+            _agregados_pendientes[self.ruta] = self
+
+    def _guardar_agregados(self, agregados, firma):
+        try:
+            guardar_agregados(ruta_agregados(self.ruta), agregados, firma)
+        except OSError as e:
+            # Son datos derivados: si no se pudieron guardar se recalculan después
+            print(f"Error al guardar agregados: {e}")
+
+    def _escribio_todo(self):
+        """True si la última escritura reescribió el archivo entero (JSON, o journal recién compactado)."""
+        if isinstance(self.almacen, AlmacenJournal):
+            return self.almacen.tamano_log() == 0
+        return isinstance(self.almacen, AlmacenJSON)
+
     def leer_datos(self):
         """Lee el JSON y devuelve una lista. Si no existe, devuelve lista vacía."""
-        if not os.path.exists(self.ruta):
-            return []
-        
         try:
-            with open(self.ruta, 'r', encoding='utf-8') as archivo:
-                return json.load(archivo)
-        except json.JSONDecodeError:
-            return []
+            # Son copias: los menús modifican los diccionarios antes de guardar
+            return self._tabla().lista()
         except Exception as e:
             print(f"Error al leer datos: {e}")
             return []
 
+    def iter_datos(self, copias=True):
+        """
+        Recorre los registros de a uno. Si el catálogo ya está en memoria se
+        recorre ese (copiando solo el registro que se entrega); si no, se lee
+        del disco de a un registro, sin cargar el archivo entero ni llenar la
+        caché. Se puede cortar en cualquier momento (break) y el archivo se
+        cierra. No hay que hacer upsert/delete mientras se recorre.
+
+        Con copias=False los registros de la caché se entregan tal cual se
+        guardan (p. ej. registros.Producto), para recorridos de solo lectura
+        que no los modifican.
+        """
+        try:
+            tabla = self._tabla_en_memoria()
+            if tabla is not None:
+                if not copias:
+                    yield from tabla.registros.values()
+                    return
+                for registro in tabla.registros.values():
+                    yield registro.copy()
+            else:
+                yield from self.almacen.iterar()
+        except (OSError, ValueError) as e:
+            print(f"Error al leer datos: {e}")
+
     def guardar_datos(self, datos):
-        """Recibe una lista de diccionarios y la guarda en el JSON."""
+        """Recibe una lista de diccionarios y la guarda en el JSON (reemplaza todo)."""
         try:
-            with open(self.ruta, 'w', encoding='utf-8') as archivo:
-                json.dump(datos, archivo, indent=4, ensure_ascii=False)
+            with bloqueo_exclusivo(self.ruta_lock) as bloqueo:
+                self.almacen.guardar(datos)
+                bloqueo.incrementar()
+                self._actualizar_firma(self._nueva_tabla(datos), self._escribio_todo())
             return True
+        except Exception as e:
+            _cache.pop(self.ruta, None)
+            print(f"Error al guardar datos: {e}")
+            return False
+
+    # --- Acceso por clave (O(1) gracias a la tabla indexada) ---
+
+    def _exigir_clave(self):
+        if not self.clave:
+            raise ValueError(f"{os.path.basename(self.ruta)} no tiene clave primaria definida")
+
+    def get(self, valor_clave):
+        """Devuelve una copia del registro con esa clave, o None si no existe."""
+        self._exigir_clave()
+        registro = self._tabla().get(valor_clave)
+        return registro.copy() if registro is not None else None
+
+    def existe(self, valor_clave):
+        self._exigir_clave()
+        return self._tabla().get(valor_clave) is not None
+
+    def ultimo(self):
+        """Copia del último registro guardado (útil para calcular el próximo id)."""
+        registro = self._tabla().ultimo()
+        return registro.copy() if registro is not None else None
+
+    def contar(self):
+        """Cantidad de registros. Con agregados al día no hace falta cargar el catálogo."""
+        if self.clase_agregados and self._tabla_en_memoria() is None:
+            return self.agregados().productos
+        return len(self._tabla())
+
+    def buscar_por(self, campo, valor):
+        """Registros cuyo 'campo' vale exactamente 'valor', usando un índice secundario."""
+        return [r.copy() for r in self._tabla().buscar_por(campo, valor)]
+
+    def buscar_texto(self, termino, ranking=False, limite=None):
+        """
+        Registros cuyo nombre o categoría contiene 'termino' (sin distinguir
+        mayúsculas), hasta 'limite' resultados si se indica.
+
+        Con el catálogo en memoria se usa el índice de trigramas (se arma la
+        primera vez y después se actualiza con cada upsert/delete). Si no
+        está cargado, se recorre el archivo con iter_datos() sin cargarlo.
+        """
+        tabla = self._tabla_en_memoria()
+        if tabla is None:
+            return buscar_en_flujo(self.iter_datos(), termino, ranking, limite)
+        indice = getattr(tabla, "indice_texto", None)
+        if indice is None:
+            indice = IndiceTrigramas.desde_tabla(tabla)
+            tabla.indice_texto = indice
+        claves = indice.buscar(termino, ranking)
+        if limite is not None:
+            claves = claves[:limite]
+        return [tabla.registros[c].copy() for c in claves]
+
+    def agregados(self):
+        """
+        Totales mantenidos al día (ver agregados.py). Si el catálogo no está
+        en memoria y el archivo .agregados corresponde a los datos actuales,
+        se leen de ahí sin cargar el catálogo.
+        """
+        if not self.clase_agregados:
+            raise ValueError(f"{os.path.basename(self.ruta)} no tiene agregados definidos")
+        if self._lote is None:
+            firma = self._firma()
+            en_cache = _cache.get(self.ruta)
+            if not (en_cache and en_cache[0] == firma):
+                guardados = leer_agregados(ruta_agregados(self.ruta), firma)
+                if guardados is not None:
+                    return guardados
+                # Faltaban o eran de otra versión de los datos: quedan recalculados al cargar
+                tabla = self._tabla()
+                self._actualizar_firma(tabla)
+                return tabla.agregados
+        return self._tabla().agregados
+
+    def verificar_agregados(self, reparar=False):
+        """
+        Recalcula los totales desde cero y devuelve las diferencias con los
+        mantenidos en memoria y con los guardados en disco (lista vacía si
+        todo coincide). Con reparar=True deja los recalculados en uso y en disco.
+        """
+        if not self.clase_agregados:
+            raise ValueError(f"{os.path.basename(self.ruta)} no tiene agregados definidos")
+        guardados = leer_agregados(ruta_agregados(self.ruta), self._firma())
+        tabla = self._tabla()
+        recalculados = self.clase_agregados.desde_registros(tabla.registros.values(), tabla.agregados.stock_minimo)
+
+        diferencias = [f"en memoria: {d}" for d in tabla.agregados.diferencias(recalculados)]
+        if guardados is not None:
+            diferencias += [f"en disco: {d}" for d in guardados.diferencias(recalculados)]
+        if diferencias and reparar:
+            tabla.observadores.remove(tabla.agregados)
+            tabla.agregados = self.clase_agregados.desde_tabla(tabla, recalculados.stock_minimo)
+            self._actualizar_firma(tabla)
+        return diferencias
+
+    # --- Escritura ---
+    #
+    # Cada escritura es una "operación": una función que recibe la tabla, la
+    # modifica y devuelve (resultado, cambios). Se guarda la función y no
+    # solo el registro final porque, si otro proceso escribió mientras tanto,
+    # hay que volver a aplicarla sobre los datos nuevos (ver _confirmar).
+
+    def _operar(self, operacion):
+        if self._lote is not None:
+            resultado, cambios = operacion(self._lote["tabla"])
+            self._lote["operaciones"].append(operacion)
+            self._lote["cambios"].extend(cambios)
+            return resultado
+        tabla, firma = self._tabla_y_firma()
+        resultado, cambios = operacion(tabla)
+        if cambios:
+            try:
+                repetidos = self._confirmar(tabla, firma, cambios, [operacion])
+            except BaseException:
+                _cache.pop(self.ruta, None)
+                raise
+            if repetidos is not None:
+                resultado = repetidos[0]
+        return resultado
+
+    def _confirmar(self, tabla, firma, cambios, operaciones):
+        """
+        Guarda con el bloqueo tomado, si la versión en disco sigue siendo la
+        que se leyó (compare-and-swap). Si no, otro proceso escribió en el
+        medio: se recarga y se vuelven a aplicar las operaciones sobre los
+        datos actuales, así sus cambios no se pierden. Con el bloqueo tomado
+        nadie más puede escribir, así que basta con un intento.
+        Devuelve los resultados de las operaciones repetidas (o None).
+        """
+        with bloqueo_exclusivo(self.ruta_lock) as bloqueo:
+            repetidos = None
+            if self._firma() != firma:
+                _estadisticas_cache[self.ruta]["conflictos"] += 1
+                tabla = self._nueva_tabla(self.almacen.cargar())
+                repetidos, cambios = [], []
+                for operacion in operaciones:
+                    resultado, nuevos = operacion(tabla)
+                    repetidos.append(resultado)
+                    cambios.extend(nuevos)
+            if cambios:
+                self.almacen.aplicar(cambios, (r.copy() for r in tabla.registros.values()))
+                bloqueo.incrementar()
+            self._actualizar_firma(tabla, repetidos is not None or self._escribio_todo())
+        return repetidos
+
+    def _cambio_upsert(self, registro):
+        return {"op": "upsert", "clave": registro[self.clave], "datos": registro}
+
+    def upsert(self, registro):
+        """Inserta o actualiza un registro según su clave primaria."""
+        self._exigir_clave()
+        registro = dict(registro)
+
+        def operacion(tabla):
+            nuevo = dict(registro)
+            tabla.upsert(nuevo)
+            return True, [self._cambio_upsert(nuevo)]
+        try:
+            return self._operar(operacion)
+        except Exception as e:
+            print(f"Error al guardar datos: {e}")
+            return False
+
+    def insertar(self, registro):
+        """
+        Como upsert, pero solo si la clave no existe (tampoco si otro proceso
+        la creó recién). Lanza ValueError si ya existe; False si falló al guardar.
+        """
+        self._exigir_clave()
+        registro = dict(registro)
+        valor_clave = registro[self.clave]
+
+        def operacion(tabla):
+            if tabla.get(valor_clave) is not None:
+                raise ValueError(f"Ya existe un registro con {self.clave} {valor_clave}")
+            nuevo = dict(registro)
+            tabla.upsert(nuevo)
+            return True, [self._cambio_upsert(nuevo)]
+        try:
+            return self._operar(operacion)
+        except ValueError:
+            raise
         except Exception as e:
             print(f"Error al guardar datos: {e}")
-            return False
\ No newline at end of file
+            return False
+
+    def actualizar(self, valor_clave, funcion):
+        """
+        Lee el registro vigente, le aplica funcion(registro) (que lo modifica
+        en el lugar) y lo guarda. Es la forma segura de hacer leer-modificar-
+        escribir con varias terminales: si hubo un conflicto, la función se
+        vuelve a ejecutar sobre el dato más nuevo. Los ValueError de la
+        función (y un registro inexistente) se propagan.
+        Devuelve una copia del registro guardado, o None si falló al guardar.
+        """
+        self._exigir_clave()
+
+        def operacion(tabla):
+            actual = tabla.get(valor_clave)
+            if actual is None:
+                raise ValueError(f"No existe un registro con {self.clave} {valor_clave}")
+            nuevo = actual.copy()
+            funcion(nuevo)
+            tabla.upsert(nuevo)
+            return dict(nuevo), [self._cambio_upsert(nuevo)]
+        try:
+            return self._operar(operacion)
+        except ValueError:
+            raise
+        except Exception as e:
+            print(f"Error al guardar datos: {e}")
+            return None
+
+    def delete(self, valor_clave):
+        """Elimina el registro con esa clave. Devuelve False si no existía o si falló."""
+        self._exigir_clave()
+
+        def operacion(tabla):
+            if tabla.delete(valor_clave) is None:
+                return False, []
+            return True, [{"op": "delete", "clave": valor_clave}]
+        try:
+            return self._operar(operacion)
+        except Exception as e:
+            print(f"Error al guardar datos: {e}")
+            return False
+
+    @contextmanager
+    def lote(self):
+        """
+        Agrupa muchos upsert/delete en una sola escritura a disco:
+
+            with db.lote():
+                for p in productos:
+                    db.upsert(p)
+
+        Si ocurre una excepción dentro del bloque no se guarda nada y se
+        descartan los cambios en memoria. Si al guardar hay conflicto con otro
+        proceso, las operaciones del lote se repiten sobre los datos nuevos; si
+        alguna ya no se puede aplicar (p. ej. falta stock), se lanza ese
+        ValueError y no se guarda nada.
+        """
+        if self._lote is not None:
+            # Lote anidado: el de afuera es el que guarda
+            yield self
+            return
+        tabla, firma = self._tabla_y_firma()
+        self._lote = {"tabla": tabla, "firma": firma, "cambios": [], "operaciones": []}
+        try:
+            yield self
+        except BaseException:
+            self._lote = None
+            _cache.pop(self.ruta, None)
+            raise
+        lote, self._lote = self._lote, None
+        if lote["cambios"]:
+            try:
+                self._confirmar(lote["tabla"], lote["firma"], lote["cambios"], lote["operaciones"])
+            except Exception:
+                _cache.pop(self.ruta, None)
+                raise
+
+    def compactar(self):
+        """En modo journal, vuelca el log en un snapshot nuevo. En modo JSON no hace nada."""
+        if isinstance(self.almacen, AlmacenJournal):
+            try:
+                with bloqueo_exclusivo(self.ruta_lock):
+                    en_cache = _cache.get(self.ruta)
+                    vigente = en_cache is not None and en_cache[0] == self._firma()
+                    self.almacen.compactar()
+                    # Los archivos cambiaron pero el contenido no: refrescamos la firma
+                    if vigente:
+                        self._actualizar_firma(en_cache[1])
+            except Exception as e:
+                print(f"Error al compactar datos: {e}")
+                return False
+        return True
+
+    def estadisticas_cache(self):
+        """Aciertos y fallos de la caché de lectura para este archivo."""
+        return dict(_estadisticas_cache[self.ruta])
+
+
+def guardar_agregados_pendientes():
+    """
+    Escribe los agregados que quedaron solo en memoria, si siguen
+    correspondiendo a los datos en disco (si otro proceso escribió después,
+    quedarían viejos: no se escriben y se recalculan al leerlos).
+    """
+    for ruta, gestor in list(_agregados_pendientes.items()):
+        en_cache = _cache.get(ruta)
+        try:
+            firma = gestor._firma()
+        except OSError:
+            continue
+        if en_cache is not None and en_cache[0] == firma:
+            gestor._guardar_agregados(en_cache[1].agregados, firma)
+    _agregados_pendientes.clear()
+
+
+atexit.register(guardar_agregados_pendientes)
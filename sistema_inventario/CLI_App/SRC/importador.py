@@ -0,0 +1,121 @@
+"""
+Importación masiva de productos y movimientos desde CSV o JSON Lines.
+
+El archivo se lee fila por fila (nunca entero en memoria), cada fila se
+valida con las mismas reglas que los menús de inventory.py y todo lo válido
+se guarda con una sola escritura al final (GestorDatos.lote). Las filas con
+error se informan con su número de línea y no se aplican.
+"""
+import csv
+import json
+import os
+import inventory
+
+CAMPOS_PRODUCTO = ("sku", "nombre", "categoria", "precio", "cantidad")
+CAMPOS_MOVIMIENTO = ("sku", "tipo", "cantidad")
+
+
+def leer_filas(ruta):
+    """
+    Genera (numero_de_linea, fila) desde un .csv (con encabezado) o un
+    .jsonl/.ndjson (un objeto por línea). Las líneas vacías se saltan.
+    """
+    extension = os.path.splitext(ruta)[1].lower()
+    with open(ruta, 'r', encoding='utf-8-sig', newline='') as archivo:
+        if extension == ".csv":
+            lector = csv.DictReader(archivo)
+            for fila in lector:
+                yield lector.line_num, fila
+        elif extension in (".jsonl", ".ndjson"):
+            for numero, linea in enumerate(archivo, start=1):
+                if not linea.strip():
+                    continue
+                try:
+                    fila = json.loads(linea)
+                except json.JSONDecodeError as e:
+                    yield numero, ValueError(f"JSON inválido: {e.msg}")
+                    continue
+                yield numero, fila
+        else:
+            raise ValueError(f"Formato no soportado: '{extension}' (use .csv o .jsonl)")
+
+
+def _campos(fila, nombres):
+    if isinstance(fila, Exception):
+        raise fila
+    if not isinstance(fila, dict):
+        raise ValueError("La fila no es un objeto")
+    faltantes = [n for n in nombres if fila.get(n) in (None, "")]
+    if faltantes:
+        raise ValueError(f"Faltan campos: {', '.join(faltantes)}")
+    return [fila[n] for n in nombres]
+
+
+def importar_productos(db, ruta, todo_o_nada=False, registrar=True):
+    """
+    Da de alta productos nuevos. Un SKU que ya existe (en la base o antes en
+    el mismo archivo) es un error, igual que en agregar_producto.
+    Con todo_o_nada=True, un solo error cancela toda la importación.
+    Devuelve {"aplicadas": n, "errores": [(linea, mensaje), ...]}.
+    """
+    aplicadas = []
+    errores = []
+    try:
+        with db.lote():
+            for linea, fila in leer_filas(ruta):
+                try:
+                    producto = inventory.validar_producto(*_campos(fila, CAMPOS_PRODUCTO))
+                    if db.existe(producto["sku"]):
+                        raise ValueError(f"Ya existe un producto con SKU {producto['sku']}")
+                    db.insertar(producto)
+                    aplicadas.append(producto)
+                except (ValueError, TypeError) as e:
+                    errores.append((linea, str(e)))
+            if todo_o_nada and errores:
+                raise _ImportacionCancelada()
+    except _ImportacionCancelada:
+        return {"aplicadas": 0, "errores": errores}
+
+    if registrar:
+        for producto in aplicadas:
+            inventory.log_alta(producto)
+    return {"aplicadas": len(aplicadas), "errores": errores}
+
+
+def importar_movimientos(db, ruta, todo_o_nada=False, registrar=True):
+    """
+    Aplica entradas y salidas de stock. 'tipo' acepta ENTRADA/SALIDA o 1/2,
+    como el menú. Las filas se aplican en orden, así que una salida puede
+    usar el stock que dejó una entrada anterior del mismo archivo.
+    """
+    aplicadas = []
+    errores = []
+    try:
+        with db.lote():
+            for linea, fila in leer_filas(ruta):
+                try:
+                    sku, tipo, cantidad = _campos(fila, CAMPOS_MOVIMIENTO)
+                    sku = str(sku).strip().upper()
+                    tipo = str(tipo).strip().upper()
+                    accion = inventory.TIPOS_MOVIMIENTO.get(tipo, tipo)
+                    if not db.existe(sku):
+                        raise ValueError(f"Producto {sku} no encontrado")
+                    # Valores fijados como default: si hay conflicto el lote repite la operación más tarde
+                    producto = db.actualizar(
+                        sku, lambda p, accion=accion, cantidad=cantidad: inventory.aplicar_movimiento(p, accion, cantidad))
+                    aplicadas.append((producto, accion, int(cantidad)))
+                except (ValueError, TypeError) as e:
+                    errores.append((linea, str(e)))
+            if todo_o_nada and errores:
+                raise _ImportacionCancelada()
+    except _ImportacionCancelada:
+        return {"aplicadas": 0, "errores": errores}
+
+    if registrar:
+        for producto, accion, cantidad in aplicadas:
+            inventory.log_movimiento(producto, accion, cantidad)
+    return {"aplicadas": len(aplicadas), "errores": errores}
+
+
+class _ImportacionCancelada(Exception):
+    """Se usa para salir del lote sin guardar cuando todo_o_nada=True."""
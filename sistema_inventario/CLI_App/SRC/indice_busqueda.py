@@ -0,0 +1,152 @@
+import heapq
+
+CAMPOS_BUSQUEDA = ("nombre", "categoria")
+
+# Peso de cada campo al ordenar por relevancia (el nombre importa más)
+PESOS_CAMPOS = {"nombre": 2.0, "categoria": 1.0}
+
+
+def trigramas(texto):
+    """Conjunto de subcadenas de 3 caracteres de un texto (ya en minúsculas)."""
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def puntaje_coincidencia(texto, termino):
+    """Qué tan buena es la coincidencia de 'termino' dentro de 'texto' (0 = ninguna)."""
+    if not termino or termino not in texto:
+        return 0
+    if texto == termino:
+        return 4
+    if texto.startswith(termino):
+        return 3
+    if (" " + termino) in texto:
+        return 2  # empieza una palabra
+    return 1
+
+
+def puntaje_registro(textos, termino, campos=CAMPOS_BUSQUEDA):
+    return sum(PESOS_CAMPOS.get(campo, 1.0) * puntaje_coincidencia(texto, termino)
+               for campo, texto in zip(campos, textos))
+
+
+def buscar_en_flujo(registros, termino, ranking=False, limite=None, campos=CAMPOS_BUSQUEDA):
+    """
+    La misma búsqueda que IndiceTrigramas.buscar, pero recorriendo los
+    registros una vez, sin índice. Sin ranking corta apenas junta 'limite'
+    resultados; con ranking guarda solo los 'limite' mejores hasta el final.
+    """
+    termino = termino.lower()
+    if not ranking:
+        resultados = []
+        for registro in registros:
+            if any(termino in str(registro.get(campo, "")).lower() for campo in campos):
+                resultados.append(registro)
+                if limite is not None and len(resultados) >= limite:
+                    break
+        return resultados
+
+    def puntuados():
+        for posicion, registro in enumerate(registros):
+            textos = tuple(str(registro.get(campo, "")).lower() for campo in campos)
+            puntaje = puntaje_registro(textos, termino, campos)
+            if puntaje or not termino:
+                yield (-puntaje, posicion, registro)
+
+    if limite is not None:
+        mejores = heapq.nsmallest(limite, puntuados(), key=lambda r: r[:2])
+    else:
+        mejores = sorted(puntuados(), key=lambda r: r[:2])
+    return [r[2] for r in mejores]
+
+
+class IndiceTrigramas:
+    """
+    Índice invertido de trigramas sobre nombre y categoría de los productos.
+
+    Guarda el texto ya pasado a minúsculas, así que buscar no vuelve a
+    llamar a lower() por cada producto. Para términos de 3 o más letras
+    solo se revisan los productos que contienen todos sus trigramas.
+    Se mantiene al día como observador de TablaIndexada.
+    """
+
+    def __init__(self, campos=CAMPOS_BUSQUEDA):
+        self.campos = campos
+        self.textos = {}       # {clave: (texto_campo1, texto_campo2, ...)}
+        self.publicaciones = {}  # {trigrama: {claves}}
+        self.orden = {}        # {clave: posición}, para devolver en el orden del catálogo
+        self._siguiente = 0
+
+    @classmethod
+    def desde_tabla(cls, tabla, campos=CAMPOS_BUSQUEDA):
+        indice = cls(campos)
+        for clave, registro in tabla.registros.items():
+            indice.al_upsert(clave, None, registro)
+        tabla.observadores.append(indice)
+        return indice
+
+    def _textos_de(self, registro):
+        return tuple(str(registro.get(campo, "")).lower() for campo in self.campos)
+
+    def _quitar(self, clave):
+        for texto in self.textos.pop(clave, ()):
+            for tri in trigramas(texto):
+                claves = self.publicaciones.get(tri)
+                if claves is not None:
+                    claves.discard(clave)
+                    if not claves:
+                        del self.publicaciones[tri]
+
+    def al_upsert(self, clave, anterior, nuevo):
+        textos = self._textos_de(nuevo)
+        if self.textos.get(clave) == textos:
+            return
+        self._quitar(clave)
+        self.textos[clave] = textos
+        for texto in textos:
+            for tri in trigramas(texto):
+                self.publicaciones.setdefault(tri, set()).add(clave)
+        if clave not in self.orden:
+            self.orden[clave] = self._siguiente
+            self._siguiente += 1
+
+    def al_eliminar(self, clave, anterior):
+        self._quitar(clave)
+        self.orden.pop(clave, None)
+
+    def _candidatos(self, termino):
+        """Claves que podrían contener el término (superconjunto de la respuesta)."""
+        if len(termino) < 3:
+            return self.textos.keys()
+        listas = []
+        for tri in trigramas(termino):
+            claves = self.publicaciones.get(tri)
+            if not claves:
+                return set()
+            listas.append(claves)
+        # Intersectamos empezando por la lista más corta
+        listas.sort(key=len)
+        candidatos = set(listas[0])
+        for claves in listas[1:]:
+            candidatos &= claves
+            if not candidatos:
+                break
+        return candidatos
+
+    def buscar(self, termino, ranking=False):
+        """
+        Claves cuyo nombre o categoría contiene 'termino'.
+        Con ranking=True se ordenan de mejor a peor coincidencia; si no,
+        en el orden original del catálogo.
+        """
+        termino = termino.lower()
+        resultados = []
+        for clave in self._candidatos(termino):
+            textos = self.textos[clave]
+            if ranking:
+                puntaje = puntaje_registro(textos, termino, self.campos)
+                if puntaje or not termino:
+                    resultados.append((-puntaje, self.orden[clave], clave))
+            elif any(termino in texto for texto in textos):
+                resultados.append((self.orden[clave], clave))
+        resultados.sort()
+        return [r[-1] for r in resultados]
@@ -0,0 +1,87 @@
+class TablaIndexada:
+    """
+    Registros en memoria indexados por su clave primaria (sku, username...).
+    Opcionalmente mantiene índices secundarios: {campo: {valor: {claves}}}.
+    Si no hay clave primaria (clave=None) los registros se numeran por posición.
+
+    Los diccionarios guardados aquí son internos: quien los pida debe recibir
+    una copia, porque los menús los modifican antes de guardar.
+
+    Con 'fabrica' (p. ej. registros.Producto) cada registro se guarda
+    convertido con fabrica.desde_dict, que debe comportarse como un dict
+    de solo lectura.
+
+    Otros índices (búsqueda de texto, etc.) pueden registrarse en
+    'observadores' para enterarse de cada cambio: deben tener los métodos
+    al_upsert(clave, anterior, nuevo) y al_eliminar(clave, anterior).
+    """
+
+    def __init__(self, clave, campos_secundarios=(), fabrica=None):
+        self.clave = clave
+        self.fabrica = fabrica
+        self.registros = {}
+        self.secundarios = {campo: {} for campo in campos_secundarios}
+        self.observadores = []
+
+    @classmethod
+    def desde_lista(cls, datos, clave, campos_secundarios=(), fabrica=None):
+        tabla = cls(clave, campos_secundarios, fabrica)
+        for registro in datos:
+            # Con fábrica la conversión ya hace la copia
+            tabla.upsert(registro if fabrica else dict(registro))
+        return tabla
+
+    def __len__(self):
+        return len(self.registros)
+
+    def lista(self):
+        """Copia de todos los registros, en el orden en que se guardaron."""
+        return [dict(r) for r in self.registros.values()]
+
+    def get(self, valor_clave):
+        return self.registros.get(valor_clave)
+
+    def ultimo(self):
+        """Último registro agregado, o None si la tabla está vacía."""
+        if not self.registros:
+            return None
+        return next(reversed(self.registros.values()))
+
+    def _quitar_de_secundarios(self, registro, valor_clave):
+        for campo, indice in self.secundarios.items():
+            claves = indice.get(registro.get(campo))
+            if claves is not None:
+                claves.discard(valor_clave)
+                if not claves:
+                    del indice[registro.get(campo)]
+
+    def upsert(self, registro):
+        """Inserta o reemplaza el registro. Devuelve el registro anterior (o None)."""
+        if self.fabrica is not None and not isinstance(registro, self.fabrica):
+            registro = self.fabrica.desde_dict(registro)
+        valor_clave = registro[self.clave] if self.clave else len(self.registros)
+        anterior = self.registros.get(valor_clave)
+        if anterior is not None:
+            self._quitar_de_secundarios(anterior, valor_clave)
+        self.registros[valor_clave] = registro
+        for campo, indice in self.secundarios.items():
+            indice.setdefault(registro.get(campo), set()).add(valor_clave)
+        for observador in self.observadores:
+            observador.al_upsert(valor_clave, anterior, registro)
+        return anterior
+
+    def delete(self, valor_clave):
+        """Borra por clave. Devuelve el registro borrado (o None si no existía)."""
+        anterior = self.registros.pop(valor_clave, None)
+        if anterior is not None:
+            self._quitar_de_secundarios(anterior, valor_clave)
+            for observador in self.observadores:
+                observador.al_eliminar(valor_clave, anterior)
+        return anterior
+
+    def buscar_por(self, campo, valor):
+        """Registros cuyo 'campo' es exactamente 'valor' (requiere índice secundario)."""
+        if campo not in self.secundarios:
+            raise KeyError(f"No hay índice secundario para '{campo}'")
+        claves = self.secundarios[campo].get(valor, ())
+        return [self.registros[c] for c in claves]
@@ -0,0 +1,407 @@
+"""
+Interfaz de línea de comandos sin menús, pensada para scripts y cron.
+
+Ejemplos:
+    python inventario.py product add --sku P001 --nombre Laptop --categoria laptop --precio 100 --cantidad 5
+    python inventario.py product list --format json
+    python inventario.py movement apply --sku P001 --tipo SALIDA --cantidad 2
+    python inventario.py movement apply --file movimientos.csv
+    python inventario.py report stock-bajo --format json
+    python inventario.py report analisis --top 5
+    python inventario.py report export --format jsonl --gzip --output - | zcat | head
+    python inventario.py batch operaciones.txt
+
+Un archivo batch tiene un comando por línea (lo mismo que va después de
+'inventario.py'); las líneas vacías y las que empiezan con '#' se ignoran.
+Todo el archivo corre en un solo proceso, con una sola lectura de datos y
+una sola escritura al final.
+"""
+import argparse
+import csv
+import json
+import shlex
+import sys
+from gestor_datos import GestorDatos
+import analisis
+import exportador
+import importador
+import inventory
+import reports
+from kardex import kardex
+from logger import diferir_registros, establecer_usuario
+
+
+class ErrorComando(Exception):
+    """Error esperable de un comando (dato inválido, SKU inexistente...)."""
+
+
+# --- Salida ---
+
+COLUMNAS_PRODUCTO = ["sku", "nombre", "categoria", "precio", "cantidad"]
+
+
+def imprimir_filas(filas, columnas, formato, salida=None):
+    salida = salida or sys.stdout
+    if formato == "json":
+        # Elemento por elemento: 'filas' puede ser un iterador sobre todo el catálogo
+        salida.write("[")
+        for i, fila in enumerate(filas):
+            salida.write(("," if i else "") + "\n  " + json.dumps(fila, ensure_ascii=False))
+        salida.write("\n]\n")
+    elif formato == "jsonl":
+        for fila in filas:
+            salida.write(json.dumps(fila, ensure_ascii=False) + "\n")
+    elif formato == "csv":
+        escritor = csv.DictWriter(salida, fieldnames=columnas, extrasaction="ignore")
+        escritor.writeheader()
+        escritor.writerows(filas)
+    else:
+        salida.write("  ".join(f"{c.upper():<15}" for c in columnas).rstrip() + "\n")
+        for fila in filas:
+            salida.write("  ".join(f"{str(fila.get(c, '')):<15}" for c in columnas).rstrip() + "\n")
+
+
+def imprimir_objeto(objeto, formato, salida=None):
+    salida = salida or sys.stdout
+    if formato in ("json", "jsonl"):
+        salida.write(json.dumps(objeto, ensure_ascii=False) + "\n")
+    else:
+        for clave, valor in objeto.items():
+            salida.write(f"{clave}: {valor}\n")
+
+
+# --- Comandos: product ---
+
+def cmd_product_add(db, args):
+    try:
+        producto = inventory.validar_producto(args.sku, args.nombre, args.categoria, args.precio, args.cantidad)
+    except ValueError as e:
+        raise ErrorComando(str(e))
+    if db.existe(producto["sku"]):
+        raise ErrorComando(f"Ya existe un producto con SKU {producto['sku']}")
+    try:
+        guardado = db.insertar(producto)
+    except ValueError as e:
+        raise ErrorComando(str(e))
+    if not guardado:
+        raise ErrorComando("No se pudo guardar el producto")
+    inventory.log_alta(producto)
+    imprimir_objeto(producto, args.format)
+
+
+def cmd_product_edit(db, args):
+    producto = _producto_existente(db, args.sku)
+    cambios = {}
+    if args.nombre:
+        cambios["nombre"] = args.nombre.strip()
+    if args.categoria:
+        cambios["categoria"] = args.categoria.strip()
+    if args.precio is not None:
+        try:
+            cambios["precio"] = inventory.convertir_precio(args.precio)
+        except ValueError as e:
+            raise ErrorComando(str(e))
+    producto = _actualizar(db, producto["sku"], lambda p: p.update(cambios))
+    inventory.registrar_accion(f"Edición de producto: {producto['nombre']}", accion="EDICION", sku=producto["sku"])
+    imprimir_objeto(producto, args.format)
+
+
+def cmd_product_delete(db, args):
+    producto = _producto_existente(db, args.sku)
+    if not db.delete(producto["sku"]):
+        raise ErrorComando(f"Producto {producto['sku']} no encontrado")
+    inventory.registrar_accion(f"Baja de producto: {producto['nombre']}", accion="ELIMINACION",
+                               sku=producto["sku"], cantidad=producto["cantidad"], saldo=0)
+    imprimir_objeto({"eliminado": producto["sku"]}, args.format)
+
+
+def cmd_product_get(db, args):
+    imprimir_objeto(_producto_existente(db, args.sku), args.format)
+
+
+def cmd_product_list(db, args):
+    if args.categoria:
+        productos = db.buscar_por("categoria", args.categoria)
+    else:
+        productos = db.iter_datos()
+    imprimir_filas(productos, COLUMNAS_PRODUCTO, args.format)
+
+
+def cmd_product_search(db, args):
+    imprimir_filas(db.buscar_texto(args.termino, ranking=True), COLUMNAS_PRODUCTO, args.format)
+
+
+def cmd_product_import(db, args):
+    resumen = importador.importar_productos(db, args.file, todo_o_nada=args.todo_o_nada)
+    _informar_importacion(resumen, args.format)
+
+
+def _actualizar(db, sku, funcion):
+    try:
+        producto = db.actualizar(sku, funcion)
+    except ValueError as e:
+        raise ErrorComando(str(e))
+    if producto is None:
+        raise ErrorComando("No se pudo guardar el producto")
+    return producto
+
+
+def _producto_existente(db, sku):
+    producto = db.get(sku.strip().upper())
+    if producto is None:
+        raise ErrorComando(f"Producto {sku} no encontrado")
+    return producto
+
+
+# --- Comandos: movement ---
+
+def cmd_movement_apply(db, args):
+    if args.file:
+        resumen = importador.importar_movimientos(db, args.file, todo_o_nada=args.todo_o_nada)
+        _informar_importacion(resumen, args.format)
+        return
+    if not (args.sku and args.tipo and args.cantidad is not None):
+        raise ErrorComando("Indique --file, o bien --sku, --tipo y --cantidad")
+
+    producto = _producto_existente(db, args.sku)
+    accion = args.tipo.upper()
+    producto = _actualizar(db, producto["sku"], lambda p: inventory.aplicar_movimiento(p, accion, args.cantidad))
+    inventory.log_movimiento(producto, accion, args.cantidad)
+    imprimir_objeto({"sku": producto["sku"], "accion": accion, "cantidad": args.cantidad,
+                     "saldo": producto["cantidad"]}, args.format)
+
+
+def _informar_importacion(resumen, formato):
+    imprimir_objeto({"aplicadas": resumen["aplicadas"], "errores": len(resumen["errores"])}, formato)
+    for linea, error in resumen["errores"]:
+        print(f"Línea {linea}: {error}", file=sys.stderr)
+    if resumen["errores"]:
+        raise ErrorComando(f"{len(resumen['errores'])} filas con error")
+
+
+# --- Comandos: report ---
+
+def cmd_report_stock_bajo(db, args):
+    productos = reports.productos_stock_bajo(db, args.minimo)
+    imprimir_filas(productos, ["sku", "nombre", "cantidad"], args.format)
+
+
+def cmd_report_valor(db, args):
+    imprimir_objeto(reports.totales_inventario(db, recalcular=args.recalcular), args.format)
+
+
+def cmd_report_verificar(db, args):
+    """Recalcula los totales desde cero y avisa si los mantenidos se desviaron."""
+    diferencias = db.verificar_agregados(reparar=args.reparar)
+    for diferencia in diferencias:
+        print(diferencia)
+    if not diferencias:
+        print("Agregados correctos")
+    elif args.reparar:
+        print("Agregados recalculados y guardados")
+    else:
+        raise ErrorComando(f"{len(diferencias)} diferencias en los agregados (use --reparar)")
+
+
+def cmd_report_analisis(db, args):
+    if args.format == "csv":
+        raise ErrorComando("El análisis se muestra como tabla o json")
+    usar_numpy = {"auto": None, "numpy": True, "python": False}[args.motor]
+    try:
+        resultado = reports.analisis_inventario(db, top=args.top, usar_numpy=usar_numpy)
+    except ValueError as e:
+        raise ErrorComando(str(e))
+    if args.format == "table":
+        reports.mostrar_analisis(resultado)
+    else:
+        imprimir_objeto(resultado, args.format)
+
+
+def cmd_report_kardex(db, args):
+    desde = f"{args.desde}T00:00:00" if args.desde else None
+    hasta = f"{args.hasta}T23:59:59" if args.hasta else None
+    filas = list(kardex(args.sku.strip().upper(), desde, hasta))
+    imprimir_filas(filas, ["fecha", "accion", "entrada", "salida", "saldo", "usuario"], args.format)
+
+
+def cmd_report_export(db, args):
+    stock_maximo = args.minimo if args.stock_bajo else None
+    ruta, filas = exportador.exportar_inventario(
+        db, args.format, carpeta=args.carpeta, ruta=args.output, comprimir=args.gzip,
+        categoria=args.categoria, stock_maximo=stock_maximo)
+    if ruta != "-":
+        print(f"{ruta} ({filas} productos)", file=sys.stderr)
+
+
+# --- Comando: batch ---
+
+def cmd_batch(db, args):
+    """
+    Ejecuta un archivo de comandos con una sola carga y una sola escritura.
+    El historial se escribe después de guardar: si el lote no se guarda,
+    tampoco queda registrado. Una línea con --usuario queda a nombre de ese
+    usuario; las demás, a nombre del que corre el lote.
+    """
+    parser = construir_parser()
+    parser.set_defaults(usuario=args.usuario)
+    try:
+        fallidos = _correr_lote(db, args, parser)
+    finally:
+        establecer_usuario(args.usuario)
+    if fallidos:
+        raise ErrorComando(f"{fallidos} comandos fallaron")
+
+
+def _correr_lote(db, args, parser):
+    """Corre las líneas del lote. Devuelve cuántas fallaron."""
+    fallidos = 0
+    with open(args.archivo, 'r', encoding='utf-8') as archivo, diferir_registros(), db.lote():
+        for numero, linea in enumerate(archivo, start=1):
+            linea = linea.strip()
+            if not linea or linea.startswith("#"):
+                continue
+            try:
+                sub_args = parser.parse_args(shlex.split(linea))
+            except SystemExit:
+                # argparse ya imprimió el motivo
+                sub_args = None
+            if sub_args is None or sub_args.comando == "batch":
+                print(f"Línea {numero}: comando inválido", file=sys.stderr)
+                fallidos += 1
+            else:
+                establecer_usuario(sub_args.usuario)
+                if ejecutar(db, sub_args, prefijo=f"Línea {numero}: ") != 0:
+                    fallidos += 1
+            if fallidos and args.detener:
+                break
+    return fallidos
+
+
+# --- Parser ---
+
+def construir_parser():
+    parser = argparse.ArgumentParser(prog="inventario", description="Inventario sin menús interactivos")
+    parser.add_argument("--usuario", default="cli", help="Autor de las acciones en el historial")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    formato = argparse.ArgumentParser(add_help=False)
+    formato.add_argument("--format", choices=["table", "json", "jsonl", "csv"], default="table")
+
+    # product
+    product = comandos.add_parser("product", help="Alta, baja, edición y consulta de productos")
+    acciones = product.add_subparsers(dest="accion", required=True)
+
+    p = acciones.add_parser("add", parents=[formato])
+    p.add_argument("--sku", required=True)
+    p.add_argument("--nombre", required=True)
+    p.add_argument("--categoria", required=True)
+    p.add_argument("--precio", required=True)
+    p.add_argument("--cantidad", required=True)
+    p.set_defaults(funcion=cmd_product_add)
+
+    p = acciones.add_parser("edit", parents=[formato])
+    p.add_argument("sku")
+    p.add_argument("--nombre")
+    p.add_argument("--categoria")
+    p.add_argument("--precio")
+    p.set_defaults(funcion=cmd_product_edit)
+
+    p = acciones.add_parser("delete", parents=[formato])
+    p.add_argument("sku")
+    p.set_defaults(funcion=cmd_product_delete)
+
+    p = acciones.add_parser("get", parents=[formato])
+    p.add_argument("sku")
+    p.set_defaults(funcion=cmd_product_get)
+
+    p = acciones.add_parser("list", parents=[formato])
+    p.add_argument("--categoria")
+    p.set_defaults(funcion=cmd_product_list)
+
+    p = acciones.add_parser("search", parents=[formato])
+    p.add_argument("termino")
+    p.set_defaults(funcion=cmd_product_search)
+
+    p = acciones.add_parser("import", parents=[formato])
+    p.add_argument("--file", required=True)
+    p.add_argument("--todo-o-nada", action="store_true", help="Un error cancela toda la importación")
+    p.set_defaults(funcion=cmd_product_import)
+
+    # movement
+    movement = comandos.add_parser("movement", help="Entradas y salidas de stock")
+    acciones = movement.add_subparsers(dest="accion", required=True)
+    p = acciones.add_parser("apply", parents=[formato])
+    p.add_argument("--sku")
+    p.add_argument("--tipo", choices=["ENTRADA", "SALIDA", "entrada", "salida"])
+    p.add_argument("--cantidad", type=int)
+    p.add_argument("--file", help="CSV/JSON Lines con columnas sku, tipo, cantidad")
+    p.add_argument("--todo-o-nada", action="store_true")
+    p.set_defaults(funcion=cmd_movement_apply)
+
+    # report
+    report = comandos.add_parser("report", help="Reportes")
+    acciones = report.add_subparsers(dest="accion", required=True)
+    p = acciones.add_parser("stock-bajo", parents=[formato])
+    p.add_argument("--minimo", type=int, default=reports.STOCK_MINIMO)
+    p.set_defaults(funcion=cmd_report_stock_bajo)
+
+    p = acciones.add_parser("valor", parents=[formato])
+    p.add_argument("--recalcular", action="store_true", help="Sumar desde los datos en vez de usar los totales mantenidos")
+    p.set_defaults(funcion=cmd_report_valor)
+
+    p = acciones.add_parser("verificar", help="Compara los totales mantenidos con un recálculo completo")
+    p.add_argument("--reparar", action="store_true")
+    p.set_defaults(funcion=cmd_report_verificar)
+
+    p = acciones.add_parser("analisis", parents=[formato], help="Categorías, percentiles, top por valor y ABC")
+    p.add_argument("--top", type=int, default=analisis.TOP_N)
+    p.add_argument("--motor", choices=["auto", "numpy", "python"], default="auto")
+    p.set_defaults(funcion=cmd_report_analisis)
+
+    p = acciones.add_parser("kardex", parents=[formato])
+    p.add_argument("sku")
+    p.add_argument("--desde", help="AAAA-MM-DD")
+    p.add_argument("--hasta", help="AAAA-MM-DD")
+    p.set_defaults(funcion=cmd_report_kardex)
+
+    p = acciones.add_parser("export", help="Exporta el catálogo sin cargarlo entero en memoria")
+    p.add_argument("--format", choices=list(exportador.FORMATOS_EXPORTACION), default="csv")
+    p.add_argument("--output", help="Archivo de salida ('-' = salida estándar)")
+    p.add_argument("--carpeta", help="Carpeta donde crear el archivo con nombre automático")
+    p.add_argument("--gzip", action="store_true")
+    p.add_argument("--categoria")
+    p.add_argument("--stock-bajo", action="store_true")
+    p.add_argument("--minimo", type=int, default=reports.STOCK_MINIMO)
+    p.set_defaults(funcion=cmd_report_export)
+
+    # batch
+    p = comandos.add_parser("batch", help="Ejecuta un archivo con un comando por línea")
+    p.add_argument("archivo")
+    p.add_argument("--detener", action="store_true", help="Detenerse en el primer error")
+    p.set_defaults(funcion=cmd_batch)
+
+    return parser
+
+
+def ejecutar(db, args, prefijo=""):
+    """Corre un comando ya parseado. Devuelve el código de salida (0 = bien)."""
+    try:
+        args.funcion(db, args)
+        return 0
+    except ErrorComando as e:
+        print(f"{prefijo}Error: {e}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"{prefijo}Error: {e}", file=sys.stderr)
+        return 1
+
+
+def main(argv=None):
+    args = construir_parser().parse_args(argv)
+    establecer_usuario(args.usuario)
+    db = GestorDatos("productos.json")
+    return ejecutar(db, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
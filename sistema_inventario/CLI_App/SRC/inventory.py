@@ -1,10 +1,60 @@
 from gestor_datos import GestorDatos
 import os
 from logger import registrar_accion  # <--- NUEVO
+import importador
+from paginador import paginar
 
 def limpiar_pantalla():
     os.system('cls' if os.name == 'nt' else 'clear')
 
+# --- Reglas de negocio (las usan los menús y la importación masiva) ---
+
+TIPOS_MOVIMIENTO = {"1": "ENTRADA", "2": "SALIDA"}
+
+def convertir_precio(valor):
+    precio = float(valor)
+    if precio < 0: raise ValueError("El precio no puede ser negativo")
+    return precio
+
+def convertir_cantidad(valor):
+    cantidad = int(valor)
+    if cantidad < 0: raise ValueError("La cantidad no puede ser negativa")
+    return cantidad
+
+def validar_producto(sku, nombre, categoria, precio, cantidad):
+    """Arma el diccionario de un producto nuevo. Lanza ValueError si algún dato no es válido."""
+    sku = str(sku).strip().upper()
+    if not sku: raise ValueError("El SKU no puede estar vacío")
+    return {
+        "sku": sku,
+        "nombre": str(nombre).strip(),
+        "categoria": str(categoria).strip(),
+        "precio": convertir_precio(precio),
+        "cantidad": convertir_cantidad(cantidad)
+    }
+
+def aplicar_movimiento(producto, accion, cantidad):
+    """Suma (ENTRADA) o resta (SALIDA) stock al producto en memoria. Lanza ValueError si no se puede."""
+    cantidad = int(cantidad)
+    if cantidad <= 0: raise ValueError("La cantidad debe ser mayor a 0")
+    if accion == "ENTRADA":
+        producto['cantidad'] += cantidad
+    elif accion == "SALIDA":
+        if cantidad > producto['cantidad']:
+            raise ValueError("No hay suficiente stock para realizar esta salida")
+        producto['cantidad'] -= cantidad
+    else:
+        raise ValueError(f"Tipo de movimiento inválido: {accion}")
+    return producto
+
+def log_movimiento(producto, accion, cantidad):
+    registrar_accion(f"{accion} de {cantidad} unidades - Producto: {producto['nombre']}",
+                     accion=accion, sku=producto['sku'], cantidad=cantidad, saldo=producto['cantidad'])
+
+def log_alta(producto):
+    registrar_accion(f"Alta de producto: {producto['nombre']}", accion="CREACION",
+                     sku=producto['sku'], cantidad=producto['cantidad'], saldo=producto['cantidad'])
+
 def menu_inventario():
     db = GestorDatos("productos.json")
     
@@ -17,7 +67,8 @@ def menu_inventario():
         print("4. Editar Producto")
         print("5. Eliminar Producto")
         print("6. Registrar Movimiento (Entrada/Salida)")  # <--- NUEVO
-        print("7. Volver al Menú Principal")
+        print("7. Importación Masiva (CSV / JSON Lines)")
+        print("8. Volver al Menú Principal")
         
         opcion = input("\nOpción: ")
         
@@ -34,122 +85,56 @@ def menu_inventario():
         elif opcion == "6":
             registrar_movimiento(db)  # <--- CONECTADO
         elif opcion == "7":
+            importar_archivo(db)
+        elif opcion == "8":
             break
         else:
             input("Opción no válida. Enter para continuar...")
 
-def registrar_movimiento(db):
-    productos = db.leer_datos()
-    print("\n--- REGISTRAR MOVIMIENTO DE STOCK ---")
-    sku_buscar = input("SKU del producto: ").strip().upper()
-    
-    # ... (Búsqueda del producto igual que antes) ...
-    producto = None
-    indice = -1
-    for i, p in enumerate(productos):
-        if p['sku'] == sku_buscar:
-            producto = p
-            indice = i
-            break
-    
-    if not producto:
-        print("Producto no encontrado.")
-        input("Enter para continuar...")
-        return
-
-    # ... (Pedir tipo y cantidad igual que antes) ...
-    print(f"Producto: {producto['nombre']} | Stock actual: {producto['cantidad']}")
-    print("1. Entrada")
-    print("2. Salida")
-    tipo = input("Seleccione tipo: ").strip()
-    
-    try:
-        cantidad = int(input("Cantidad a mover: "))
-        if cantidad <= 0: raise ValueError("La cantidad debe ser mayor a 0")
-        
-        if tipo == "1": # Entrada
-            producto['cantidad'] += cantidad
-            accion = "ENTRADA"  # <--- Variable para el log
-            print(f"✅ Stock actualizado.")
-            
-        elif tipo == "2": # Salida
-            if cantidad > producto['cantidad']:
-                print("❌ ¡Error! No hay suficiente stock.")
-                return
-            producto['cantidad'] -= cantidad
-            accion = "SALIDA"   # <--- Variable para el log
-            print(f"✅ Stock actualizado.")
-        else:
-            return
-
-        # Guardar en JSON
-        productos[indice] = producto
-        db.guardar_datos(productos)
-        
-        # --- AQUÍ GUARDAMOS EL LOG ---
-        mensaje_log = f"{accion} de {cantidad} unidades - Producto: {producto['nombre']} (SKU: {producto['sku']})"
-        registrar_accion(mensaje_log, usuario="Admin") # Puedes pasar el usuario real si modificas la función para recibirlo
-        # -----------------------------
-        
-    except ValueError:
-        print("Error de datos.")
-        
-    input("Enter para continuar...")
-    
 def listar_productos(db):
-    productos = db.leer_datos()
-    mostrar_tabla(productos)
-    input("\nPresione Enter para volver...")
+    # Se recorre del disco (o de la caché) de a una página; el total sale de los agregados
+    mostrar_tabla(db.iter_datos, total=db.contar())
 
-def mostrar_tabla(lista_productos):
-    """Función auxiliar para no repetir código de impresión"""
-    limpiar_pantalla()
-    print("\n--- LISTADO DE PRODUCTOS ---")
-    
-    if not lista_productos:
-        print("No hay productos para mostrar.")
-    else:
-        print(f"{'SKU':<10} {'NOMBRE':<20} {'CATEGORIA':<15} {'PRECIO':<10} {'STOCK'}")
-        print("-" * 70)
-        for p in lista_productos:
-            print(f"{p['sku']:<10} {p['nombre']:<20} {p['categoria']:<15} ${p['precio']:<9} {p['cantidad']}")
+def mostrar_tabla(productos, total=None):
+    """
+    Tabla paginada (ver paginador.py). 'productos' es una lista o una
+    función que devuelve un iterador nuevo cada vez que se la llama.
+    """
+    if isinstance(productos, list):
+        lista = productos
+        productos, total = (lambda: lista), len(lista)
+    paginar(productos, total, limpiar=limpiar_pantalla)
 
 def buscar_producto(db):
-    productos = db.leer_datos()
     limpiar_pantalla()
     print("\n--- BUSCAR PRODUCTO ---")
     termino = input("Ingrese nombre o categoría a buscar: ").strip().lower()
     
-    resultados = [p for p in productos if termino in p['nombre'].lower() or termino in p['categoria'].lower()]
+    # Con el catálogo en memoria usa el índice de trigramas; si no, lo recorre
+    # del disco de a un producto. Los que mejor coinciden aparecen primero
+    resultados = db.buscar_texto(termino, ranking=True)
     
     if resultados:
         mostrar_tabla(resultados)
     else:
         print(f"\nNo se encontraron productos que coincidan con '{termino}'.")
-        
-    input("\nPresione Enter para continuar...")
+        input("\nPresione Enter para continuar...")
 
 def agregar_producto(db):
-    productos = db.leer_datos()
     print("\n--- NUEVO PRODUCTO ---")
     
     sku = input("Código (SKU): ").strip().upper()
-    for p in productos:
-        if p['sku'] == sku:
-            print("¡Error! Ya existe un producto con ese SKU.")
-            input("Enter para continuar...")
-            return
+    if db.existe(sku):
+        print("¡Error! Ya existe un producto con ese SKU.")
+        input("Enter para continuar...")
+        return
 
     nombre = input("Nombre del producto: ").strip()
     categoria = input("Categoría: ").strip()
     
     try:
-        precio = float(input("Precio: "))
-        if precio < 0: raise ValueError("El precio no puede ser negativo")
-        
-        cantidad = int(input("Cantidad inicial: "))
-        if cantidad < 0: raise ValueError("La cantidad no puede ser negativa")
-        
+        precio = convertir_precio(input("Precio: "))
+        cantidad = convertir_cantidad(input("Cantidad inicial: "))
     except ValueError as e:
         print(f"¡Error! {e}")
         input("Enter para continuar...")
@@ -163,64 +148,71 @@ def agregar_producto(db):
         "cantidad": cantidad
     }
     
-    productos.append(nuevo_producto)
-    if db.guardar_datos(productos):
+    try:
+        guardado = db.insertar(nuevo_producto)
+    except ValueError:
+        # Otra terminal lo dio de alta mientras se completaban los datos
+        print("¡Error! Ya existe un producto con ese SKU.")
+        guardado = False
+    if guardado:
+        log_alta(nuevo_producto)
         print("¡Producto guardado éxito!")
     input("Enter para continuar...")
 
 def editar_producto(db):
-    productos = db.leer_datos()
     print("\n--- EDITAR PRODUCTO ---")
     sku_buscar = input("Ingrese el SKU del producto a editar: ").strip().upper()
     
-    indice = -1
-    for i, p in enumerate(productos):
-        if p['sku'] == sku_buscar:
-            indice = i
-            break
-            
-    if indice == -1:
+    prod = db.get(sku_buscar)
+    if prod is None:
         print("Producto no encontrado.")
         input("Enter para continuar...")
         return
 
-    prod = productos[indice]
     print(f"\nEditando: {prod['nombre']} (Precio actual: ${prod['precio']})")
     print("Deje el campo vacío si no desea cambiar el valor.")
     
     nuevo_nombre = input("Nuevo nombre: ").strip()
     nuevo_precio_str = input("Nuevo precio: ").strip()
     
+    cambios = {}
     if nuevo_nombre:
-        prod['nombre'] = nuevo_nombre
+        cambios['nombre'] = nuevo_nombre
     
     if nuevo_precio_str:
         try:
-            nuevo_precio = float(nuevo_precio_str)
-            if nuevo_precio < 0: raise ValueError
-            prod['precio'] = nuevo_precio
+            cambios['precio'] = convertir_precio(nuevo_precio_str)
         except ValueError:
             print("Precio inválido. No se actualizó el precio.")
 
-    productos[indice] = prod
-    db.guardar_datos(productos)
-    print("\nProducto actualizado correctamente.")
+    # Solo se tocan los campos editados: el stock pudo cambiar en otra terminal
+    try:
+        prod = db.actualizar(sku_buscar, lambda p: p.update(cambios))
+    except ValueError as e:
+        print(f"¡Error! {e}")
+        prod = None
+    if prod:
+        registrar_accion(f"Edición de producto: {prod['nombre']}", accion="EDICION", sku=prod['sku'])
+        print("\nProducto actualizado correctamente.")
     input("Enter para continuar...")
 
 def eliminar_producto(db):
-    productos = db.leer_datos()
     print("\n--- ELIMINAR PRODUCTO ---")
     sku_buscar = input("Ingrese el SKU del producto a eliminar: ").strip().upper()
     
-    nueva_lista = [p for p in productos if p['sku'] != sku_buscar]
-    
-    if len(nueva_lista) == len(productos):
+    producto = db.get(sku_buscar)
+    if producto is None:
         print("Producto no encontrado.")
     else:
         confirmacion = input("¿Está seguro? Esto no se puede deshacer (s/n): ")
         if confirmacion.lower() == 's':
-            db.guardar_datos(nueva_lista)
-            print("Producto eliminado.")
+            if db.delete(sku_buscar):
+                registrar_accion(f"Baja de producto: {producto['nombre']}", accion="ELIMINACION",
+                                 sku=sku_buscar, cantidad=producto['cantidad'], saldo=0)
+                print("Producto eliminado.")
+            else:
+                # Otra terminal lo borró mientras se confirmaba
+                print("Producto no encontrado. No se eliminó nada.")
         else:
             print("Operación cancelada.")
             
@@ -228,18 +220,10 @@ def eliminar_producto(db):
 
 def registrar_movimiento(db):
     """NUEVA FUNCIÓN: Permite sumar o restar stock fácilmente"""
-    productos = db.leer_datos()
     print("\n--- REGISTRAR MOVIMIENTO DE STOCK ---")
     sku_buscar = input("SKU del producto: ").strip().upper()
     
-    producto = None
-    indice = -1
-    for i, p in enumerate(productos):
-        if p['sku'] == sku_buscar:
-            producto = p
-            indice = i
-            break
-    
+    producto = db.get(sku_buscar)
     if not producto:
         print("Producto no encontrado.")
         input("Enter para continuar...")
@@ -252,28 +236,54 @@ def registrar_movimiento(db):
     
     try:
         cantidad = int(input("Cantidad a mover: "))
-        if cantidad <= 0: raise ValueError("La cantidad debe ser mayor a 0")
-        
-        if tipo == "1": # Entrada
-            producto['cantidad'] += cantidad
-            print(f"✅ Stock actualizado. Nuevo total: {producto['cantidad']}")
-            
-        elif tipo == "2": # Salida
-            if cantidad > producto['cantidad']:
-                print("❌ ¡Error! No hay suficiente stock para realizar esta salida.")
-                input("Enter para continuar...")
-                return
-            producto['cantidad'] -= cantidad
-            print(f"✅ Stock actualizado. Nuevo total: {producto['cantidad']}")
-            
-        else:
-            print("Opción inválida.")
-            return
-
-        productos[indice] = producto
-        db.guardar_datos(productos)
-        
     except ValueError:
         print("Error: Ingrese un número válido.")
+        input("Enter para continuar...")
+        return
+
+    accion = TIPOS_MOVIMIENTO.get(tipo)
+    if accion is None:
+        print("Opción inválida.")
+        return
+
+    # Se aplica sobre el stock vigente al guardar, no sobre el que se mostró arriba
+    try:
+        producto = db.actualizar(sku_buscar, lambda p: aplicar_movimiento(p, accion, cantidad))
+    except ValueError as e:
+        print(f"❌ ¡Error! {e}.")
+        input("Enter para continuar...")
+        return
+
+    if producto:
+        print(f"✅ Stock actualizado. Nuevo total: {producto['cantidad']}")
+        log_movimiento(producto, accion, cantidad)
         
-    input("Enter para continuar...")
\ No newline at end of file
+    input("Enter para continuar...")
+
+def importar_archivo(db):
+    """Carga productos o movimientos desde un archivo CSV o JSON Lines, en una sola escritura."""
+    print("\n--- IMPORTACIÓN MASIVA ---")
+    print("1. Productos nuevos (sku, nombre, categoria, precio, cantidad)")
+    print("2. Movimientos (sku, tipo ENTRADA/SALIDA, cantidad)")
+    tipo = input("¿Qué desea importar?: ").strip()
+    ruta = input("Ruta del archivo (.csv o .jsonl): ").strip().strip('"')
+    
+    if tipo not in ("1", "2"):
+        print("Opción inválida.")
+    elif not os.path.exists(ruta):
+        print("El archivo no existe.")
+    else:
+        try:
+            if tipo == "1":
+                resumen = importador.importar_productos(db, ruta)
+            else:
+                resumen = importador.importar_movimientos(db, ruta)
+            print(f"\nFilas aplicadas: {resumen['aplicadas']} | Filas con error: {len(resumen['errores'])}")
+            for linea, error in resumen['errores'][:20]:
+                print(f"  Línea {linea}: {error}")
+            if len(resumen['errores']) > 20:
+                print(f"  ... y {len(resumen['errores']) - 20} errores más.")
+        except ValueError as e:
+            print(f"¡Error! {e}")
+            
+    input("\nPresione Enter para continuar...")
\ No newline at end of file
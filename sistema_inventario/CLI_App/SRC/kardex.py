@@ -0,0 +1,280 @@
+"""
+Consultas sobre el historial de movimientos usando sus índices laterales.
+
+El historial puede estar repartido en varios segmentos (los rotados y el
+actual). De cada uno se carga el .idx, que es disperso (una línea por hora),
+y, al consultar un SKU, solo el fragmento de '<historial>.skus' donde están
+sus posiciones; en ambos casos solo lo que se agregó desde la última
+consulta. Con eso se va directo a cada movimiento del SKU pedido, así que
+el costo depende de cuántos movimientos hay en el resultado y no del
+tamaño total.
+"""
+import bisect
+import glob
+import gzip
+import json
+import os
+from concurrencia import bloqueo_exclusivo, ruta_bloqueo
+from logger import (NOMBRE_LOG, bucket_de, fragmento_de, obtener_registro, reconstruir_indice, ruta_carpeta_data,
+                    ruta_fragmento, ruta_fragmentos)
+
+# Acciones que cambian el stock y con qué signo
+SIGNO_ACCION = {"ENTRADA": 1, "CREACION": 1, "SALIDA": -1, "ELIMINACION": -1}
+
+
+def _leer_lineas(ruta, desde, agregar):
+    """
+    Pasa a agregar() cada línea JSON completa de 'ruta' a partir del byte
+    'desde' y devuelve hasta dónde leyó. Una línea a medio escribir se deja
+    para la próxima vez; una que no se puede interpretar se saltea.
+    """
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(desde)
+        for linea in archivo:
+            if not linea.endswith(b"\n"):
+                break
+            desde += len(linea)
+            try:
+                agregar(json.loads(linea))
+            except (ValueError, KeyError, TypeError):
+                continue
+    return desde
+
+
+class IndiceSegmento:
+    """
+    Índice en memoria de un segmento del historial. Los tramos (.idx, una
+    línea por hora) se cargan siempre; las posiciones por SKU solo del
+    fragmento que se consulta, y de a lo que se agregó desde la última vez.
+    """
+
+    def __init__(self, ruta_log):
+        self.ruta_log = ruta_log
+        self.ruta_idx = (ruta_log[:-3] if ruta_log.endswith(".gz") else ruta_log) + ".idx"
+        self.carpeta_fragmentos = ruta_fragmentos(ruta_log)
+        self._reiniciar(None)
+
+    def _reiniciar(self, inodo):
+        self.tramos = []   # [(bucket, offset), ...]: primer registro de cada hora
+        self._leido = 0
+        self._inodo = inodo
+        self._fragmentos = {}  # {numero: (inodo, leido, {sku: [(bucket, offset), ...]})}
+        self.inconsistente = False
+
+    def actualizar(self):
+        """Lee solo la parte del .idx que todavía no se había cargado."""
+        try:
+            st = os.stat(self.ruta_idx)
+        except FileNotFoundError:
+            return
+        # Si el archivo fue rotado o rearmado y hay uno nuevo con el mismo nombre, se empieza de cero
+        if st.st_ino != self._inodo or st.st_size < self._leido:
+            self._reiniciar(st.st_ino)
+        self._leido = _leer_lineas(self.ruta_idx, self._leido, self._agregar_tramo)
+
+    def _agregar_tramo(self, entrada):
+        # Los .idx anteriores traían también una línea por registro con SKU ("s"): se ignoran
+        if isinstance(entrada, dict) and "s" not in entrada:
+            self.tramos.append((entrada["b"], entrada["o"]))
+
+    def tiene_fragmentos(self):
+        return os.path.isdir(self.carpeta_fragmentos)
+
+    def posiciones_sku(self, sku):
+        """[(bucket, offset), ...] del SKU, leyendo solo su fragmento."""
+        numero = fragmento_de(sku)
+        ruta = ruta_fragmento(self.carpeta_fragmentos, numero)
+        try:
+            inodo = os.stat(ruta).st_ino
+        except FileNotFoundError:
+            self._fragmentos.pop(numero, None)
+            return []
+        anterior_inodo, leido, por_sku = self._fragmentos.get(numero, (None, 0, {}))
+        if anterior_inodo != inodo:
+            leido, por_sku = 0, {}
+
+        def agregar(entrada):
+            bucket, offset, sku_entrada = entrada
+            por_sku.setdefault(sku_entrada, []).append((bucket, offset))
+        leido = _leer_lineas(ruta, leido, agregar)
+        self._fragmentos[numero] = (inodo, leido, por_sku)
+        return por_sku.get(sku, [])
+
+    def abrir_log(self):
+        if self.ruta_log.endswith(".gz"):
+            return gzip.open(self.ruta_log, 'rb')
+        return open(self.ruta_log, 'rb')
+
+    def leer_en(self, offsets, sku=None):
+        """
+        Registros que empiezan en cada uno de los offsets indicados. Si en un
+        offset no hay un registro completo (o es de otro SKU), el índice no
+        corresponde al archivo: ese offset se omite y queda marcado en
+        'inconsistente' para rearmar el índice.
+        """
+        registros = []
+        with self.abrir_log() as log:
+            for offset in offsets:
+                log.seek(offset)
+                linea = log.readline()
+                try:
+                    registro = json.loads(linea) if linea.endswith(b"\n") else None
+                except ValueError:
+                    registro = None
+                if not isinstance(registro, dict) or "timestamp" not in registro or \
+                        (sku is not None and registro.get("sku") != sku):
+                    self.inconsistente = True
+                    continue
+                registros.append(registro)
+        return registros
+
+    def empieza_linea(self, offset):
+        """True si 'offset' es el comienzo de una línea del historial."""
+        if offset == 0:
+            return True
+        with self.abrir_log() as log:
+            log.seek(offset - 1)
+            return log.read(1) == b"\n"
+
+    def reindexar(self):
+        """
+        Rearma el .idx recorriendo el historial, con el bloqueo de escritura
+        tomado para que nadie agregue en el medio. Los segmentos comprimidos
+        no se rearman (devuelve False).
+        """
+        if self.ruta_log.endswith(".gz"):
+            return False
+        with bloqueo_exclusivo(ruta_bloqueo(self.ruta_log)):
+            reconstruir_indice(self.ruta_log, self.ruta_idx)
+        self._reiniciar(None)
+        self.actualizar()
+        return True
+
+    def offsets_sku(self, sku, bucket_desde, bucket_hasta):
+        posiciones = self.posiciones_sku(sku)
+        inicio = bisect.bisect_left(posiciones, (bucket_desde, -1)) if bucket_desde else 0
+        fin = bisect.bisect_right(posiciones, (bucket_hasta, float("inf"))) if bucket_hasta else len(posiciones)
+        return [o for _, o in posiciones[inicio:fin]]
+
+    def offset_desde(self, bucket_desde):
+        """Posición del primer registro a partir de ese tramo (None si no hay)."""
+        if not bucket_desde:
+            return 0
+        i = bisect.bisect_left(self.tramos, (bucket_desde, -1))
+        if i == len(self.tramos):
+            return None
+        return self.tramos[i][1]
+
+
+_segmentos = {}
+
+
+def segmentos_historial(carpeta_data=None):
+    """Índices de todos los segmentos, del más antiguo al actual."""
+    carpeta_data = carpeta_data or ruta_carpeta_data()
+    base, extension = os.path.splitext(NOMBRE_LOG)
+    rotados = sorted(glob.glob(os.path.join(carpeta_data, f"{base}-*{extension}")) +
+                     glob.glob(os.path.join(carpeta_data, f"{base}-*{extension}.gz")))
+    rutas = rotados + [os.path.join(carpeta_data, NOMBRE_LOG)]
+
+    indices = []
+    for ruta in rutas:
+        if not os.path.exists(ruta):
+            continue
+        if ruta not in _segmentos:
+            _segmentos[ruta] = IndiceSegmento(ruta)
+        segmento = _segmentos[ruta]
+        segmento.actualizar()
+        indices.append(segmento)
+    return indices
+
+
+def _recorrer(segmento, offset):
+    """Registros del segmento desde 'offset', salteando líneas incompletas o que no son JSON."""
+    with segmento.abrir_log() as log:
+        log.seek(offset)
+        for linea in log:
+            if not linea.endswith(b"\n"):
+                return  # la última, a medio escribir
+            try:
+                registro = json.loads(linea)
+            except ValueError:
+                continue
+            if isinstance(registro, dict) and "timestamp" in registro:
+                yield registro
+
+
+def _en_rango(registro, desde, hasta):
+    ts = registro["timestamp"]
+    return (not desde or ts >= desde) and (not hasta or ts <= hasta)
+
+
+def movimientos_sku(sku, desde=None, hasta=None, carpeta_data=None):
+    """
+    Movimientos de un SKU entre 'desde' y 'hasta' (timestamps ISO, inclusive).
+    Solo se leen del disco las líneas de ese SKU dentro del rango de horas.
+    """
+    # Lo que está en el buffer del logger todavía no tiene índice
+    obtener_registro().flush()
+    bucket_desde = bucket_de(desde) if desde else None
+    bucket_hasta = bucket_de(hasta) if hasta else None
+    for segmento in segmentos_historial(carpeta_data):
+        if not segmento.tiene_fragmentos() and not segmento.reindexar():
+            # Segmento comprimido de antes de los fragmentos por SKU: se recorre entero
+            for registro in _recorrer(segmento, 0):
+                if registro.get("sku") == sku and _en_rango(registro, desde, hasta):
+                    yield registro
+            continue
+        offsets = segmento.offsets_sku(sku, bucket_desde, bucket_hasta)
+        if not offsets:
+            continue
+        registros = segmento.leer_en(offsets, sku)
+        if segmento.inconsistente and segmento.reindexar():
+            registros = segmento.leer_en(segmento.offsets_sku(sku, bucket_desde, bucket_hasta), sku)
+        for registro in registros:
+            if _en_rango(registro, desde, hasta):
+                yield registro
+
+
+def movimientos_en_rango(desde=None, hasta=None, carpeta_data=None):
+    """Todos los registros entre dos timestamps, saltando directo al primer tramo."""
+    obtener_registro().flush()
+    bucket_desde = bucket_de(desde) if desde else None
+    for segmento in segmentos_historial(carpeta_data):
+        offset = segmento.offset_desde(bucket_desde)
+        if offset and not segmento.empieza_linea(offset) and segmento.reindexar():
+            offset = segmento.offset_desde(bucket_desde)
+        if offset is None:
+            continue
+        # Si igual cae a mitad de una línea, _recorrer saltea ese pedazo
+        for registro in _recorrer(segmento, offset):
+            if hasta and registro["timestamp"] > hasta:
+                return
+            if _en_rango(registro, desde, hasta):
+                yield registro
+
+
+def kardex(sku, desde=None, hasta=None, carpeta_data=None):
+    """
+    Filas del kardex: cada movimiento con su entrada/salida y el saldo que
+    quedó. El saldo viene guardado en el registro; si falta, se arrastra
+    desde la fila anterior.
+    """
+    saldo = None
+    for registro in movimientos_sku(sku, desde, hasta, carpeta_data):
+        signo = SIGNO_ACCION.get(registro["accion"])
+        if signo is None:
+            continue
+        cantidad = registro.get("cantidad") or 0
+        if registro.get("saldo") is not None:
+            saldo = registro["saldo"]
+        elif saldo is not None:
+            saldo += signo * cantidad
+        yield {
+            "fecha": registro["timestamp"],
+            "accion": registro["accion"],
+            "entrada": cantidad if signo > 0 else 0,
+            "salida": cantidad if signo < 0 else 0,
+            "saldo": saldo,
+            "usuario": registro.get("usuario"),
+        }
@@ -1,21 +1,405 @@
-import os
+import atexit
 import datetime
+import gzip
+import json
+import os
+import re
+import shutil
+import threading
+import zlib
+from contextlib import contextmanager
+from concurrencia import bloqueo_exclusivo, ruta_bloqueo
 
-def registrar_accion(mensaje, usuario="Sistema"):
-    """
-    Guarda un mensaje en el archivo historial.txt con fecha y hora.
-    """
+# Un registro por línea en formato JSON (JSON Lines), fácil de procesar después
+NOMBRE_LOG = "historial.jsonl"
+
+# Historial de texto de versiones anteriores: "[AAAA-MM-DD HH:MM:SS] - USUARIO: mensaje"
+NOMBRE_LOG_ANTERIOR = "historial.txt"
+LINEA_ANTERIOR = re.compile(r"^\[(\d{4}-\d{2}-\d{2}) (\d{2}:\d{2}:\d{2})\] - (.*?): (.*)$")
+
+# Se escribe a disco cuando se juntan estos registros o pasa este tiempo
+MAX_REGISTROS_EN_BUFFER = 64
+SEGUNDOS_ENTRE_ESCRITURAS = 2.0
+
+# Rotación: al superar este tamaño o al cambiar el día se abre un archivo nuevo
+TAMANO_MAXIMO_LOG = 5 * 1024 * 1024
+ROTAR_POR_FECHA = True
+COMPRIMIR_ROTADOS = False
+
+
+def ruta_carpeta_data():
     # Calculamos la ruta absoluta para que siempre encuentre la carpeta data
     ruta_actual = os.path.abspath(__file__)
     carpeta_src = os.path.dirname(ruta_actual)
     carpeta_proyecto = os.path.dirname(carpeta_src)
-    ruta_log = os.path.join(carpeta_proyecto, "data", "historial.txt")
-    
-    fecha_hora = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    linea = f"[{fecha_hora}] - {usuario.upper()}: {mensaje}\n"
-    
+    return os.path.join(carpeta_proyecto, "data")
+
+
+def bucket_de(timestamp):
+    """Tramo de tiempo (una hora) al que pertenece un timestamp ISO: 'AAAA-MM-DDTHH'."""
+    return timestamp[:13]
+
+
+# Las posiciones por SKU se reparten en este número de archivos según el SKU
+FRAGMENTOS_SKU = 64
+
+
+def ruta_fragmentos(ruta_log):
+    """Carpeta con las posiciones por SKU de un historial ('<historial>.skus')."""
+    if ruta_log.endswith(".gz"):
+        ruta_log = ruta_log[:-3]
+    return ruta_log + ".skus"
+
+
+def fragmento_de(sku):
+    """Número de fragmento (0..FRAGMENTOS_SKU-1) donde van las posiciones de un SKU."""
+    return zlib.crc32(str(sku).encode('utf-8')) % FRAGMENTOS_SKU
+
+
+def ruta_fragmento(carpeta_fragmentos, numero):
+    return os.path.join(carpeta_fragmentos, f"{numero:02x}.jsonl")
+
+
+def entradas_indice(offset, timestamp, sku, ultimo_bucket):
+    """
+    Qué anotar para un registro que empieza en 'offset'. Devuelve
+    (tramo, posicion, bucket): la línea del .idx si el registro abre un
+    tramo de tiempo nuevo (índice disperso: una por hora, si no None) y la
+    línea para el fragmento de su SKU (None si no tiene SKU).
+    """
+    bucket = bucket_de(timestamp)
+    tramo = json.dumps({"b": bucket, "o": offset}) + "\n" if bucket != ultimo_bucket else None
+    posicion = json.dumps([bucket, offset, sku], ensure_ascii=False) + "\n" if sku else None
+    return tramo, posicion, bucket
+
+
+def agregar_posiciones(carpeta_fragmentos, posiciones):
+    """Agrega las líneas de cada fragmento ({numero: [lineas]}) al final de su archivo."""
+    os.makedirs(carpeta_fragmentos, exist_ok=True)
+    banderas = os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0)
+    for numero, lineas in posiciones.items():
+        # os.open/os.write: en cada flush se tocan muchos fragmentos y open() de Python pesa
+        fd = os.open(ruta_fragmento(carpeta_fragmentos, numero), banderas, 0o644)
+        try:
+            os.write(fd, "".join(lineas).encode('utf-8'))
+        finally:
+            os.close(fd)
+
+
+def reconstruir_indice(ruta_log, ruta_idx):
+    """
+    Arma el .idx y los fragmentos por SKU de un historial existente
+    recorriéndolo una sola vez. Los fragmentos se arman en una carpeta
+    aparte y se cambian de una vez por los anteriores.
+    """
+    carpeta = ruta_fragmentos(ruta_log)
+    nueva = carpeta + ".tmp"
+    shutil.rmtree(nueva, ignore_errors=True)
+    ultimo_bucket = None
+    offset = 0
+    posiciones = {}
+    with open(ruta_log, 'rb') as log, open(ruta_idx + ".tmp", 'w', encoding='utf-8') as idx:
+        for linea in log:
+            try:
+                registro = json.loads(linea)
+                sku = registro.get("sku")
+                tramo, posicion, ultimo_bucket = entradas_indice(offset, registro["timestamp"], sku, ultimo_bucket)
+                if tramo:
+                    idx.write(tramo)
+                if posicion:
+                    posiciones.setdefault(fragmento_de(sku), []).append(posicion)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                pass
+            offset += len(linea)
+    agregar_posiciones(nueva, posiciones)
+    if os.path.exists(carpeta):
+        os.replace(carpeta, carpeta + ".viejo")
+    os.replace(nueva, carpeta)
+    shutil.rmtree(carpeta + ".viejo", ignore_errors=True)
+    os.replace(ruta_idx + ".tmp", ruta_idx)
+
+
+def nombre_rotado(ruta_log, sello):
+    """'historial-<sello>.jsonl' junto a 'ruta_log', con un número si ya existe."""
+    base, extension = os.path.splitext(ruta_log)
+    destino = f"{base}-{sello}{extension}"
+    n = 1
+    while os.path.exists(destino) or os.path.exists(destino + ".gz"):
+        destino = f"{base}-{sello}_{n}{extension}"
+        n += 1
+    return destino
+
+
+def importar_historial_anterior(ruta_log):
+    """
+    Convierte el historial.txt de versiones anteriores (junto a 'ruta_log')
+    en un historial rotado más, con su índice, y lo borra: kardex.py y los
+    reportes lo leen como cualquier otro. Se llama con el bloqueo del
+    historial tomado. Devuelve la ruta nueva, o None si no había nada.
+    """
+    ruta_txt = os.path.join(os.path.dirname(ruta_log), NOMBRE_LOG_ANTERIOR)
+    if not os.path.exists(ruta_txt):
+        return None
+    ruta_tmp = ruta_log + ".anterior.tmp"
+    pendiente = None
+    with open(ruta_txt, encoding='utf-8', errors='replace') as txt, open(ruta_tmp, 'w', encoding='utf-8') as tmp:
+        for linea in txt:
+            linea = linea.rstrip("\n")
+            coincidencia = LINEA_ANTERIOR.match(linea)
+            if coincidencia:
+                if pendiente:
+                    tmp.write(json.dumps(pendiente, ensure_ascii=False) + "\n")
+                fecha, hora, usuario, mensaje = coincidencia.groups()
+                pendiente = {"timestamp": f"{fecha}T{hora}", "usuario": usuario, "accion": "MENSAJE",
+                             "sku": None, "cantidad": None, "mensaje": mensaje}
+            elif pendiente and linea:
+                # Mensaje de varias líneas
+                pendiente["mensaje"] += "\n" + linea
+        if pendiente:
+            tmp.write(json.dumps(pendiente, ensure_ascii=False) + "\n")
+    if pendiente is None:
+        os.remove(ruta_tmp)
+        os.remove(ruta_txt)
+        return None
+    # Con la fecha del último registro: queda antes que los rotados después
+    destino = nombre_rotado(ruta_log, pendiente["timestamp"].replace("T", "_").replace(":", "-"))
+    os.replace(ruta_tmp, destino)
+    # Si se corta acá, kardex.py rearma el índice que falte; el .txt no se vuelve a importar
+    os.remove(ruta_txt)
+    reconstruir_indice(destino, destino + ".idx")
+    return destino
+
+
+def _tamano(archivo):
+    """Tamaño en disco (incluye lo que agregaron otros procesos, a diferencia de tell())."""
+    return os.fstat(archivo.fileno()).st_size
+
+
+def _es_el_mismo(archivo, ruta):
+    try:
+        return os.fstat(archivo.fileno()).st_ino == os.stat(ruta).st_ino
+    except FileNotFoundError:
+        return False
+
+
+class RegistroAcciones:
+    """
+    Historial de acciones con el archivo abierto todo el tiempo y escritura
+    en lotes. Cada registro es un objeto JSON con: timestamp, usuario,
+    accion, sku, cantidad y mensaje.
+
+    Junto al historial se mantiene '<historial>.idx', un índice disperso
+    con la posición (byte) del primer registro de cada hora, y la carpeta
+    '<historial>.skus', con la posición de cada movimiento repartida en
+    FRAGMENTOS_SKU archivos según el SKU. kardex.py lee solo el .idx y el
+    fragmento del SKU consultado, no el historial entero.
+    """
+
+    def __init__(self, ruta, max_buffer=MAX_REGISTROS_EN_BUFFER, intervalo=SEGUNDOS_ENTRE_ESCRITURAS,
+                 tamano_maximo=TAMANO_MAXIMO_LOG, rotar_por_fecha=ROTAR_POR_FECHA, comprimir=COMPRIMIR_ROTADOS):
+        self.ruta = ruta
+        self.ruta_idx = ruta + ".idx"
+        self.carpeta_fragmentos = ruta_fragmentos(ruta)
+        self.max_buffer = max_buffer
+        self.intervalo = intervalo
+        self.tamano_maximo = tamano_maximo
+        self.rotar_por_fecha = rotar_por_fecha
+        self.comprimir = comprimir
+
+        self._lock = threading.RLock()
+        self._archivo = None
+        self._archivo_idx = None
+        self._ultimo_bucket = None
+        self._fecha_archivo = None
+        self._buffer = []
+        self._temporizador = None
+
+    def _abrir(self):
+        # Otra sesión pudo rotar el historial o rearmar el índice: los
+        # descriptores abiertos apuntarían a archivos que ya no son los vigentes
+        if self._archivo is not None and not (_es_el_mismo(self._archivo, self.ruta) and
+                                              _es_el_mismo(self._archivo_idx, self.ruta_idx)):
+            self._cerrar_archivos()
+        if self._archivo is None:
+            os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+            importar_historial_anterior(self.ruta)
+            sin_indice = not (os.path.exists(self.ruta_idx) and os.path.isdir(self.carpeta_fragmentos))
+            if os.path.exists(self.ruta) and os.path.getsize(self.ruta) > 0 and sin_indice:
+                reconstruir_indice(self.ruta, self.ruta_idx)
+            # Binario: los offsets del índice son bytes reales
+            self._archivo = open(self.ruta, 'ab')
+            self._archivo_idx = open(self.ruta_idx, 'a', encoding='utf-8')
+            self._ultimo_bucket = None
+            if _tamano(self._archivo) > 0:
+                fecha = datetime.date.fromtimestamp(os.path.getmtime(self.ruta))
+            else:
+                fecha = datetime.date.today()
+            self._fecha_archivo = fecha
+        return self._archivo
+
+    def registrar(self, accion, usuario="Sistema", sku=None, cantidad=None, mensaje=None, **extra):
+        registro = {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "usuario": usuario,
+            "accion": accion,
+            "sku": sku,
+            "cantidad": cantidad,
+            "mensaje": mensaje,
+        }
+        registro.update(extra)
+        linea = (json.dumps(registro, ensure_ascii=False) + "\n").encode('utf-8')
+
+        with self._lock:
+            self._buffer.append((linea, registro["timestamp"], sku))
+            if len(self._buffer) >= self.max_buffer:
+                self.flush()
+            elif self._temporizador is None:
+                # Si no llegan más registros, igual se escriben en unos segundos
+                self._temporizador = threading.Timer(self.intervalo, self.flush)
+                self._temporizador.daemon = True
+                self._temporizador.start()
+
+    def flush(self):
+        """
+        Escribe en disco todo lo pendiente. Varias sesiones pueden agregar al
+        mismo historial: cada lote se escribe con el bloqueo del archivo
+        tomado ('<historial>.lock') y los offsets se calculan desde el final
+        real del archivo en ese momento, no desde lo que escribió esta sesión.
+        """
+        with self._lock:
+            if self._temporizador is not None:
+                self._temporizador.cancel()
+                self._temporizador = None
+            if not self._buffer:
+                return
+            pendientes = self._buffer
+            self._buffer = []
+            try:
+                os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+                with bloqueo_exclusivo(ruta_bloqueo(self.ruta)):
+                    self._rotar_si_corresponde(sum(len(p[0]) for p in pendientes))
+                    archivo = self._abrir()
+                    offset = _tamano(archivo)
+                    tramos = []
+                    posiciones = {}
+                    for linea, timestamp, sku in pendientes:
+                        tramo, posicion, self._ultimo_bucket = entradas_indice(offset, timestamp, sku,
+                                                                               self._ultimo_bucket)
+                        if tramo:
+                            tramos.append(tramo)
+                        if posicion:
+                            posiciones.setdefault(fragmento_de(sku), []).append(posicion)
+                        offset += len(linea)
+                    archivo.write(b"".join(p[0] for p in pendientes))
+                    archivo.flush()
+                    # Los índices van después: nunca apuntan a datos que aún no están en disco
+                    agregar_posiciones(self.carpeta_fragmentos, posiciones)
+                    self._archivo_idx.write("".join(tramos))
+                    self._archivo_idx.flush()
+            except Exception as e:
+                print(f"Error al escribir en el log: {e}")
+
+    def _rotar_si_corresponde(self, bytes_a_escribir):
+        tamano = _tamano(self._abrir())
+        cambio_de_dia = self.rotar_por_fecha and self._fecha_archivo != datetime.date.today()
+        muy_grande = tamano > 0 and tamano + bytes_a_escribir > self.tamano_maximo
+        if cambio_de_dia or muy_grande:
+            self.rotar()
+
+    def rotar(self):
+        """
+        Cierra el archivo actual y lo renombra con su fecha (opcionalmente
+        comprimido). Su índice y sus fragmentos se renombran igual, sin comprimir.
+        Se llama desde flush(), con el bloqueo del historial tomado.
+        """
+        with self._lock:
+            self._cerrar_archivos()
+            if not os.path.exists(self.ruta) or os.path.getsize(self.ruta) == 0:
+                return None
+            destino = nombre_rotado(self.ruta, datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
+            os.replace(self.ruta, destino)
+            if os.path.exists(self.ruta_idx):
+                os.replace(self.ruta_idx, destino + ".idx")
+            if os.path.exists(self.carpeta_fragmentos):
+                os.replace(self.carpeta_fragmentos, ruta_fragmentos(destino))
+            if self.comprimir:
+                with open(destino, 'rb') as origen, gzip.open(destino + ".gz", 'wb') as comprimido:
+                    shutil.copyfileobj(origen, comprimido)
+                os.remove(destino)
+                destino += ".gz"
+            return destino
+
+    def _cerrar_archivos(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
+        if self._archivo_idx is not None:
+            self._archivo_idx.close()
+            self._archivo_idx = None
+
+    def cerrar(self):
+        with self._lock:
+            self.flush()
+            self._cerrar_archivos()
+
+
+_registro = None
+_usuario_sesion = None
+# Acciones retenidas por diferir_registros() en este hilo (None si no hay uno activo)
+_diferidos = threading.local()
+
+
+def obtener_registro():
+    """Registro de acciones compartido por todo el programa (se crea al primer uso)."""
+    global _registro
+    if _registro is None:
+        _registro = RegistroAcciones(os.path.join(ruta_carpeta_data(), NOMBRE_LOG))
+        atexit.register(_registro.cerrar)
+    return _registro
+
+
+def establecer_usuario(nombre):
+    """Usuario que queda como autor por defecto de las acciones siguientes."""
+    global _usuario_sesion
+    _usuario_sesion = nombre
+
+
+def registrar_accion(mensaje, usuario=None, accion="MENSAJE", sku=None, cantidad=None, **extra):
+    """
+    Guarda una acción en el historial con fecha y hora.
+    'sku' y 'cantidad' son opcionales; sirven para filtrar movimientos después.
+    """
+    if usuario is None:
+        usuario = _usuario_sesion or "Sistema"
+    pendientes = getattr(_diferidos, "pendientes", None)
+    if pendientes is not None:
+        # Con la hora de ahora, no la de cuando se escriba
+        extra.setdefault("timestamp", datetime.datetime.now().isoformat(timespec="seconds"))
+        pendientes.append((mensaje, usuario, accion, sku, cantidad, extra))
+        return
+    obtener_registro().registrar(accion, usuario=usuario, sku=sku, cantidad=cantidad, mensaje=mensaje, **extra)
+
+
+@contextmanager
+def diferir_registros():
+    """
+    Retiene las acciones registradas dentro del bloque y las escribe recién
+    al salir sin error; si sale con una excepción se descartan. Para envolver
+    un db.lote(): el historial solo cuenta lo que de verdad se guardó.
+
+        with diferir_registros(), db.lote():
+            ...
+    """
+    if getattr(_diferidos, "pendientes", None) is not None:
+        # Anidado: el de afuera decide
+        yield
+        return
+    _diferidos.pendientes = []
     try:
-        with open(ruta_log, 'a', encoding='utf-8') as f:
-            f.write(linea)
-    except Exception as e:
-        print(f"Error al escribir en el log: {e}")
\ No newline at end of file
+        yield
+    except BaseException:
+        _diferidos.pendientes = None
+        raise
+    pendientes, _diferidos.pendientes = _diferidos.pendientes, None
+    for mensaje, usuario, accion, sku, cantidad, extra in pendientes:
+        registrar_accion(mensaje, usuario, accion, sku, cantidad, **extra)
@@ -2,10 +2,12 @@ from gestor_datos import GestorDatos
 from auth import autenticar_usuario, registrar_usuario_nuevo
 import os
 import shutil
-import datetime
+import threading
+import respaldos
 from inventory import menu_inventario
 from reports import menu_reportes
 from admin_users import menu_usuarios
+from logger import registrar_accion, establecer_usuario
 
 def limpiar_pantalla():
     # Detecta si es Windows ('nt') o Linux/Mac ('posix')
@@ -37,41 +39,73 @@ def menu_principal(usuario_actual):
         elif opcion == "3" and usuario_actual['rol'] == 'admin':
             menu_usuarios(usuario_actual)
         elif opcion == "0":
+            # Dejamos constancia de cuánto trabajo se ahorró la caché de lectura
+            stats = GestorDatos("productos.json").estadisticas_cache()
+            registrar_accion(f"Caché de productos: {stats['aciertos']} aciertos, {stats['fallos']} fallos")
             print("Saliendo...")
             break
         else:
             print("Opción no válida.")
 
-def realizar_backup_automatico():
-    """Crea una copia de los archivos JSON en la carpeta data/backups"""
-    print("Generando copia de seguridad...")
-    
+def realizar_backup_automatico(origenes=None):
+    """
+    Crea una instantánea incremental de los JSON en data/backups.
+    Si nada cambió desde la última, no escribe nada (ver respaldos.py).
+    'origenes' permite respaldar copias congeladas en lugar de los originales.
+    """
     # Rutas dinámicas (igual que en gestor_datos)
-    ruta_actual = os.path.abspath(__file__)
-    carpeta_proyecto = os.path.dirname(os.path.dirname(ruta_actual))
-    carpeta_data = os.path.join(carpeta_proyecto, "data")
-    carpeta_backups = os.path.join(carpeta_data, "backups")
-    
-    # Crear carpeta backups si no existe
-    if not os.path.exists(carpeta_backups):
-        os.makedirs(carpeta_backups)
+    carpeta_data, carpeta_backups = respaldos.carpetas_por_defecto()
     
-    fecha = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    
-    archivos_a_respaldar = ["productos.json", "usuarios.json"]
-    
-    for archivo in archivos_a_respaldar:
-        origen = os.path.join(carpeta_data, archivo)
-        if os.path.exists(origen):
-            destino = os.path.join(carpeta_backups, f"{archivo}_backup_{fecha}.json")
-            try:
-                shutil.copy2(origen, destino)
-                # print(f"Backup creado: {destino}") # Descomentar si quieres ver el mensaje
-            except Exception as e:
-                print(f"Error backup {archivo}: {e}")
+    try:
+        # Con 'origenes' solo cuentan las copias congeladas: un archivo que no estaba no se lee en vivo
+        resumen = respaldos.realizar_respaldo(None if origenes is not None else carpeta_data, carpeta_backups,
+                                              origenes=origenes)
+        respaldos.aplicar_retencion(carpeta_backups)
+        if resumen:
+            registrar_accion(f"Respaldo {resumen['id']} creado ({resumen['bytes_nuevos']} bytes nuevos)")
+        else:
+            registrar_accion("Respaldo omitido: sin cambios desde la última copia")
+    except Exception as e:
+        registrar_accion(f"Error backup: {e}")
+
+def iniciar_backup_en_segundo_plano():
+    """
+    Marca los archivos (enlaces duros y el tamaño de cada .wal, es
+    inmediato) y hace las copias y el respaldo en otro hilo, para que el
+    login aparezca sin esperar. Devuelve el hilo.
+    """
+    carpeta_data, carpeta_backups = respaldos.carpetas_por_defecto()
+    carpeta_congelada = os.path.join(carpeta_backups, f".congelado-{os.getpid()}")
+    try:
+        marca = respaldos.marcar_archivos(carpeta_data, carpeta_congelada)
+    except Exception as e:
+        print(f"Error backup: {e}")
+        return None
+
+    def trabajo():
+        try:
+            origenes = respaldos.completar_congelado(marca)
+            realizar_backup_automatico(origenes)
+        except Exception as e:
+            registrar_accion(f"Error backup: {e}")
+        finally:
+            shutil.rmtree(carpeta_congelada, ignore_errors=True)
+
+    hilo = threading.Thread(target=trabajo, name="backup-inicio")
+    hilo.start()
+    return hilo
 
 def inicializar_sistema():
-    realizar_backup_automatico()
+    hilo_backup = iniciar_backup_en_segundo_plano()
+    try:
+        iniciar_sesion()
+    finally:
+        # Al salir (normal o con Ctrl+C) esperamos a que la copia termine
+        if hilo_backup and hilo_backup.is_alive():
+            print("Terminando copia de seguridad...")
+            hilo_backup.join()
+
+def iniciar_sesion():
     # 1. Aseguramos que existan datos básicos
     db = GestorDatos("usuarios.json")
     if not db.leer_datos():
@@ -85,6 +119,7 @@ def inicializar_sistema():
     while intentos < 3 and usuario_logueado is None:
         usuario_logueado = autenticar_usuario()
         if usuario_logueado:
+            establecer_usuario(usuario_logueado['username'])
             limpiar_pantalla()
             menu_principal(usuario_logueado)
         else:
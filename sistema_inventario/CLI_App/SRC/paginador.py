@@ -0,0 +1,202 @@
+"""
+Tabla paginada para la consola: muestra una página a la vez sacando las
+filas de un iterador, sin armar la lista completa.
+
+- Siguiente página: sigue consumiendo el mismo iterador (cuesta una página).
+- Anterior / ir a la página N: se vuelve a recorrer desde el principio
+  salteando filas, sin guardarlas.
+- Ordenar por columna: heapq.nsmallest/nlargest sobre el recorrido; se
+  guardan solo las filas hasta la página pedida (o desde el final, si
+  está más cerca del final).
+
+'fuente' es una función que devuelve un iterador nuevo cada vez (por
+ejemplo db.iter_datos). El total de filas se pasa aparte si se conoce sin
+recorrer (db.contar() usa los agregados); si no, se muestra cuando se
+llega al final.
+"""
+import heapq
+import itertools
+
+TAMANO_PAGINA = 20
+
+# (título, campo, ancho, formato de la celda)
+COLUMNAS_PRODUCTOS = [
+    ("SKU", "sku", 10, "{:<10}"),
+    ("NOMBRE", "nombre", 20, "{:<20}"),
+    ("CATEGORIA", "categoria", 15, "{:<15}"),
+    ("PRECIO", "precio", 10, "${:<9}"),
+    ("STOCK", "cantidad", 6, "{}"),
+]
+
+
+def clave_orden(campo):
+    """Ordena textos sin distinguir mayúsculas; los valores vacíos van al final."""
+    def clave(fila):
+        valor = fila[1].get(campo)
+        if isinstance(valor, str):
+            valor = valor.lower()
+        return (valor is None, valor if valor is not None else 0, fila[0])
+    return clave
+
+
+def _valor(valor):
+    return "" if valor is None else valor
+
+
+class Paginador:
+
+    def __init__(self, fuente, total=None, columnas=COLUMNAS_PRODUCTOS, tamano_pagina=TAMANO_PAGINA):
+        self.fuente = fuente
+        self.total = total
+        self.columnas = columnas
+        self.tamano_pagina = tamano_pagina
+        self.pagina = 0
+        self.orden = None  # (campo, descendente) o None para el orden original
+        self._iterador = None  # posicionado justo después de la página actual (sin orden)
+        self._pagina_iterador = None
+        self._mostrada = None  # (pagina, orden, filas) de la última página leída
+
+    def paginas(self):
+        if self.total is None:
+            return None
+        return max(1, -(-self.total // self.tamano_pagina))
+
+    def filas_pagina(self):
+        """Filas de la página actual. Si quedó más allá del final, pasa a la última."""
+        if self._mostrada is not None and self._mostrada[:2] == (self.pagina, self.orden):
+            return self._mostrada[2]
+        filas = self._leer_pagina(self.pagina)
+        if not filas and self.pagina > 0:
+            # Al pasarse del final el total quedó conocido
+            self.pagina = self.paginas() - 1
+            filas = self._leer_pagina(self.pagina)
+        self._mostrada = (self.pagina, self.orden, filas)
+        return filas
+
+    def _leer_pagina(self, pagina):
+        inicio = pagina * self.tamano_pagina
+        if self.orden is not None:
+            return self._pagina_ordenada(inicio)
+
+        if self._iterador is None or self._pagina_iterador != pagina - 1:
+            self._iterador = iter(self.fuente())
+            saltadas = sum(1 for _ in itertools.islice(self._iterador, inicio))
+            if saltadas < inicio:
+                self.total = saltadas
+                self._iterador = None
+                return []
+        filas = list(itertools.islice(self._iterador, self.tamano_pagina))
+        self._pagina_iterador = pagina
+        if len(filas) < self.tamano_pagina:
+            # Se llegó al final del recorrido: ahora se conoce el total
+            self.total = inicio + len(filas)
+            self._iterador = None
+        return filas
+
+    def _pagina_ordenada(self, inicio):
+        campo, descendente = self.orden
+        clave = clave_orden(campo)
+        numeradas = enumerate(self.fuente())
+        fin = inicio + self.tamano_pagina
+        restantes = self.total - inicio if self.total is not None else None
+
+        if restantes is not None and 0 < restantes < fin:
+            # Más cerca del final: se toman las últimas filas en el orden inverso
+            elegir = heapq.nsmallest if descendente else heapq.nlargest
+            filas = elegir(restantes, numeradas, key=clave)[::-1]
+            filas = filas[:self.tamano_pagina]
+        else:
+            elegir = heapq.nlargest if descendente else heapq.nsmallest
+            filas = elegir(fin, numeradas, key=clave)
+            if len(filas) < fin:
+                self.total = len(filas)
+            filas = filas[inicio:]
+        return [fila for _, fila in filas]
+
+    def ordenar(self, campo):
+        """Ordena por 'campo'; si ya estaba ordenado por ese campo, invierte el orden."""
+        if self.orden is not None and self.orden[0] == campo:
+            self.orden = (campo, not self.orden[1])
+        else:
+            self.orden = (campo, False)
+        self.pagina = 0
+        self._iterador = None
+
+    def ir_a(self, pagina):
+        paginas = self.paginas()
+        if paginas is not None:
+            pagina = min(pagina, paginas - 1)
+        self.pagina = max(0, pagina)
+
+    def renderizar(self, filas):
+        lineas = [" ".join(f"{titulo:<{ancho}}" for titulo, _, ancho, _ in self.columnas)]
+        lineas.append("-" * 70)
+        for fila in filas:
+            celdas = (formato.format(_valor(fila.get(campo))) for _, campo, _, formato in self.columnas)
+            lineas.append(" ".join(celdas))
+
+        paginas = self.paginas()
+        de = f"{paginas}" if paginas is not None else "?"
+        total = f"{self.total} productos" if self.total is not None else "total desconocido"
+        orden = ""
+        if self.orden is not None:
+            orden = f" | orden: {self.orden[0]} {'desc' if self.orden[1] else 'asc'}"
+        lineas.append(f"\nPágina {self.pagina + 1} de {de} ({total}){orden}")
+        return "\n".join(lineas)
+
+
+def paginar(fuente, total=None, titulo="LISTADO DE PRODUCTOS", limpiar=None, columnas=COLUMNAS_PRODUCTOS,
+            tamano_pagina=TAMANO_PAGINA):
+    """
+    Bucle interactivo del paginador:
+      Enter/n  siguiente (Enter en la última página sale)
+      p  anterior     g N  ir a la página N
+      o CAMPO  ordenar (otra vez para invertir)     q  salir
+    """
+    paginador = Paginador(fuente, total, columnas, tamano_pagina)
+    campos = {campo: campo for _, campo, _, _ in columnas}
+    campos.update({titulo.lower(): campo for titulo, campo, _, _ in columnas})
+    aviso = ""
+
+    while True:
+        filas = paginador.filas_pagina()
+        if limpiar:
+            limpiar()
+        print(f"\n--- {titulo} ---")
+        if not filas:
+            print("No hay productos para mostrar.")
+            input("\nPresione Enter para volver...")
+            return
+        print(paginador.renderizar(filas))
+        if aviso:
+            print(aviso)
+            aviso = ""
+
+        nombres = "/".join(t.lower() for t, _, _, _ in columnas)
+        comando = input(f"[Enter/n] siguiente  [p] anterior  [g N] ir a  [o {nombres}] ordenar  [q] salir: ")
+        comando = comando.strip().lower()
+        if comando in ("", "n"):
+            paginas = paginador.paginas()
+            if paginas is not None and paginador.pagina + 1 >= paginas:
+                if comando == "":
+                    return
+                aviso = "Ya está en la última página."
+            else:
+                paginador.ir_a(paginador.pagina + 1)
+        elif comando == "p":
+            paginador.ir_a(paginador.pagina - 1)
+        elif comando.startswith("g"):
+            try:
+                paginador.ir_a(int(comando[1:]) - 1)
+            except ValueError:
+                aviso = "Use 'g' y el número de página, por ejemplo: g 5"
+        elif comando.startswith("o"):
+            campo = campos.get(comando[1:].strip())
+            if campo is None:
+                aviso = f"Columna desconocida. Opciones: {nombres}"
+            else:
+                paginador.ordenar(campo)
+        elif comando == "q":
+            return
+        else:
+            aviso = "Comando no válido."
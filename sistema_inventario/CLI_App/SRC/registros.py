@@ -0,0 +1,146 @@
+"""
+Representaciones compactas de los productos en memoria.
+
+- Producto: un registro con __slots__ en lugar de un dict. Ocupa varias
+  veces menos y se comporta como un diccionario de solo lectura (get,
+  [], keys, dict(producto)), así que índices y observadores no cambian.
+  Hacia afuera GestorDatos sigue entregando diccionarios.
+- ColumnasInventario: los campos numéricos de todo el catálogo en arreglos
+  contiguos (módulo array), para cálculos que recorren todas las filas.
+"""
+import math
+from array import array
+
+CAMPOS_PRODUCTO = ("sku", "nombre", "categoria", "precio", "cantidad")
+
+
+class Producto:
+    """
+    Un producto en memoria. Los campos que no son de CAMPOS_PRODUCTO se
+    guardan en 'extra', y un campo que no venía en el dict sigue sin estar
+    (el slot queda vacío), así dict(Producto.desde_dict(d)) == d.
+    """
+    __slots__ = CAMPOS_PRODUCTO + ("extra",)
+
+    @classmethod
+    def desde_dict(cls, datos):
+        producto = cls()
+        extra = None
+        for campo, valor in datos.items():
+            if campo in _CAMPOS:
+                setattr(producto, campo, valor)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[campo] = valor
+        producto.extra = extra
+        return producto
+
+    def a_dict(self):
+        datos = {}
+        for campo in CAMPOS_PRODUCTO:
+            valor = getattr(self, campo, _FALTA)
+            if valor is not _FALTA:
+                datos[campo] = valor
+        if self.extra:
+            datos.update(self.extra)
+        return datos
+
+    # Como dict.copy(): GestorDatos copia los registros de la caché con .copy()
+    copy = a_dict
+
+    def keys(self):
+        return self.a_dict().keys()
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __getitem__(self, campo):
+        if campo in _CAMPOS:
+            try:
+                return getattr(self, campo)
+            except AttributeError:
+                raise KeyError(campo) from None
+        if self.extra and campo in self.extra:
+            return self.extra[campo]
+        raise KeyError(campo)
+
+    def get(self, campo, defecto=None):
+        if campo in _CAMPOS:
+            return getattr(self, campo, defecto)
+        if self.extra:
+            return self.extra.get(campo, defecto)
+        return defecto
+
+    def __contains__(self, campo):
+        return self.get(campo, _FALTA) is not _FALTA
+
+    def __eq__(self, otro):
+        if isinstance(otro, Producto):
+            return self.a_dict() == otro.a_dict()
+        if isinstance(otro, dict):
+            return self.a_dict() == otro
+        return NotImplemented
+
+    def __repr__(self):
+        return f"Producto({self.a_dict()!r})"
+
+
+_CAMPOS = frozenset(CAMPOS_PRODUCTO)
+_FALTA = object()
+
+
+class ColumnasInventario:
+    """
+    El catálogo en columnas: precios en array('d') y cantidades en
+    array('q'), contiguos en memoria (numpy.frombuffer los usa sin copiar),
+    más SKU y nombres en listas. La categoría se guarda como un código en
+    array('q'); 'categorias' es la lista de categorías distintas.
+    Se arma recorriendo los productos una vez (sirve con iter_datos).
+    """
+
+    def __init__(self):
+        self.skus = []
+        self.nombres = []
+        self.categorias = []
+        self.codigos_categoria = array('q')
+        self.precios = array('d')
+        self.cantidades = array('q')
+
+    @classmethod
+    def desde_registros(cls, registros):
+        columnas = cls()
+        codigos = {}
+        # Métodos enlazados una vez: el bucle corre por cada producto
+        skus, nombres = columnas.skus.append, columnas.nombres.append
+        codigo, precios, cantidades = (columnas.codigos_categoria.append, columnas.precios.append,
+                                       columnas.cantidades.append)
+        for registro in registros:
+            if type(registro) is Producto:
+                # Atributos directos: mucho más rápido que pasar por get()
+                sku, nombre = registro.sku, getattr(registro, "nombre", None)
+                categoria = getattr(registro, "categoria", None)
+                precio, cantidad = getattr(registro, "precio", 0.0), getattr(registro, "cantidad", 0)
+            else:
+                sku, nombre, categoria = registro["sku"], registro.get("nombre"), registro.get("categoria")
+                precio, cantidad = registro.get("precio", 0.0), registro.get("cantidad", 0)
+            skus(sku)
+            nombres(nombre)
+            numero = codigos.get(categoria)
+            if numero is None:
+                numero = codigos[categoria] = len(columnas.categorias)
+                columnas.categorias.append(categoria)
+            codigo(numero)
+            precios(precio)
+            cantidades(cantidad)
+        return columnas
+
+    def __len__(self):
+        return len(self.skus)
+
+    def unidades_totales(self):
+        return sum(self.cantidades)
+
+    def valor_total(self):
+        # fsum: la suma exacta no depende del orden de los productos
+        return math.fsum(map(float.__mul__, self.precios, map(float, self.cantidades)))
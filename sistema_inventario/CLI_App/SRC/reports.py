@@ -1,6 +1,11 @@
 from gestor_datos import GestorDatos
 import os
 import datetime
+from kardex import kardex
+import exportador
+import agregados
+import analisis
+from registros import ColumnasInventario
 
 def limpiar_pantalla():
     os.system('cls' if os.name == 'nt' else 'clear')
@@ -13,8 +18,10 @@ def menu_reportes():
         print("\n=== MÓDULO DE REPORTES ===")
         print("1. Ver Alertas de Stock Bajo")
         print("2. Calcular Valor Total del Inventario")
-        print("3. Exportar Inventario a Archivo (.txt)")
-        print("4. Volver al Menú Principal")
+        print("3. Exportar Inventario a Archivo (txt/csv/jsonl)")
+        print("4. Kardex de un Producto (Movimientos y Saldo)")
+        print("5. Análisis de Inventario (categorías, percentiles, ABC)")
+        print("6. Volver al Menú Principal")
         
         opcion = input("\nOpción: ")
         
@@ -25,14 +32,43 @@ def menu_reportes():
         elif opcion == "3":
             exportar_inventario_txt(db)
         elif opcion == "4":
+            reporte_kardex(db)
+        elif opcion == "5":
+            reporte_analisis(db)
+        elif opcion == "6":
             break
         else:
             input("Opción no válida. Enter para continuar...")
 
+STOCK_MINIMO = agregados.STOCK_MINIMO
+
+def productos_stock_bajo(db, stock_minimo=STOCK_MINIMO):
+    """Productos con menos de 'stock_minimo' unidades."""
+    totales = db.agregados()
+    if stock_minimo == totales.stock_minimo:
+        # Ya mantenidos al día: no hace falta recorrer el catálogo
+        return sorted(totales.stock_bajo.values(), key=lambda p: p['sku'])
+    return list(exportador.filtrar_productos(db.iter_datos(), stock_maximo=stock_minimo))
+
+def totales_inventario(db, recalcular=False):
+    """
+    Unidades en bodega y valor total (precio * cantidad) del inventario.
+    Con recalcular=True no se usan los agregados: se recorre el catálogo
+    pasando precios y cantidades a columnas (array) y se suma sobre ellas.
+    """
+    if recalcular:
+        columnas = ColumnasInventario.desde_registros(db.iter_datos())
+        return {"unidades": columnas.unidades_totales(), "valor": columnas.valor_total()}
+    totales = db.agregados()
+    return {"unidades": totales.unidades, "valor": totales.valor}
+
+def totales_por_categoria(db):
+    """{categoria: {"productos", "unidades", "valor"}}"""
+    return db.agregados().por_categoria
+
 def reporte_stock_bajo(db):
     """Filtra y muestra productos con menos de 5 unidades."""
-    productos = db.leer_datos()
-    stock_minimo = 5
+    stock_minimo = STOCK_MINIMO
     
     print(f"\n--- ALERTA: PRODUCTOS CON BAJO STOCK (< {stock_minimo}) ---")
     
@@ -40,10 +76,9 @@ def reporte_stock_bajo(db):
     print(f"{'SKU':<10} {'NOMBRE':<20} {'CANTIDAD'}")
     print("-" * 40)
     
-    for p in productos:
-        if p['cantidad'] < stock_minimo:
-            print(f"{p['sku']:<10} {p['nombre']:<20} {p['cantidad']} UNIDADES")
-            encontrados = True
+    for p in productos_stock_bajo(db, stock_minimo):
+        print(f"{p['sku']:<10} {p['nombre']:<20} {p['cantidad']} UNIDADES")
+        encontrados = True
             
     if not encontrados:
         print("¡Todo en orden! No hay productos con stock crítico.")
@@ -52,49 +87,105 @@ def reporte_stock_bajo(db):
 
 def calcular_valor_total(db):
     """Suma el precio * cantidad de todos los productos."""
-    productos = db.leer_datos()
-    total_general = 0
-    cantidad_productos = 0
-    
-    for p in productos:
-        subtotal = p['precio'] * p['cantidad']
-        total_general += subtotal
-        cantidad_productos += p['cantidad']
+    totales = totales_inventario(db)
         
     print("\n--- RESUMEN FINANCIERO ---")
-    print(f"Total de artículos en bodega: {cantidad_productos}")
-    print(f"Valor total del inventario:   ${total_general:,.2f}")
+    print(f"Total de artículos en bodega: {totales['unidades']}")
+    print(f"Valor total del inventario:   ${totales['valor']:,.2f}")
+    
+    print(f"\n{'CATEGORÍA':<20} {'UNIDADES':>10} {'VALOR':>15}")
+    print("-" * 47)
+    for categoria, subtotal in sorted(totales_por_categoria(db).items(), key=lambda c: str(c[0])):
+        print(f"{str(categoria):<20} {subtotal['unidades']:>10} {subtotal['valor']:>15,.2f}")
     
     input("\nPresione Enter para volver...")
 
 def exportar_inventario_txt(db):
-    """Genera un archivo de texto con la fecha y el listado de productos."""
-    productos = db.leer_datos()
-    
-    # Creamos un nombre de archivo con la fecha de hoy, ej: reporte_2023-10-25.txt
-    fecha_hoy = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M")
-    nombre_archivo = f"reporte_inventario_{fecha_hoy}.txt"
+    """Exporta el inventario (txt, csv o jsonl), con filtros opcionales, sin cargarlo entero."""
+    print("\n--- EXPORTAR INVENTARIO ---")
+    formato = input("Formato (txt/csv/jsonl) [txt]: ").strip().lower() or "txt"
+    categoria = input("Solo la categoría (vacío = todas): ").strip() or None
+    solo_bajo = input(f"¿Solo productos con stock bajo (< {STOCK_MINIMO})? (s/n): ").strip().lower() == 's'
+    comprimir = input("¿Comprimir con gzip? (s/n): ").strip().lower() == 's'
+    carpeta = input("Carpeta de destino (vacío = carpeta actual): ").strip() or None
     
     try:
-        with open(nombre_archivo, 'w', encoding='utf-8') as f:
-            f.write("========================================\n")
-            f.write(f" REPORTE DE INVENTARIO - {fecha_hoy}\n")
-            f.write("========================================\n\n")
-            
-            f.write(f"{'SKU':<10} {'NOMBRE':<20} {'CANTIDAD':<10} {'PRECIO'}\n")
-            f.write("-" * 55 + "\n")
-            
-            for p in productos:
-                linea = f"{p['sku']:<10} {p['nombre']:<20} {p['cantidad']:<10} ${p['precio']}\n"
-                f.write(linea)
-            
-            f.write("\n========================================\n")
-            f.write("FIN DEL REPORTE")
-            
-        print(f"\n[ÉXITO] Reporte generado: {nombre_archivo}")
-        print("Busque el archivo en la carpeta de su proyecto.")
+        ruta, filas = exportador.exportar_inventario(
+            db, formato, carpeta=carpeta, comprimir=comprimir, categoria=categoria,
+            stock_maximo=STOCK_MINIMO if solo_bajo else None)
+        print(f"\n[ÉXITO] Reporte generado: {ruta} ({filas} productos)")
         
     except Exception as e:
         print(f"\n[ERROR] No se pudo exportar el archivo: {e}")
         
-    input("\nPresione Enter para continuar...")
\ No newline at end of file
+    input("\nPresione Enter para continuar...")
+
+def analisis_inventario(db, top=analisis.TOP_N, usar_numpy=None):
+    """Todas las métricas del análisis con un solo recorrido del catálogo (ver analisis.py)."""
+    # Solo lectura: los registros de la caché se recorren sin copiarlos
+    return analisis.analizar_inventario(db.iter_datos(copias=False), top=top, usar_numpy=usar_numpy)
+
+def mostrar_analisis(resultado):
+    print(f"Productos: {resultado['productos']} | Unidades: {resultado['unidades']} | "
+          f"Valor: ${resultado['valor']:,.2f} | Sin stock: {resultado['sin_stock']}")
+
+    print(f"\n{'CATEGORÍA':<20} {'PRODUCTOS':>10} {'UNIDADES':>10} {'VALOR':>15}")
+    print("-" * 58)
+    for categoria, subtotal in sorted(resultado["por_categoria"].items(), key=lambda c: -c[1]["valor"]):
+        print(f"{str(categoria):<20} {subtotal['productos']:>10} {subtotal['unidades']:>10} {subtotal['valor']:>15,.2f}")
+
+    print(f"\n{'PERCENTIL':<10} {'PRECIO':>12} {'STOCK':>10}")
+    print("-" * 34)
+    precios, cantidades = resultado["percentiles"]["precio"], resultado["percentiles"]["cantidad"]
+    for q in analisis.PERCENTILES:
+        if precios[q] is not None:
+            print(f"{'P' + str(q):<10} {precios[q]:>12,.2f} {cantidades[q]:>10,.1f}")
+
+    print(f"\n--- TOP {len(resultado['top_valor'])} POR VALOR ---")
+    print(f"{'SKU':<10} {'NOMBRE':<20} {'STOCK':>8} {'VALOR':>15}")
+    for p in resultado["top_valor"]:
+        print(f"{p['sku']:<10} {str(p['nombre']):<20} {p['cantidad']:>8} {p['valor']:>15,.2f}")
+
+    print(f"\n{'CLASE ABC':<10} {'PRODUCTOS':>10} {'VALOR':>15} {'% VALOR':>9}")
+    print("-" * 47)
+    for clase, datos in resultado["abc"].items():
+        print(f"{clase:<10} {datos['productos']:>10} {datos['valor']:>15,.2f} {datos['porcentaje_valor']:>8.1f}%")
+
+def reporte_analisis(db):
+    print("\n--- ANÁLISIS DE INVENTARIO ---")
+    mostrar_analisis(analisis_inventario(db))
+    input("\nPresione Enter para volver...")
+
+def reporte_kardex(db):
+    """Movimientos de un producto con su saldo, leídos directo del historial indexado."""
+    print("\n--- KARDEX DE PRODUCTO ---")
+    sku = input("SKU del producto: ").strip().upper()
+    desde = input("Desde (AAAA-MM-DD, vacío = inicio): ").strip()
+    hasta = input("Hasta (AAAA-MM-DD, vacío = hoy): ").strip()
+    
+    try:
+        if desde:
+            desde = datetime.datetime.strptime(desde, "%Y-%m-%d").strftime("%Y-%m-%dT00:00:00")
+        if hasta:
+            hasta = datetime.datetime.strptime(hasta, "%Y-%m-%d").strftime("%Y-%m-%dT23:59:59")
+    except ValueError:
+        print("Fecha inválida. Use el formato AAAA-MM-DD.")
+        input("\nPresione Enter para volver...")
+        return
+    
+    producto = db.get(sku)
+    if producto:
+        print(f"\nProducto: {producto['nombre']} | Stock actual: {producto['cantidad']}")
+    
+    print(f"\n{'FECHA':<20} {'MOVIMIENTO':<12} {'ENTRADA':>8} {'SALIDA':>8} {'SALDO':>8}")
+    print("-" * 60)
+    filas = 0
+    for fila in kardex(sku, desde or None, hasta or None):
+        saldo = fila['saldo'] if fila['saldo'] is not None else "-"
+        print(f"{fila['fecha'].replace('T', ' '):<20} {fila['accion']:<12} {fila['entrada']:>8} {fila['salida']:>8} {saldo:>8}")
+        filas += 1
+    
+    if not filas:
+        print("No hay movimientos registrados para ese SKU en el rango indicado.")
+        
+    input("\nPresione Enter para volver...")
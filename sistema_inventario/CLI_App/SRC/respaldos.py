@@ -0,0 +1,534 @@
+"""
+Respaldos incrementales con direccionamiento por contenido.
+
+Estructura dentro de data/backups:
+    objetos/ab/abcd...       bloques comprimidos (zlib), nombrados por su sha256
+    instantaneas/<fecha>.json  qué bloques forman cada archivo en ese momento
+
+Cada archivo se corta en bloques por líneas, eligiendo los cortes según el
+contenido (no por posición). Así, si se agrega un producto al medio del JSON,
+solo cambian uno o dos bloques y el resto se reutiliza. Si ningún archivo
+cambió desde la última instantánea, no se escribe nada.
+
+Varias sesiones pueden respaldar a la vez: "escribir bloques y después la
+instantánea", la restauración y la poda se hacen con el bloqueo de la
+carpeta de respaldos tomado ('backups.lock'), para que la poda nunca borre
+bloques que otra sesión acaba de escribir y todavía no anotó. Primero se
+congelan los datos (bloqueo de cada archivo) y recién después se toma el de
+respaldos: nunca se espera uno teniendo el otro.
+
+Uso desde consola:
+    python respaldos.py listar
+    python respaldos.py crear
+    python respaldos.py restaurar <id o "AAAA-MM-DD HH:MM">
+    python respaldos.py podar
+    python respaldos.py importar-legados [--borrar]
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import zlib
+from contextlib import contextmanager
+from almacenes import escribir_atomico
+from almacen_sqlite import copiar_base
+from concurrencia import bloqueo_exclusivo, ruta_bloqueo
+
+ARCHIVOS_RESPALDABLES = ["productos.json", "usuarios.json", "productos.json.wal", "usuarios.json.wal", "inventario.db"]
+
+FORMATO_ID = "%Y-%m-%d_%H-%M-%S"
+
+# Límites de tamaño de bloque (bytes)
+BLOQUE_MINIMO = 4 * 1024
+BLOQUE_MAXIMO = 256 * 1024
+# Se corta después de una línea cuyo crc32 tenga estos bits en cero (~1 de cada 32 líneas)
+MASCARA_CORTE = 0x1F
+
+# Cuántas instantáneas conservar: la más reciente de cada hora, día y semana
+POLITICA_RETENCION = {"horas": 24, "dias": 7, "semanas": 4}
+
+
+def carpetas_por_defecto():
+    """(carpeta_data, carpeta_backups) calculadas igual que en gestor_datos."""
+    ruta_actual = os.path.abspath(__file__)
+    carpeta_proyecto = os.path.dirname(os.path.dirname(ruta_actual))
+    carpeta_data = os.path.join(carpeta_proyecto, "data")
+    return carpeta_data, os.path.join(carpeta_data, "backups")
+
+
+# --- Bloques y objetos ---
+
+def cortar_en_bloques(archivo):
+    """Genera los bloques (bytes) de un archivo abierto en modo binario."""
+    bloque = []
+    tamano = 0
+    for linea in archivo:
+        bloque.append(linea)
+        tamano += len(linea)
+        corte_natural = tamano >= BLOQUE_MINIMO and (zlib.crc32(linea) & MASCARA_CORTE) == 0
+        if corte_natural or tamano >= BLOQUE_MAXIMO:
+            yield b"".join(bloque)
+            bloque = []
+            tamano = 0
+    if bloque:
+        yield b"".join(bloque)
+
+
+def hash_archivo(ruta):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for parte in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def ruta_objeto(carpeta_backups, hash_hex):
+    return os.path.join(carpeta_backups, "objetos", hash_hex[:2], hash_hex)
+
+
+def guardar_objeto(carpeta_backups, contenido):
+    """Guarda un bloque comprimido si todavía no existe. Devuelve (hash, bytes_escritos)."""
+    hash_hex = hashlib.sha256(contenido).hexdigest()
+    ruta = ruta_objeto(carpeta_backups, hash_hex)
+    if os.path.exists(ruta):
+        return hash_hex, 0
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    comprimido = zlib.compress(contenido, 6)
+    with open(ruta + ".tmp", 'wb') as f:
+        f.write(comprimido)
+    os.replace(ruta + ".tmp", ruta)
+    return hash_hex, len(comprimido)
+
+
+def leer_objeto(carpeta_backups, hash_hex):
+    with open(ruta_objeto(carpeta_backups, hash_hex), 'rb') as f:
+        contenido = zlib.decompress(f.read())
+    if hashlib.sha256(contenido).hexdigest() != hash_hex:
+        raise ValueError(f"Bloque dañado: {hash_hex}")
+    return contenido
+
+
+# --- Instantáneas ---
+
+def carpeta_instantaneas(carpeta_backups):
+    return os.path.join(carpeta_backups, "instantaneas")
+
+
+def listar_instantaneas(carpeta_backups):
+    """Ids de las instantáneas, de la más antigua a la más reciente."""
+    carpeta = carpeta_instantaneas(carpeta_backups)
+    if not os.path.exists(carpeta):
+        return []
+    return sorted(n[:-5] for n in os.listdir(carpeta) if n.endswith(".json"))
+
+
+def leer_instantanea(carpeta_backups, id_instantanea):
+    with open(os.path.join(carpeta_instantaneas(carpeta_backups), id_instantanea + ".json"), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def fecha_de_id(id_instantanea):
+    return datetime.datetime.strptime(id_instantanea[:19], FORMATO_ID)
+
+
+def _nuevo_id(carpeta_backups, fecha):
+    base = fecha.strftime(FORMATO_ID)
+    existentes = set(listar_instantaneas(carpeta_backups))
+    id_instantanea, n = base, 1
+    while id_instantanea in existentes:
+        id_instantanea = f"{base}_{n}"
+        n += 1
+    return id_instantanea
+
+
+def bloqueo_respaldos(carpeta_backups):
+    """Bloqueo exclusivo de la carpeta de respaldos (no es reentrante)."""
+    os.makedirs(carpeta_backups, exist_ok=True)
+    return bloqueo_exclusivo(ruta_bloqueo(carpeta_backups))
+
+
+@contextmanager
+def congelado(carpeta_data, carpeta_backups, archivos=ARCHIVOS_RESPALDABLES):
+    """congelar_archivos en una carpeta temporal que se borra al salir."""
+    os.makedirs(carpeta_backups, exist_ok=True)
+    carpeta_congelada = tempfile.mkdtemp(prefix=".congelado-", dir=carpeta_backups)
+    try:
+        yield congelar_archivos(carpeta_data, carpeta_congelada, archivos)
+    finally:
+        shutil.rmtree(carpeta_congelada, ignore_errors=True)
+
+
+def realizar_respaldo(carpeta_data, carpeta_backups, archivos=ARCHIVOS_RESPALDABLES, fecha=None, origenes=None):
+    """
+    Crea una instantánea de 'archivos' si alguno cambió desde la última.
+    'origenes' permite leer un archivo desde otra ruta (p. ej. una copia
+    congelada) sin cambiar el nombre con el que se guarda.
+    Sin 'origenes', primero se congelan los archivos de carpeta_data (ver
+    congelar_archivos) para no leerlos mientras otra sesión los escribe.
+    Devuelve un resumen (dict) o None si no había nada nuevo.
+    """
+    if origenes is None and carpeta_data is not None:
+        with congelado(carpeta_data, carpeta_backups, archivos) as origenes:
+            return realizar_respaldo(None, carpeta_backups, archivos, fecha, origenes)
+    with bloqueo_respaldos(carpeta_backups):
+        return _respaldar(carpeta_data, carpeta_backups, archivos, fecha, origenes or {})
+
+
+def _respaldar(carpeta_data, carpeta_backups, archivos, fecha, origenes):
+    """realizar_respaldo sin congelar ni bloquear (el bloqueo lo tiene quien llama)."""
+    previas = listar_instantaneas(carpeta_backups)
+    anterior = leer_instantanea(carpeta_backups, previas[-1])["archivos"] if previas else {}
+
+    entradas = {}
+    bytes_nuevos = 0
+    hubo_cambios = False
+    for nombre in archivos:
+        origen = origenes.get(nombre) or (os.path.join(carpeta_data, nombre) if carpeta_data else None)
+        if origen is None or not os.path.exists(origen):
+            if nombre in anterior:
+                hubo_cambios = True
+            continue
+
+        hash_total = hash_archivo(origen)
+        if nombre in anterior and anterior[nombre]["sha256"] == hash_total:
+            entradas[nombre] = anterior[nombre]
+            continue
+
+        hubo_cambios = True
+        bloques = []
+        with open(origen, 'rb') as f:
+            for contenido in cortar_en_bloques(f):
+                hash_bloque, escritos = guardar_objeto(carpeta_backups, contenido)
+                bloques.append(hash_bloque)
+                bytes_nuevos += escritos
+        entradas[nombre] = {"sha256": hash_total, "tamano": os.path.getsize(origen), "bloques": bloques}
+
+    if not hubo_cambios:
+        return None
+
+    fecha = fecha or datetime.datetime.now()
+    id_instantanea = _nuevo_id(carpeta_backups, fecha)
+    os.makedirs(carpeta_instantaneas(carpeta_backups), exist_ok=True)
+    escribir_atomico(os.path.join(carpeta_instantaneas(carpeta_backups), id_instantanea + ".json"),
+                     {"fecha": fecha.isoformat(timespec="seconds"), "archivos": entradas})
+    return {"id": id_instantanea, "archivos": sorted(entradas), "bytes_nuevos": bytes_nuevos}
+
+
+def congelar_archivos(carpeta_data, carpeta_destino, archivos=ARCHIVOS_RESPALDABLES):
+    """
+    Deja en 'carpeta_destino' una foto fija de los archivos para respaldarlos
+    sin que cambien mientras se leen. Es marcar_archivos() seguido de
+    completar_congelado(); el respaldo al iniciar hace la segunda parte en
+    otro hilo. Devuelve {nombre: ruta_congelada} para usar como 'origenes'.
+    """
+    return completar_congelado(marcar_archivos(carpeta_data, carpeta_destino, archivos))
+
+
+def _agrupar(archivos):
+    # Cada archivo con sus acompañantes: productos.json -> [productos.json, productos.json.wal]
+    grupos = {}
+    for nombre in archivos:
+        principal = nombre[:-len(".wal")] if nombre.endswith(".wal") else nombre
+        grupos.setdefault(principal, []).append(nombre)
+    return grupos
+
+
+def marcar_archivos(carpeta_data, carpeta_destino, archivos=ARCHIVOS_RESPALDABLES):
+    """
+    Parte inmediata del congelado. Con el bloqueo de cada archivo tomado
+    ('<archivo>.lock', el mismo que usa GestorDatos al guardar) se hace un
+    enlace duro del JSON (se guarda siempre con os.replace, así que el
+    enlace no cambia) y se anota el inodo y el tamaño de su .wal, que se
+    escribe en el mismo inodo y solo crece hasta que se compacta. Copiar
+    el .wal y la base SQLite queda para completar_congelado().
+    """
+    os.makedirs(carpeta_destino, exist_ok=True)
+    marca = {"carpeta_data": carpeta_data, "carpeta_destino": carpeta_destino, "origenes": {}, "pendientes": []}
+    for principal, nombres in _agrupar(archivos).items():
+        if principal.endswith(".db"):
+            marca["pendientes"].append((principal, nombres, None))
+            continue
+        with bloqueo_exclusivo(ruta_bloqueo(os.path.join(carpeta_data, principal))):
+            estado = {nombre: _estado(os.path.join(carpeta_data, nombre)) for nombre in nombres}
+            for nombre in nombres:
+                if not nombre.endswith(".wal"):
+                    _congelar(carpeta_data, carpeta_destino, nombre, marca["origenes"])
+        if any(nombre.endswith(".wal") and estado[nombre] for nombre in nombres):
+            marca["pendientes"].append((principal, nombres, estado))
+    return marca
+
+
+def completar_congelado(marca):
+    """
+    Copia lo que marcar_archivos() dejó anotado: de cada .wal, los bytes que
+    tenía en ese momento (con el bloqueo tomado, y solo si desde entonces
+    no se compactó; si se compactó, el grupo entero se congela de nuevo) y
+    la base SQLite con su API de backup, que ya da una copia consistente.
+    Devuelve {nombre: ruta_congelada}.
+    """
+    carpeta_data, carpeta_destino = marca["carpeta_data"], marca["carpeta_destino"]
+    origenes = marca["origenes"]
+    for principal, nombres, estado in marca["pendientes"]:
+        if estado is None:
+            _congelar(carpeta_data, carpeta_destino, principal, origenes)
+            continue
+        with bloqueo_exclusivo(ruta_bloqueo(os.path.join(carpeta_data, principal))):
+            if _sin_compactar(carpeta_data, estado):
+                for nombre in nombres:
+                    if nombre.endswith(".wal") and estado[nombre]:
+                        destino = os.path.join(carpeta_destino, nombre)
+                        _copiar_inicio(os.path.join(carpeta_data, nombre), destino, estado[nombre][1])
+                        origenes[nombre] = destino
+            else:
+                for nombre in nombres:
+                    origenes.pop(nombre, None)
+                    _congelar(carpeta_data, carpeta_destino, nombre, origenes)
+    return origenes
+
+
+def _estado(ruta):
+    """(inodo, tamaño) de un archivo, o None si no existe."""
+    try:
+        st = os.stat(ruta)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_size
+
+
+def _sin_compactar(carpeta_data, estado):
+    """True si los archivos siguen siendo los marcados (los .wal, como mucho con más al final)."""
+    for nombre, marcado in estado.items():
+        actual = _estado(os.path.join(carpeta_data, nombre))
+        if not nombre.endswith(".wal"):
+            if (actual and actual[0]) != (marcado and marcado[0]):
+                return False
+        elif marcado and (actual is None or actual[0] != marcado[0] or actual[1] < marcado[1]):
+            return False
+    return True
+
+
+def _copiar_inicio(origen, destino, tamano):
+    if os.path.exists(destino):
+        os.remove(destino)
+    with open(origen, 'rb') as entrada, open(destino, 'wb') as salida:
+        while tamano > 0:
+            parte = entrada.read(min(tamano, 1024 * 1024))
+            if not parte:
+                break
+            salida.write(parte)
+            tamano -= len(parte)
+
+
+def _congelar(carpeta_data, carpeta_destino, nombre, origenes):
+    origen = os.path.join(carpeta_data, nombre)
+    if not os.path.exists(origen):
+        return
+    destino = os.path.join(carpeta_destino, nombre)
+    if os.path.exists(destino):
+        os.remove(destino)
+    if nombre.endswith(".db"):
+        copiar_base(origen, destino)
+    else:
+        try:
+            if nombre.endswith(".wal"):
+                raise OSError("los logs se copian")
+            os.link(origen, destino)
+        except OSError:
+            shutil.copy2(origen, destino)
+    origenes[nombre] = destino
+
+
+def resolver_instantanea(carpeta_backups, referencia):
+    """
+    Acepta un id exacto o una fecha ("AAAA-MM-DD" o "AAAA-MM-DD HH:MM[:SS]")
+    y devuelve el id de la última instantánea tomada hasta ese momento.
+    """
+    ids = listar_instantaneas(carpeta_backups)
+    if referencia in ids:
+        return referencia
+    for formato in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            limite = datetime.datetime.strptime(referencia, formato)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"No existe la instantánea '{referencia}'")
+    if formato == "%Y-%m-%d":
+        limite += datetime.timedelta(days=1, seconds=-1)
+    candidatos = [i for i in ids if fecha_de_id(i) <= limite]
+    if not candidatos:
+        raise ValueError(f"No hay instantáneas anteriores a {referencia}")
+    return candidatos[-1]
+
+
+def restaurar(carpeta_data, carpeta_backups, referencia, archivos=None):
+    """
+    Reconstruye los archivos de una instantánea dentro de carpeta_data.
+    Antes se respalda el estado actual, para poder deshacer la restauración.
+    Devuelve el id restaurado.
+    """
+    with congelado(carpeta_data, carpeta_backups) as origenes, bloqueo_respaldos(carpeta_backups):
+        id_instantanea = resolver_instantanea(carpeta_backups, referencia)
+        instantanea = leer_instantanea(carpeta_backups, id_instantanea)
+        _respaldar(None, carpeta_backups, ARCHIVOS_RESPALDABLES, None, origenes)
+        _reconstruir(carpeta_data, carpeta_backups, instantanea, archivos)
+    return id_instantanea
+
+
+def _reconstruir(carpeta_data, carpeta_backups, instantanea, archivos):
+    for nombre in archivos or ARCHIVOS_RESPALDABLES:
+        destino = os.path.join(carpeta_data, nombre)
+        entrada = instantanea["archivos"].get(nombre)
+        if entrada is None:
+            # Un log de journal que no existía entonces se aplicaría encima
+            # del snapshot restaurado: hay que quitarlo.
+            if nombre.endswith(".wal") and os.path.exists(destino):
+                os.remove(destino)
+            continue
+
+        h = hashlib.sha256()
+        with open(destino + ".tmp", 'wb') as f:
+            for hash_bloque in entrada["bloques"]:
+                contenido = leer_objeto(carpeta_backups, hash_bloque)
+                h.update(contenido)
+                f.write(contenido)
+        if h.hexdigest() != entrada["sha256"]:
+            os.remove(destino + ".tmp")
+            raise ValueError(f"La copia de {nombre} no coincide con su hash")
+        os.replace(destino + ".tmp", destino)
+
+
+# --- Retención ---
+
+def aplicar_retencion(carpeta_backups, politica=POLITICA_RETENCION):
+    """
+    Conserva la instantánea más reciente de cada una de las últimas N horas,
+    N días y N semanas (según 'politica'), borra el resto y luego elimina los
+    bloques que ya nadie usa. Devuelve (instantaneas_borradas, objetos_borrados).
+    """
+    with bloqueo_respaldos(carpeta_backups):
+        return _aplicar_retencion(carpeta_backups, politica)
+
+
+def _aplicar_retencion(carpeta_backups, politica):
+    ids = listar_instantaneas(carpeta_backups)
+    if not ids:
+        return 0, 0
+
+    granularidades = {
+        "horas": lambda f: f.strftime("%Y-%m-%d %H"),
+        "dias": lambda f: f.strftime("%Y-%m-%d"),
+        "semanas": lambda f: "%d-%02d" % f.isocalendar()[:2],
+    }
+    conservar = {ids[-1]}
+    for tipo, limite in politica.items():
+        vistos = set()
+        for id_instantanea in reversed(ids):
+            periodo = granularidades[tipo](fecha_de_id(id_instantanea))
+            if periodo in vistos:
+                continue
+            if len(vistos) >= limite:
+                break
+            vistos.add(periodo)
+            conservar.add(id_instantanea)
+
+    borradas = 0
+    for id_instantanea in ids:
+        if id_instantanea not in conservar:
+            os.remove(os.path.join(carpeta_instantaneas(carpeta_backups), id_instantanea + ".json"))
+            borradas += 1
+
+    return borradas, _recolectar_objetos(carpeta_backups)
+
+
+def recolectar_objetos(carpeta_backups):
+    """Borra los bloques que no aparecen en ninguna instantánea."""
+    with bloqueo_respaldos(carpeta_backups):
+        return _recolectar_objetos(carpeta_backups)
+
+
+def _recolectar_objetos(carpeta_backups):
+    en_uso = set()
+    for id_instantanea in listar_instantaneas(carpeta_backups):
+        for entrada in leer_instantanea(carpeta_backups, id_instantanea)["archivos"].values():
+            en_uso.update(entrada["bloques"])
+
+    borrados = 0
+    carpeta_objetos = os.path.join(carpeta_backups, "objetos")
+    if not os.path.exists(carpeta_objetos):
+        return 0
+    for prefijo in os.listdir(carpeta_objetos):
+        for nombre in os.listdir(os.path.join(carpeta_objetos, prefijo)):
+            if nombre not in en_uso:
+                os.remove(os.path.join(carpeta_objetos, prefijo, nombre))
+                borrados += 1
+    return borrados
+
+
+# --- Copias antiguas (productos.json_backup_<fecha>.json) ---
+
+PATRON_LEGADO = re.compile(r"^(?P<archivo>.+\.json)_backup_(?P<fecha>\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})\.json$")
+
+
+def importar_legados(carpeta_backups, borrar=False):
+    """
+    Convierte las copias completas del sistema anterior en instantáneas.
+    Las copias idénticas se deduplican solas. Devuelve cuántas instantáneas creó.
+    """
+    por_fecha = {}
+    for nombre in os.listdir(carpeta_backups):
+        m = PATRON_LEGADO.match(nombre)
+        if m:
+            por_fecha.setdefault(m.group("fecha"), {})[m.group("archivo")] = os.path.join(carpeta_backups, nombre)
+
+    creadas = 0
+    for fecha in sorted(por_fecha):
+        origenes = por_fecha[fecha]
+        if realizar_respaldo(None, carpeta_backups, archivos=sorted(origenes), origenes=origenes,
+                             fecha=datetime.datetime.strptime(fecha, FORMATO_ID)):
+            creadas += 1
+        if borrar:
+            for ruta in origenes.values():
+                os.remove(ruta)
+    return creadas
+
+
+def main():
+    carpeta_data, carpeta_backups = carpetas_por_defecto()
+
+    parser = argparse.ArgumentParser(description="Respaldos incrementales del inventario")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    sub.add_parser("listar", help="Muestra las instantáneas disponibles")
+    sub.add_parser("crear", help="Crea una instantánea si hubo cambios")
+    p_restaurar = sub.add_parser("restaurar", help="Restaura una instantánea por id o fecha")
+    p_restaurar.add_argument("referencia")
+    p_restaurar.add_argument("--archivo", action="append", help="Restaurar solo este archivo (repetible)")
+    sub.add_parser("podar", help="Aplica la política de retención")
+    p_legados = sub.add_parser("importar-legados", help="Importa las copias completas antiguas")
+    p_legados.add_argument("--borrar", action="store_true", help="Borra las copias antiguas ya importadas")
+    args = parser.parse_args()
+
+    if args.comando == "listar":
+        for id_instantanea in listar_instantaneas(carpeta_backups):
+            archivos = leer_instantanea(carpeta_backups, id_instantanea)["archivos"]
+            print(f"{id_instantanea:<22} {', '.join(sorted(archivos))}")
+    elif args.comando == "crear":
+        resumen = realizar_respaldo(carpeta_data, carpeta_backups)
+        print(f"Instantánea {resumen['id']} creada." if resumen else "Sin cambios desde la última copia.")
+    elif args.comando == "restaurar":
+        id_instantanea = restaurar(carpeta_data, carpeta_backups, args.referencia, args.archivo)
+        print(f"Restaurada la instantánea {id_instantanea}.")
+    elif args.comando == "podar":
+        borradas, objetos = aplicar_retencion(carpeta_backups)
+        print(f"Instantáneas borradas: {borradas} | Bloques liberados: {objetos}")
+    elif args.comando == "importar-legados":
+        print(f"Instantáneas creadas: {importar_legados(carpeta_backups, args.borrar)}")
+
+
+if __name__ == "__main__":
+    main()
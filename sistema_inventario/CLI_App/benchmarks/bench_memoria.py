@@ -0,0 +1,96 @@
+"""
+Memoria máxima (RSS) y tiempo de un recorrido de solo lectura sobre
+productos.json, cargando la lista entera (json.load, lo que hace
+leer_datos) o leyéndola de a un registro (iter_datos).
+
+    python bench_memoria.py                    # 1.000.000 de productos
+    python bench_memoria.py --productos 100000 --salida resultados.json
+
+Cada modo corre en un proceso aparte para que el pico de memoria de uno
+no contamine al otro. El archivo de prueba se genera en una carpeta
+temporal; nunca se toca CLI_App/data.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+CARPETA_SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "SRC")
+CATEGORIAS = ["laptop", "mouse", "teclado", "monitor", "impresora", "audio", "redes", "almacenamiento"]
+
+
+def generar_catalogo(ruta, cantidad):
+    """Escribe un productos.json sintético con el mismo formato (indent=4) que guarda la aplicación."""
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        archivo.write("[\n")
+        for i in range(cantidad):
+            producto = {
+                "sku": f"P{i:07d}",
+                "nombre": f"Producto de prueba {i}",
+                "categoria": CATEGORIAS[i % len(CATEGORIAS)],
+                "precio": round(1 + (i * 7919 % 100000) / 100, 2),
+                "cantidad": i * 31 % 50,
+            }
+            texto = json.dumps(producto, indent=4, ensure_ascii=False)
+            archivo.write(("    " + texto.replace("\n", "\n    ")) + (",\n" if i < cantidad - 1 else "\n"))
+        archivo.write("]")
+
+
+def medir(ruta, modo):
+    """Se ejecuta en el proceso hijo: recorre el archivo y cuenta productos con stock bajo."""
+    sys.path.insert(0, CARPETA_SRC)
+    from almacenes import leer_json, iterar_json
+
+    inicio = time.perf_counter()
+    if modo == "cargar":
+        productos = leer_json(ruta)
+    else:
+        productos = iterar_json(ruta)
+    stock_bajo = sum(1 for p in productos if p["cantidad"] < 5)
+    segundos = time.perf_counter() - inicio
+    # ru_maxrss viene en KB en Linux y en bytes en macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    return {"modo": modo, "segundos": round(segundos, 3), "rss_max_mb": round(rss_mb, 1), "stock_bajo": stock_bajo}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--productos", type=int, default=1_000_000)
+    parser.add_argument("--salida", help="Guardar los resultados en este archivo JSON")
+    parser.add_argument("--medir", nargs=2, metavar=("RUTA", "MODO"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.medir:
+        print(json.dumps(medir(*args.medir)))
+        return 0
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        ruta = os.path.join(carpeta, "productos.json")
+        print(f"Generando {args.productos} productos...")
+        generar_catalogo(ruta, args.productos)
+        tamano_mb = os.path.getsize(ruta) / (1024 * 1024)
+
+        resultados = {"productos": args.productos, "tamano_archivo_mb": round(tamano_mb, 1), "modos": []}
+        for modo in ("cargar", "iterar"):
+            salida = subprocess.run([sys.executable, os.path.abspath(__file__), "--medir", ruta, modo],
+                                    capture_output=True, text=True, check=True)
+            resultados["modos"].append(json.loads(salida.stdout.strip().splitlines()[-1]))
+
+    print(f"\nArchivo: {resultados['tamano_archivo_mb']} MB, {args.productos} productos")
+    print(f"{'MODO':<10} {'SEGUNDOS':>10} {'RSS MÁX (MB)':>14}")
+    for r in resultados["modos"]:
+        print(f"{r['modo']:<10} {r['segundos']:>10} {r['rss_max_mb']:>14}")
+
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as archivo:
+            json.dump(resultados, archivo, indent=4)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+Tiempos de la capa de datos y de los reportes del CLI sobre catálogos
+sintéticos (por defecto 1.000, 100.000 y 1.000.000 de productos) con su
+historial de movimientos.
+
+    python bench_suite.py                              # los tres tamaños
+    python bench_suite.py --tamanos 1000,100000 --repeticiones 5
+    python bench_suite.py --comparar base.json resultados_bench.json
+
+Mide leer_datos (en frío y con caché), guardar_datos, búsqueda por SKU,
+listar_productos (tres páginas), buscar_producto, calcular_valor_total, reporte_stock_bajo,
+exportar_inventario_txt y reporte_kardex. Las funciones de menú se llaman
+tal cual, con input() reemplazado por respuestas fijas y la salida
+descartada.
+
+Cada tamaño corre en un proceso aparte, sobre una copia de SRC con su
+propia carpeta data temporal: nunca se toca CLI_App/data. Se respetan
+INVENTARIO_BACKEND e INVENTARIO_FORMATO. Los resultados se guardan en JSON
+(resultados_bench.json junto a este archivo) con el commit y la versión
+de Python, para comparar entre commits con --comparar. Ese archivo depende
+de la máquina y no se versiona (está en .gitignore).
+"""
+import argparse
+import builtins
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_memoria import generar_catalogo
+
+CARPETA_BENCH = os.path.dirname(os.path.abspath(__file__))
+CARPETA_SRC = os.path.join(CARPETA_BENCH, "..", "SRC")
+SALIDA_POR_DEFECTO = os.path.join(CARPETA_BENCH, "resultados_bench.json")
+TAMANOS_POR_DEFECTO = "1000,100000,1000000"
+ACCIONES_MOVIMIENTO = ["ENTRADA", "SALIDA"]
+
+# Una operación se marca como regresión si tarda más que esto veces la base
+UMBRAL_REGRESION = 1.2
+
+
+def generar_historial(carpeta_data, productos, movimientos, semilla=1):
+    """
+    Escribe historial.jsonl con 'movimientos' entradas/salidas repartidas en
+    30 días (en orden de fecha, como las deja el logger) y arma
+    su índice. Devuelve el SKU con más movimientos, para el kardex.
+    """
+    from logger import NOMBRE_LOG, reconstruir_indice
+
+    aleatorio = random.Random(semilla)
+    inicio = datetime.datetime(2024, 1, 1)
+    paso = 30 * 24 * 3600 / max(movimientos, 1)
+    # Un 10 % de los movimientos se concentra en el primer producto
+    ruta_log = os.path.join(carpeta_data, NOMBRE_LOG)
+    with open(ruta_log, 'w', encoding='utf-8') as log:
+        for i in range(movimientos):
+            sku = "P0000000" if aleatorio.random() < 0.1 else f"P{aleatorio.randrange(productos):07d}"
+            registro = {
+                "timestamp": (inicio + datetime.timedelta(seconds=i * paso)).isoformat(timespec="seconds"),
+                "usuario": "bench",
+                "accion": aleatorio.choice(ACCIONES_MOVIMIENTO),
+                "sku": sku,
+                "cantidad": aleatorio.randint(1, 20),
+                "mensaje": None,
+            }
+            log.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    reconstruir_indice(ruta_log, ruta_log + ".idx")
+    return "P0000000"
+
+
+def cronometrar(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return {"min": round(min(tiempos), 6), "mediana": round(statistics.median(tiempos), 6),
+            "repeticiones": repeticiones}
+
+
+@contextlib.contextmanager
+def sin_interaccion(respuestas):
+    """input() devuelve las respuestas en orden (y después ''); lo impreso se descarta."""
+    pendientes = list(respuestas)
+    original = builtins.input
+    builtins.input = lambda mensaje="": pendientes.pop(0) if pendientes else ""
+    try:
+        with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+            yield
+    finally:
+        builtins.input = original
+
+
+def medir(tamano, repeticiones, movimientos):
+    """Se ejecuta en el proceso hijo, dentro de la copia de SRC."""
+    sys.path.insert(0, os.getcwd())
+    import gestor_datos
+    import inventory
+    import reports
+    from gestor_datos import GestorDatos
+    from logger import ruta_carpeta_data
+
+    carpeta_data = ruta_carpeta_data()
+    generar_catalogo(os.path.join(carpeta_data, "productos.json"), tamano)
+    sku_kardex = generar_historial(carpeta_data, tamano, movimientos)
+    carpeta_exportacion = os.path.join(carpeta_data, "exportaciones")
+    os.makedirs(carpeta_exportacion)
+
+    # Las pantallas se limpian con os.system: en el benchmark no hace falta
+    inventory.limpiar_pantalla = lambda: None
+    reports.limpiar_pantalla = lambda: None
+
+    db = GestorDatos("productos.json")
+    datos = db.leer_datos()
+    skus = [p["sku"] for p in random.Random(2).sample(datos, min(1000, len(datos)))]
+
+    def leer_en_frio():
+        gestor_datos._cache.clear()
+        db.leer_datos()
+
+    def buscar_skus():
+        for sku in skus:
+            db.get(sku)
+
+    def con_respuestas(funcion, *respuestas):
+        def ejecutar():
+            with sin_interaccion(respuestas):
+                funcion(db)
+        return ejecutar
+
+    operaciones = [
+        ("leer_datos_frio", leer_en_frio),
+        ("guardar_datos", lambda: db.guardar_datos(datos)),
+        ("leer_datos_cache", db.leer_datos),
+        (f"get_sku_x{len(skus)}", buscar_skus),
+        ("listar_productos", con_respuestas(inventory.listar_productos, "n", "g 3", "q")),
+        ("buscar_producto", con_respuestas(inventory.buscar_producto, "producto de prueba 12", "q")),
+        ("calcular_valor_total", con_respuestas(reports.calcular_valor_total)),
+        ("reporte_stock_bajo", con_respuestas(reports.reporte_stock_bajo)),
+        ("exportar_inventario_txt", con_respuestas(reports.exportar_inventario_txt,
+                                                   "txt", "", "n", "n", carpeta_exportacion)),
+        ("reporte_kardex", con_respuestas(reports.reporte_kardex, sku_kardex, "", "")),
+    ]
+    return {nombre: cronometrar(funcion, repeticiones) for nombre, funcion in operaciones}
+
+
+def correr_tamano(tamano, repeticiones, movimientos):
+    """Prepara una copia de SRC con data vacía y mide en un proceso hijo."""
+    with tempfile.TemporaryDirectory() as carpeta:
+        src = os.path.join(carpeta, "SRC")
+        shutil.copytree(CARPETA_SRC, src, ignore=shutil.ignore_patterns("__pycache__"))
+        os.makedirs(os.path.join(carpeta, "data"))
+        comando = [sys.executable, os.path.abspath(__file__), "--medir", str(tamano),
+                   "--repeticiones", str(repeticiones), "--movimientos", str(movimientos)]
+        salida = subprocess.run(comando, cwd=src, capture_output=True, text=True)
+        if salida.returncode != 0:
+            raise RuntimeError(f"Falló la medición con {tamano} productos:\n{salida.stderr}")
+        return json.loads(salida.stdout.strip().splitlines()[-1])
+
+
+def commit_actual():
+    try:
+        salida = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=CARPETA_BENCH,
+                                capture_output=True, text=True)
+    except OSError:
+        return None
+    return salida.stdout.strip() or None
+
+
+def comparar(ruta_base, ruta_nueva, umbral=UMBRAL_REGRESION):
+    """Imprime la relación nueva/base de cada operación. Devuelve las regresiones."""
+    with open(ruta_base, 'r', encoding='utf-8') as archivo:
+        base = json.load(archivo)
+    with open(ruta_nueva, 'r', encoding='utf-8') as archivo:
+        nueva = json.load(archivo)
+
+    print(f"Base: {base.get('commit')}  Nuevo: {nueva.get('commit')}")
+    print(f"{'PRODUCTOS':>10} {'OPERACIÓN':<26} {'BASE (s)':>10} {'NUEVO (s)':>10} {'RELACIÓN':>9}")
+    regresiones = []
+    for tamano, operaciones in nueva["resultados"].items():
+        for nombre, medicion in operaciones.items():
+            anterior = base["resultados"].get(tamano, {}).get(nombre)
+            if anterior is None:
+                continue
+            relacion = medicion["mediana"] / anterior["mediana"] if anterior["mediana"] else float("inf")
+            marca = "  <-- más lento" if relacion > umbral else ""
+            if marca:
+                regresiones.append((tamano, nombre, relacion))
+            print(f"{tamano:>10} {nombre:<26} {anterior['mediana']:>10.4f} {medicion['mediana']:>10.4f} "
+                  f"{relacion:>8.2f}x{marca}")
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanos", default=TAMANOS_POR_DEFECTO, help="Cantidades de productos, separadas por coma")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--movimientos", type=int, help="Movimientos del historial (por defecto, uno por producto)")
+    parser.add_argument("--salida", default=SALIDA_POR_DEFECTO, help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", nargs=2, metavar=("BASE", "NUEVO"),
+                        help="Compara dos archivos de resultados y sale con 1 si hay regresiones")
+    parser.add_argument("--medir", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.comparar:
+        return 1 if comparar(*args.comparar) else 0
+
+    if args.medir is not None:
+        movimientos = args.movimientos if args.movimientos is not None else args.medir
+        print(json.dumps(medir(args.medir, args.repeticiones, movimientos)))
+        return 0
+
+    resultados = {
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit_actual(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "backend": os.environ.get("INVENTARIO_BACKEND", "json"),
+        "formato": os.environ.get("INVENTARIO_FORMATO", "json"),
+        "repeticiones": args.repeticiones,
+        "resultados": {},
+    }
+    for tamano in (int(t) for t in args.tamanos.split(",")):
+        movimientos = args.movimientos if args.movimientos is not None else tamano
+        print(f"Midiendo {tamano} productos, {movimientos} movimientos...")
+        resultados["resultados"][str(tamano)] = correr_tamano(tamano, args.repeticiones, movimientos)
+
+        print(f"{'OPERACIÓN':<26} {'MÍN (s)':>10} {'MEDIANA (s)':>12}")
+        for nombre, medicion in resultados["resultados"][str(tamano)].items():
+            print(f"{nombre:<26} {medicion['min']:>10.4f} {medicion['mediana']:>12.4f}")
+
+    with open(args.salida, 'w', encoding='utf-8') as archivo:
+        json.dump(resultados, archivo, indent=4)
+    print(f"\nResultados guardados en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Pruebas de los agregados guardados (productos.json.agregados) en modo
+journal, sobre una copia de SRC con su propia carpeta data temporal.
+
+Ejecutar desde CLI_App:
+    python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+CARPETA_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SRC")
+
+CARGAR = """
+from gestor_datos import GestorDatos
+db = GestorDatos("productos.json")
+db.guardar_datos([{"sku": f"S{i:03d}", "nombre": f"P{i}", "categoria": "C", "precio": 2.0, "cantidad": i % 10}
+                  for i in range(200)])
+"""
+
+# Escribe varios movimientos y anota si el .agregados se tocó antes de salir
+MOVER = """
+import os
+from gestor_datos import GestorDatos
+db = GestorDatos("productos.json")
+ruta = db.ruta + ".agregados"
+antes = os.stat(ruta).st_mtime_ns
+for i in range(20):
+    db.actualizar(f"S{i:03d}", lambda r: r.update(cantidad=r["cantidad"] + 10))
+print(os.stat(ruta).st_mtime_ns == antes)
+"""
+
+LEER = """
+import json
+from gestor_datos import GestorDatos
+from agregados import leer_agregados, ruta_agregados
+db = GestorDatos("productos.json")
+guardados = leer_agregados(ruta_agregados(db.ruta), db._firma())
+print(json.dumps({"vigentes": guardados is not None, "unidades": guardados and guardados.unidades,
+                  "stock_bajo": guardados and len(guardados.stock_bajo),
+                  "diferencias": db.verificar_agregados()}))
+"""
+
+
+class AgregadosJournalTest(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        shutil.copytree(CARPETA_SRC, os.path.join(self.carpeta, "SRC"),
+                        ignore=shutil.ignore_patterns("__pycache__"))
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+    def correr(self, codigo):
+        entorno = dict(os.environ, INVENTARIO_JOURNAL="1")
+        proceso = subprocess.run([sys.executable, "-c", codigo], cwd=os.path.join(self.carpeta, "SRC"),
+                                 env=entorno, capture_output=True, text=True)
+        self.assertEqual(proceso.returncode, 0, proceso.stderr)
+        return proceso.stdout.strip()
+
+    def test_no_se_reescriben_en_cada_cambio_y_quedan_al_dia_al_salir(self):
+        self.correr(CARGAR)
+        self.assertEqual(self.correr(MOVER), "True")
+
+        leidos = json.loads(self.correr(LEER))
+        self.assertTrue(leidos["vigentes"])
+        self.assertEqual(leidos["diferencias"], [])
+        # 200 productos con cantidad i % 10 (900 unidades) y 10 más en cada uno de los 20 movidos
+        self.assertEqual(leidos["unidades"], 900 + 200)
+        self.assertEqual(leidos["stock_bajo"], 100 - 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
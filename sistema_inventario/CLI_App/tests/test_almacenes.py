@@ -0,0 +1,90 @@
+"""
+Pruebas de los almacenes (almacenes.py) al cambiar entre modo JSON y journal.
+
+Ejecutar desde CLI_App:
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SRC"))
+
+from almacen_sqlite import exportar_a_json, migrar_desde_json  # noqa: E402
+from almacenes import AlmacenJSON, AlmacenJournal  # noqa: E402
+from concurrencia import bloqueo_exclusivo, leer_version, ruta_bloqueo  # noqa: E402
+
+
+def producto(sku, cantidad):
+    return {"sku": sku, "nombre": sku, "categoria": "C", "precio": 1.0, "cantidad": cantidad}
+
+
+class CambioDeModoTest(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.ruta = os.path.join(self.carpeta, "productos.json")
+        AlmacenJSON(self.ruta, clave="sku").guardar([producto("J1", 1), producto("J2", 2)])
+        # Una sesión en modo journal borra J1: queda solo en el .wal
+        journal = AlmacenJournal(self.ruta, "sku")
+        journal.cargar()
+        journal.aplicar([{"op": "delete", "clave": "J1"}], [])
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+    def skus(self, almacen):
+        return sorted(r["sku"] for r in almacen.cargar())
+
+    def test_modo_json_ve_los_cambios_del_journal(self):
+        almacen = AlmacenJSON(self.ruta, clave="sku")
+        self.assertEqual(self.skus(almacen), ["J2"])
+        self.assertEqual(sorted(r["sku"] for r in almacen.iterar()), ["J2"])
+
+    def test_escribir_en_modo_json_vuelca_el_log(self):
+        almacen = AlmacenJSON(self.ruta, clave="sku")
+        datos = almacen.cargar()
+        datos[0]["cantidad"] = 7
+        almacen.aplicar([], datos)
+
+        self.assertEqual(os.path.getsize(self.ruta + ".wal"), 0)
+        # Volver al modo journal no reaplica el borrado viejo ni pisa la cantidad nueva
+        registros = AlmacenJournal(self.ruta, "sku").cargar()
+        self.assertEqual([(r["sku"], r["cantidad"]) for r in registros], [("J2", 7)])
+
+
+class ExportarTest(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.ruta = os.path.join(self.carpeta, "productos.json")
+        AlmacenJSON(self.ruta, clave="sku").guardar([producto("E1", 1)])
+        migrar_desde_json(self.carpeta)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+    def test_espera_al_que_esta_guardando_y_sube_la_version(self):
+        version = leer_version(ruta_bloqueo(self.ruta))
+        listo = threading.Event()
+
+        def exportar():
+            exportar_a_json(self.carpeta)
+            listo.set()
+
+        with bloqueo_exclusivo(ruta_bloqueo(self.ruta)):
+            hilo = threading.Thread(target=exportar)
+            hilo.start()
+            self.assertFalse(listo.wait(0.3))
+        hilo.join(5)
+
+        self.assertTrue(listo.is_set())
+        # Las sesiones abiertas ven otra versión y recargan
+        self.assertGreater(leer_version(ruta_bloqueo(self.ruta)), version)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""
+Pruebas de 'inventario.py batch' sobre una copia de SRC con su propia
+carpeta data temporal (nunca se toca CLI_App/data).
+
+Ejecutar desde CLI_App:
+    python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+CARPETA_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SRC")
+
+
+class BatchTest(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        shutil.copytree(CARPETA_SRC, os.path.join(self.carpeta, "SRC"),
+                        ignore=shutil.ignore_patterns("__pycache__"))
+        self.ruta_historial = os.path.join(self.carpeta, "data", "historial.jsonl")
+        self.inventario("product", "add", "--sku", "A1", "--nombre", "Tornillo", "--categoria", "Ferretería",
+                        "--precio", "1", "--cantidad", "10")
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+    def inventario(self, *argumentos, codigo=0):
+        proceso = subprocess.run([sys.executable, "inventario.py", *argumentos], cwd=os.path.join(self.carpeta, "SRC"),
+                                 capture_output=True, text=True)
+        self.assertEqual(proceso.returncode, codigo, proceso.stderr)
+        return proceso.stdout
+
+    def historial(self):
+        with open(self.ruta_historial, 'rb') as f:
+            return f.read()
+
+    def test_lote_fallido_no_deja_rastro_en_el_historial(self):
+        antes = self.historial()
+        ruta_lote = os.path.join(self.carpeta, "lote.txt")
+        with open(ruta_lote, 'wb') as f:
+            f.write(b"movement apply --sku A1 --tipo ENTRADA --cantidad 5\n")
+            # Más allá del primer bloque que se decodifica, una línea que no es UTF-8: el lote se corta a la mitad
+            f.write(b"# relleno\n" * 2000)
+            f.write(b"movement apply --sku A1 --tipo SALIDA --cantidad 1 \xff\n")
+
+        self.inventario("batch", ruta_lote, codigo=1)
+
+        self.assertEqual(self.historial(), antes)
+        producto = json.loads(self.inventario("product", "get", "A1", "--format", "json"))
+        self.assertEqual(producto["cantidad"], 10)
+
+    def test_lote_guardado_queda_en_el_historial(self):
+        ruta_lote = os.path.join(self.carpeta, "lote.txt")
+        with open(ruta_lote, 'w', encoding='utf-8') as f:
+            f.write("movement apply --sku A1 --tipo ENTRADA --cantidad 5\n")
+
+        self.inventario("batch", ruta_lote)
+
+        ultimo = json.loads(self.historial().splitlines()[-1])
+        self.assertEqual((ultimo["accion"], ultimo["sku"], ultimo["cantidad"]), ("ENTRADA", "A1", 5))
+
+    def test_usuario_de_cada_linea(self):
+        ruta_lote = os.path.join(self.carpeta, "lote.txt")
+        with open(ruta_lote, 'w', encoding='utf-8') as f:
+            f.write("--usuario ana movement apply --sku A1 --tipo ENTRADA --cantidad 5\n")
+            f.write("movement apply --sku A1 --tipo SALIDA --cantidad 1\n")
+
+        self.inventario("--usuario", "lote", "batch", ruta_lote)
+
+        ultimos = [json.loads(linea) for linea in self.historial().splitlines()[-2:]]
+        self.assertEqual([(r["accion"], r["usuario"]) for r in ultimos], [("ENTRADA", "ana"), ("SALIDA", "lote")])
+
+
+if __name__ == "__main__":
+    unittest.main()
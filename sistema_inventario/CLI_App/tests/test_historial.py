@@ -0,0 +1,109 @@
+"""
+Pruebas del historial (logger + kardex) con varias sesiones escribiendo a la vez.
+
+Ejecutar desde CLI_App:
+    python -m unittest discover tests
+"""
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+CARPETA_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SRC")
+sys.path.insert(0, CARPETA_SRC)
+
+import kardex  # noqa: E402
+from logger import NOMBRE_LOG, fragmento_de, ruta_fragmento, ruta_fragmentos  # noqa: E402
+
+# Cada proceso escribe sus registros de a lotes de 10, todos a la vez
+ESCRITOR = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from logger import RegistroAcciones
+registro = RegistroAcciones(sys.argv[2], max_buffer=10, intervalo=60)
+for i in range(int(sys.argv[4])):
+    registro.registrar("ENTRADA", usuario="test", sku=sys.argv[3], cantidad=1, saldo=i + 1)
+registro.flush()
+"""
+
+REGISTROS_POR_PROCESO = 200
+
+
+class EscritoresConcurrentesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.ruta_log = os.path.join(self.carpeta, NOMBRE_LOG)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+    def test_dos_procesos_mismo_historial(self):
+        procesos = [
+            subprocess.Popen([sys.executable, "-c", ESCRITOR, CARPETA_SRC, self.ruta_log, sku,
+                              str(REGISTROS_POR_PROCESO)])
+            for sku in ("A", "B")
+        ]
+        for proceso in procesos:
+            self.assertEqual(proceso.wait(timeout=60), 0)
+
+        for sku in ("A", "B"):
+            filas = list(kardex.kardex(sku, carpeta_data=self.carpeta))
+            self.assertEqual(len(filas), REGISTROS_POR_PROCESO)
+            self.assertEqual([f["saldo"] for f in filas], list(range(1, REGISTROS_POR_PROCESO + 1)))
+
+    def test_indice_desfasado_se_rearma(self):
+        subprocess.run([sys.executable, "-c", ESCRITOR, CARPETA_SRC, self.ruta_log, "A", "20"], check=True)
+        # Posiciones corridas (como las que dejaba tell() con dos sesiones)
+        ruta = ruta_fragmento(ruta_fragmentos(self.ruta_log), fragmento_de("A"))
+        with open(ruta, 'w', encoding='utf-8') as fragmento:
+            for offset in (0, 7, 50, 10 ** 6):
+                fragmento.write(f'["2000-01-01T00", {offset}, "A"]\n')
+
+        filas = list(kardex.kardex("A", carpeta_data=self.carpeta))
+        self.assertEqual(len(filas), 20)
+
+    def test_rango_con_tramo_desfasado_y_linea_cortada(self):
+        subprocess.run([sys.executable, "-c", ESCRITOR, CARPETA_SRC, self.ruta_log, "A", "20"], check=True)
+        with open(self.ruta_log + ".idx", 'w', encoding='utf-8') as idx:
+            idx.write('{"b": "2000-01-01T00", "o": 7}\n')
+        # Una sesión que se cortó a mitad de una línea
+        with open(self.ruta_log, 'ab') as log:
+            log.write(b'{"timestamp": "2000-01-01T00:00:00", "sku": "A", "acc')
+
+        registros = list(kardex.movimientos_en_rango("2000-01-01T00:00:00", carpeta_data=self.carpeta))
+        self.assertEqual(len(registros), 20)
+
+    def test_indice_disperso(self):
+        subprocess.run([sys.executable, "-c", ESCRITOR, CARPETA_SRC, self.ruta_log, "A", "200"], check=True)
+        # Todo en la misma hora: una sola línea en el .idx, no una por registro
+        with open(self.ruta_log + ".idx", encoding='utf-8') as idx:
+            self.assertLessEqual(len(idx.readlines()), 2)
+
+    def test_historial_anterior_sin_fragmentos(self):
+        # Un .idx del formato anterior (una línea por registro) y sin carpeta .skus
+        subprocess.run([sys.executable, "-c", ESCRITOR, CARPETA_SRC, self.ruta_log, "A", "20"], check=True)
+        shutil.rmtree(ruta_fragmentos(self.ruta_log))
+        with open(self.ruta_log + ".idx", 'w', encoding='utf-8') as idx:
+            idx.write('{"b": "2000-01-01T00", "o": 0}\n{"b": "2000-01-01T00", "o": 0, "s": "A"}\n')
+
+        self.assertEqual(len(list(kardex.kardex("A", carpeta_data=self.carpeta))), 20)
+
+    def test_importa_el_historial_de_texto_anterior(self):
+        with open(os.path.join(self.carpeta, "historial.txt"), 'w', encoding='utf-8') as txt:
+            txt.write("[2020-05-01 09:00:00] - ADMIN: Inicio de sesión\n")
+            txt.write("[2020-05-01 09:05:00] - ANA: Error: algo\nen dos líneas\n")
+        subprocess.run([sys.executable, "-c", ESCRITOR, CARPETA_SRC, self.ruta_log, "A", "3"], check=True)
+
+        self.assertFalse(os.path.exists(os.path.join(self.carpeta, "historial.txt")))
+        registros = list(kardex.movimientos_en_rango("2020-01-01T00:00:00", carpeta_data=self.carpeta))
+        self.assertEqual([(r["timestamp"], r["usuario"], r["mensaje"]) for r in registros[:2]],
+                         [("2020-05-01T09:00:00", "ADMIN", "Inicio de sesión"),
+                          ("2020-05-01T09:05:00", "ANA", "Error: algo\nen dos líneas")])
+        self.assertEqual(len(registros), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
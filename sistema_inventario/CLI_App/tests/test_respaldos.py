@@ -0,0 +1,131 @@
+"""
+Pruebas de respaldos.py frente a otras sesiones que escriben los datos.
+
+Ejecutar desde CLI_App:
+    python -m unittest discover tests
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "SRC"))
+
+import respaldos  # noqa: E402
+from concurrencia import bloqueo_exclusivo, ruta_bloqueo  # noqa: E402
+
+
+class CongelarTest(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.carpeta_data = os.path.join(self.carpeta, "data")
+        self.carpeta_backups = os.path.join(self.carpeta_data, "backups")
+        os.makedirs(self.carpeta_data)
+        self.ruta_productos = os.path.join(self.carpeta_data, "productos.json")
+        with open(self.ruta_productos, 'w', encoding='utf-8') as f:
+            json.dump([{"sku": "A", "cantidad": 1}], f)
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+    def test_espera_al_que_esta_guardando(self):
+        # Mientras otra sesión tiene el bloqueo, congelar no puede tomar la foto
+        listo = threading.Event()
+        resultado = {}
+
+        def congelar():
+            resultado["origenes"] = respaldos.congelar_archivos(
+                self.carpeta_data, os.path.join(self.carpeta_backups, ".congelado"))
+            listo.set()
+
+        with bloqueo_exclusivo(ruta_bloqueo(self.ruta_productos)):
+            hilo = threading.Thread(target=congelar)
+            hilo.start()
+            self.assertFalse(listo.wait(0.3))
+            # Lo que se escribe antes de soltar el bloqueo es lo que queda congelado
+            with open(self.ruta_productos + ".tmp", 'w', encoding='utf-8') as f:
+                json.dump([{"sku": "A", "cantidad": 2}], f)
+            os.replace(self.ruta_productos + ".tmp", self.ruta_productos)
+        hilo.join(5)
+
+        with open(resultado["origenes"]["productos.json"], encoding='utf-8') as f:
+            self.assertEqual(json.load(f)[0]["cantidad"], 2)
+
+    def test_marcar_no_copia_y_completar_toma_el_wal_de_ese_momento(self):
+        ruta_wal = self.ruta_productos + ".wal"
+        with open(ruta_wal, 'w', encoding='utf-8') as f:
+            f.write('{"op": "delete", "clave": "A"}\n')
+        destino = os.path.join(self.carpeta_backups, ".congelado")
+
+        marca = respaldos.marcar_archivos(self.carpeta_data, destino)
+        self.assertEqual(sorted(os.listdir(destino)), ["productos.json"])
+        # Lo que se agrega después de marcar no entra en la copia
+        with open(ruta_wal, 'a', encoding='utf-8') as f:
+            f.write('{"op": "upsert", "clave": "B", "datos": {"sku": "B"}}\n')
+        origenes = respaldos.completar_congelado(marca)
+
+        with open(origenes["productos.json.wal"], encoding='utf-8') as f:
+            self.assertEqual(f.read(), '{"op": "delete", "clave": "A"}\n')
+
+    def test_compactado_entre_marcar_y_completar_se_congela_de_nuevo(self):
+        ruta_wal = self.ruta_productos + ".wal"
+        with open(ruta_wal, 'w', encoding='utf-8') as f:
+            f.write('{"op": "delete", "clave": "A"}\n')
+        marca = respaldos.marcar_archivos(self.carpeta_data, os.path.join(self.carpeta_backups, ".congelado"))
+        # Compactación: snapshot nuevo y log vacío
+        with open(self.ruta_productos + ".tmp", 'w', encoding='utf-8') as f:
+            json.dump([], f)
+        os.replace(self.ruta_productos + ".tmp", self.ruta_productos)
+        open(ruta_wal, 'w').close()
+
+        origenes = respaldos.completar_congelado(marca)
+        with open(origenes["productos.json"], encoding='utf-8') as f:
+            self.assertEqual(json.load(f), [])
+        self.assertEqual(os.path.getsize(origenes["productos.json.wal"]), 0)
+
+    def test_respaldo_sin_origenes_no_deja_copias(self):
+        resumen = respaldos.realizar_respaldo(self.carpeta_data, self.carpeta_backups)
+        self.assertEqual(resumen["archivos"], ["productos.json"])
+        self.assertEqual(sorted(os.listdir(self.carpeta_backups)), ["instantaneas", "objetos"])
+
+
+class PodaConcurrenteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        self.carpeta_backups = os.path.join(self.carpeta, "backups")
+        os.makedirs(respaldos.carpeta_instantaneas(self.carpeta_backups))
+
+    def tearDown(self):
+        shutil.rmtree(self.carpeta, ignore_errors=True)
+
+    def test_poda_no_borra_bloques_de_un_respaldo_en_curso(self):
+        # Otra sesión escribió un bloque y todavía no escribió su instantánea
+        terminada = threading.Event()
+        resultado = {}
+
+        def podar():
+            resultado["poda"] = respaldos.aplicar_retencion(self.carpeta_backups)
+            terminada.set()
+
+        with respaldos.bloqueo_respaldos(self.carpeta_backups):
+            hash_bloque, _ = respaldos.guardar_objeto(self.carpeta_backups, b"contenido\n")
+            hilo = threading.Thread(target=podar)
+            hilo.start()
+            self.assertFalse(terminada.wait(0.3))
+            respaldos.escribir_atomico(
+                os.path.join(respaldos.carpeta_instantaneas(self.carpeta_backups), "2026-01-01_00-00-00.json"),
+                {"fecha": "2026-01-01T00:00:00",
+                 "archivos": {"productos.json": {"sha256": "", "tamano": 10, "bloques": [hash_bloque]}}})
+        hilo.join(5)
+
+        self.assertEqual(resultado["poda"], (0, 0))
+        self.assertEqual(respaldos.leer_objeto(self.carpeta_backups, hash_bloque), b"contenido\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Registra las señales que mantienen el índice de búsqueda
+        from . import busqueda  # noqa: F401
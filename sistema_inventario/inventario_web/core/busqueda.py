@@ -0,0 +1,223 @@
+"""
+Búsqueda de productos por texto (catálogo público y lista de productos).
+
+Un motor por base de datos, todos con la misma interfaz:
+- SQLite: tabla FTS5 'core_producto_fts' (sku, nombre, categoria), ordenada
+  por bm25. Se mantiene con las señales de Producto (guardar / borrar).
+- PostgreSQL: índice GIN sobre to_tsvector(...) más un índice de trigramas
+  (pg_trgm) para coincidencias en medio de una palabra. Los índices los
+  mantiene la base, no hacen falta señales.
+- Otros (o SQLite sin FTS5): icontains, como antes.
+
+Cada palabra buscada se toma como prefijo: "lap del" encuentra "Laptop Dell".
+FTS5 no encuentra texto en medio de una palabra ("ador" en "Procesador"):
+si no encuentra nada, se busca con icontains, como hace PostgreSQL con ILIKE.
+
+Los resultados no tienen tope: el listado pide solo las posiciones del
+ranking que necesita la página que muestra (ver ventana_pagina).
+Las tablas e índices se crean en la migración 0006_busqueda; si se cargan
+productos sin pasar por save() (bulk_create, SQL directo) se reconstruye con
+    python manage.py reconstruir_busqueda
+"""
+import re
+
+from django.db import connection, models
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Producto
+from .paginacion import decodificar_cursor, tamano_pedido
+
+# Resultados que se rankean cuando no se pide una ventana (buscar_productos sin 'hasta')
+LIMITE_RESULTADOS = 200
+
+TABLA_FTS = 'core_producto_fts'
+# Pesos bm25 por columna (sku, nombre, categoria): coincidir en el SKU pesa más
+PESOS_FTS = (10.0, 5.0, 1.0)
+# Debe ser la misma expresión de los índices de la migración para que PostgreSQL los use
+TEXTO_PG = "(sku || ' ' || nombre || ' ' || categoria)"
+
+
+def palabras(texto):
+    return re.findall(r"\w+", texto.lower())
+
+
+class MotorBusqueda:
+    """
+    Interfaz común. buscar() devuelve los pk de los primeros 'limite'
+    resultados en orden de relevancia; coincidencias(), un filtro (Q) con
+    todos los que coinciden, sin orden ni tope (para totales).
+    """
+
+    def indexar(self, producto):
+        pass
+
+    def quitar(self, pk):
+        pass
+
+    def reconstruir(self):
+        pass
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS):
+        raise NotImplementedError
+
+    def coincidencias(self, texto):
+        raise NotImplementedError
+
+
+class MotorBasico(MotorBusqueda):
+    """LIKE '%q%' sobre las tres columnas: recorre la tabla, pero funciona en cualquier base."""
+
+    def coincidencias(self, texto):
+        filtro = models.Q()
+        for palabra in palabras(texto):
+            filtro &= (models.Q(nombre__icontains=palabra) | models.Q(categoria__icontains=palabra) |
+                       models.Q(sku__icontains=palabra))
+        # Sin palabras no coincide nada (un Q vacío dejaría pasar todo)
+        return filtro if filtro else models.Q(pk__in=[])
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS):
+        if not palabras(texto):
+            return []
+        consulta = Producto.objects.filter(self.coincidencias(texto)).order_by('categoria', 'nombre', 'id')
+        return list(consulta.values_list('pk', flat=True)[:limite])
+
+
+class MotorFTS5(MotorBusqueda):
+
+    def indexar(self, producto):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLA_FTS} WHERE rowid = %s", [producto.pk])
+            cursor.execute(f"INSERT INTO {TABLA_FTS} (rowid, sku, nombre, categoria) VALUES (%s, %s, %s, %s)",
+                           [producto.pk, producto.sku, producto.nombre, producto.categoria])
+
+    def quitar(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLA_FTS} WHERE rowid = %s", [pk])
+
+    def reconstruir(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLA_FTS}")
+            cursor.execute(f"INSERT INTO {TABLA_FTS} (rowid, sku, nombre, categoria) "
+                           f"SELECT id, sku, nombre, categoria FROM core_producto")
+
+    @staticmethod
+    def _consulta(texto):
+        # Cada palabra entre comillas (sin operadores de FTS5) y con * para buscar por prefijo
+        return " ".join(f'"{p}"*' for p in palabras(texto))
+
+    def _encuentra_algo(self, consulta):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT 1 FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s LIMIT 1", [consulta])
+            return cursor.fetchone() is not None
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS):
+        consulta = self._consulta(texto)
+        if not consulta:
+            return []
+        pesos = ", ".join(str(p) for p in PESOS_FTS)
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s "
+                           f"ORDER BY bm25({TABLA_FTS}, {pesos}), rowid LIMIT %s", [consulta, limite])
+            pks = [fila[0] for fila in cursor.fetchall()]
+        # Nada por prefijo: se prueba en medio de las palabras, igual que con PostgreSQL
+        return pks or MotorBasico().buscar(texto, limite)
+
+    def coincidencias(self, texto):
+        consulta = self._consulta(texto)
+        if not consulta or not self._encuentra_algo(consulta):
+            return MotorBasico().coincidencias(texto)
+        return models.Q(pk__in=RawSQL(f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", [consulta]))
+
+
+class MotorPostgres(MotorBusqueda):
+    CONDICION = f"to_tsvector('simple', {TEXTO_PG}) @@ to_tsquery('simple', %s) OR {TEXTO_PG} ILIKE %s"
+
+    @staticmethod
+    def _parametros(texto):
+        consulta = " & ".join(f"{p}:*" for p in palabras(texto))
+        # Coincidencia en medio de una palabra (índice de trigramas), con % y _ escapados
+        patron = "%" + texto.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return consulta, patron
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS):
+        if not palabras(texto):
+            return []
+        consulta, patron = self._parametros(texto)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT id FROM core_producto WHERE {self.CONDICION} "
+                f"ORDER BY ts_rank(to_tsvector('simple', {TEXTO_PG}), to_tsquery('simple', %s)) DESC, "
+                f"similarity({TEXTO_PG}, %s) DESC, id LIMIT %s",
+                [consulta, patron, consulta, texto, limite])
+            return [fila[0] for fila in cursor.fetchall()]
+
+    def coincidencias(self, texto):
+        if not palabras(texto):
+            return models.Q(pk__in=[])
+        return models.Q(pk__in=RawSQL(f"SELECT id FROM core_producto WHERE {self.CONDICION}",
+                                      list(self._parametros(texto))))
+
+
+_motores = {}
+
+
+def obtener_motor():
+    """Motor para la base actual (se decide una vez por base)."""
+    clave = (connection.vendor, connection.settings_dict.get('NAME'))
+    if clave not in _motores:
+        if connection.vendor == 'postgresql':
+            _motores[clave] = MotorPostgres()
+        elif connection.vendor == 'sqlite' and TABLA_FTS in connection.introspection.table_names():
+            _motores[clave] = MotorFTS5()
+        else:
+            _motores[clave] = MotorBasico()
+    return _motores[clave]
+
+
+def buscar_productos(productos, texto, desde=0, hasta=LIMITE_RESULTADOS):
+    """
+    Filtra el queryset a los resultados de 'texto' que están entre las
+    posiciones 'desde' y 'hasta' del ranking, los más relevantes primero.
+    Cada producto queda anotado con 'relevancia', su posición (0 es el
+    mejor), que sirve también como columna de orden para paginar.
+    """
+    pks = obtener_motor().buscar(texto, hasta)[desde:]
+    if not pks:
+        return productos.annotate(relevancia=models.Value(0)).none()
+    relevancia = models.Case(*[models.When(pk=pk, then=desde + i) for i, pk in enumerate(pks)],
+                             output_field=models.IntegerField())
+    return productos.filter(pk__in=pks).annotate(relevancia=relevancia).order_by('relevancia')
+
+
+def coincidencias(texto):
+    """Filtro (Q) con todos los productos que coinciden con 'texto', sin tope."""
+    return obtener_motor().coincidencias(texto)
+
+
+def ventana_pagina(request):
+    """
+    (desde, hasta): posiciones del ranking que necesita la página que pide
+    el cursor de la URL (ver paginacion.paginar), más una para saber si hay
+    otra después. Así cada página rankea solo hasta donde llega.
+    """
+    tamano = tamano_pedido(request)
+    antes = decodificar_cursor(request.GET.get('antes'), 2)
+    despues = None if antes else decodificar_cursor(request.GET.get('despues'), 2)
+    if antes and isinstance(antes[0], int):
+        # Si antes del cursor hay menos de una página se muestra la primera entera
+        return max(0, antes[0] - tamano - 1), max(antes[0], tamano + 1)
+    if despues and isinstance(despues[0], int):
+        return despues[0] + 1, despues[0] + tamano + 2
+    return 0, tamano + 1
+
+
+@receiver(post_save, sender=Producto)
+def indexar_producto(sender, instance, **kwargs):
+    obtener_motor().indexar(instance)
+
+
+@receiver(post_delete, sender=Producto)
+def quitar_producto(sender, instance, **kwargs):
+    obtener_motor().quitar(instance.pk)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from core.busqueda import obtener_motor
+
+
+class Command(BaseCommand):
+    help = "Vuelve a cargar el índice de búsqueda de productos (después de bulk_create o SQL directo)."
+
+    def handle(self, *args, **options):
+        motor = obtener_motor()
+        motor.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"Índice de búsqueda reconstruido ({type(motor).__name__})."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from core.models import ResumenCategoria
+
+
+class Command(BaseCommand):
+    help = "Recalcula el resumen del inventario por categoría desde la tabla de productos."
+
+    def handle(self, *args, **options):
+        ResumenCategoria.reconstruir()
+        totales = ResumenCategoria.totales()
+        self.stdout.write(self.style.SUCCESS(
+            f"Resumen reconstruido: {totales['productos']} productos, {totales['unidades']} unidades, "
+            f"${totales['valor']:,.2f}."
+        ))
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_useraudit'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(fields=['categoria', 'nombre'], name='producto_cat_nombre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='producto',
+            index=models.Index(condition=models.Q(('cantidad__lt', 5)), fields=['cantidad'], name='producto_stock_bajo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historialmovimiento',
+            index=models.Index(fields=['-fecha'], name='historial_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraudit',
+            index=models.Index(fields=['-timestamp'], name='useraudit_timestamp_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations, OperationalError
+
+# Índice de búsqueda de productos (ver core/busqueda.py). Depende de la base:
+# SQLite usa una tabla FTS5 y PostgreSQL índices GIN de texto y de trigramas.
+
+TEXTO_PG = "(sku || ' ' || nombre || ' ' || categoria)"
+
+
+def crear_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE core_producto_fts USING fts5("
+                "sku, nombre, categoria, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+            )
+        except OperationalError:
+            # SQLite compilado sin FTS5: la búsqueda sigue con icontains
+            return
+        schema_editor.execute(
+            "INSERT INTO core_producto_fts (rowid, sku, nombre, categoria) "
+            "SELECT id, sku, nombre, categoria FROM core_producto"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            f"CREATE INDEX producto_busqueda_idx ON core_producto USING GIN (to_tsvector('simple', {TEXTO_PG}))"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX producto_trgm_idx ON core_producto USING GIN ({TEXTO_PG} gin_trgm_ops)"
+        )
+
+
+def borrar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS core_producto_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS producto_busqueda_idx")
+        schema_editor.execute("DROP INDEX IF EXISTS producto_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_indices'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+def cargar_resumen(apps, schema_editor):
+    Producto = apps.get_model('core', 'Producto')
+    ResumenCategoria = apps.get_model('core', 'ResumenCategoria')
+    filas = Producto.objects.values('categoria').annotate(
+        productos=models.Count('id'),
+        unidades=models.Sum('cantidad'),
+        valor=models.Sum(models.F('precio') * models.F('cantidad'), output_field=models.DecimalField()),
+        bajo_stock=models.Count('id', filter=models.Q(cantidad__lt=5)),
+    ).order_by()
+    ResumenCategoria.objects.bulk_create([ResumenCategoria(**fila) for fila in filas])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_busqueda'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenCategoria',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('categoria', models.CharField(max_length=50, unique=True)),
+                ('productos', models.IntegerField(default=0)),
+                ('unidades', models.BigIntegerField(default=0)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('bajo_stock', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(cargar_resumen, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_resumencategoria'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='producto',
+            constraint=models.CheckConstraint(condition=models.Q(('cantidad__gte', 0)), name='producto_cantidad_no_negativa'),
+        ),
+    ]
@@ -1,8 +1,13 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import IntegrityError, connection, models, transaction
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+# Productos con menos unidades que esto cuentan como stock bajo (dashboard, reportes)
+UMBRAL_STOCK_BAJO = 5
+
 def validar_positivo(value):
     if value < 0:
         raise ValidationError('El valor no puede ser negativo.')
@@ -15,9 +20,118 @@ class Producto(models.Model):
     cantidad = models.IntegerField(default=0, verbose_name="Stock Actual", validators=[validar_positivo])
     fecha_creacion = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Catálogo público: ORDER BY categoria, nombre
+            models.Index(fields=['categoria', 'nombre'], name='producto_cat_nombre_idx'),
+            # Dashboard y reportes: cantidad < 5. Índice parcial (solo las filas con
+            # stock bajo); en motores sin índices parciales Django no lo crea.
+            models.Index(fields=['cantidad'], name='producto_stock_bajo_idx',
+                         condition=models.Q(cantidad__lt=5)),
+        ]
+        constraints = [
+            # La base garantiza que el stock nunca quede negativo, aunque dos salidas lleguen juntas
+            models.CheckConstraint(condition=models.Q(cantidad__gte=0), name='producto_cantidad_no_negativa'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # El resumen de su categoría se ajusta en la misma transacción (ver ResumenCategoria)
+        with transaction.atomic():
+            anterior = None
+            if self.pk is not None:
+                anterior = Producto.objects.select_for_update().filter(pk=self.pk).values(
+                    'categoria', 'precio', 'cantidad').first()
+            super().save(*args, **kwargs)
+            if anterior is not None:
+                ResumenCategoria.restar(**anterior)
+            ResumenCategoria.sumar(self.categoria, self.precio, self.cantidad)
+
     def __str__(self):
         return f"{self.nombre} ({self.sku})"
 
+class ResumenCategoria(models.Model):
+    """
+    Totales por categoría, mantenidos al día para no sumar la tabla de
+    productos en cada página. Producto.save() y el borrado (señal
+    pre_delete) los ajustan en la misma transacción que el cambio.
+
+    Hay una fila por categoría y no una sola fila global: así dos
+    movimientos de categorías distintas no esperan el mismo bloqueo.
+    Los totales del inventario se suman sobre estas pocas filas.
+
+    Lo que no pasa por save() (bulk_create, update(), SQL directo) se
+    corrige con: python manage.py reconstruir_resumen
+    """
+    categoria = models.CharField(max_length=50, unique=True)
+    productos = models.IntegerField(default=0)
+    unidades = models.BigIntegerField(default=0)
+    valor = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    bajo_stock = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.categoria}: {self.unidades} u. (${self.valor})"
+
+    @classmethod
+    def ajustar(cls, categoria, productos=0, unidades=0, valor=0, bajo_stock=0):
+        """Suma los deltas a la fila de la categoría (la crea si no existe)."""
+        cambios = {
+            'productos': models.F('productos') + productos,
+            'unidades': models.F('unidades') + unidades,
+            'valor': models.F('valor') + valor,
+            'bajo_stock': models.F('bajo_stock') + bajo_stock,
+        }
+        if cls.objects.filter(categoria=categoria).update(**cambios):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(categoria=categoria, productos=productos, unidades=unidades, valor=valor,
+                                   bajo_stock=bajo_stock)
+        except IntegrityError:
+            # Otra transacción creó la fila al mismo tiempo
+            cls.objects.filter(categoria=categoria).update(**cambios)
+
+    @classmethod
+    def sumar(cls, categoria, precio, cantidad, signo=1):
+        """Agrega (o quita, con signo=-1) el aporte de un producto a su categoría."""
+        cls.ajustar(categoria, productos=signo, unidades=signo * cantidad,
+                    valor=signo * Decimal(str(precio)) * cantidad,
+                    bajo_stock=signo if cantidad < UMBRAL_STOCK_BAJO else 0)
+
+    @classmethod
+    def restar(cls, categoria, precio, cantidad):
+        cls.sumar(categoria, precio, cantidad, signo=-1)
+
+    @classmethod
+    def movimiento(cls, categoria, precio, antes, despues):
+        """Ajuste por un cambio de stock de 'antes' a 'despues' unidades."""
+        bajo = (despues < UMBRAL_STOCK_BAJO) - (antes < UMBRAL_STOCK_BAJO)
+        cls.ajustar(categoria, unidades=despues - antes, valor=Decimal(str(precio)) * (despues - antes),
+                    bajo_stock=bajo)
+
+    @classmethod
+    def totales(cls):
+        """{'productos', 'unidades', 'valor', 'bajo_stock'} de todo el inventario."""
+        totales = cls.objects.aggregate(productos=models.Sum('productos'), unidades=models.Sum('unidades'),
+                                        valor=models.Sum('valor'), bajo_stock=models.Sum('bajo_stock'))
+        return {clave: valor or 0 for clave, valor in totales.items()}
+
+    @classmethod
+    def reconstruir(cls):
+        """Vuelve a calcular todas las filas desde la tabla de productos."""
+        with transaction.atomic():
+            # Primero se toma el bloqueo de escritura: los cambios de productos esperan a que termine
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f"LOCK TABLE {Producto._meta.db_table} IN SHARE MODE")
+            cls.objects.all().delete()
+            filas = Producto.objects.values('categoria').annotate(
+                productos=models.Count('id'),
+                unidades=models.Sum('cantidad'),
+                valor=models.Sum(models.F('precio') * models.F('cantidad'), output_field=models.DecimalField()),
+                bajo_stock=models.Count('id', filter=models.Q(cantidad__lt=UMBRAL_STOCK_BAJO)),
+            ).order_by()
+            cls.objects.bulk_create([cls(**fila) for fila in filas])
+
 class HistorialMovimiento(models.Model):
     """
     Equivalente a tu historial.txt pero guardado en Base de Datos.
@@ -41,6 +155,12 @@ class HistorialMovimiento(models.Model):
     cantidad = models.IntegerField()
     fecha = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [
+            # Últimos movimientos del dashboard: ORDER BY fecha DESC LIMIT 5
+            models.Index(fields=['-fecha'], name='historial_fecha_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if self.producto and not self.producto_nombre:
             self.producto_nombre = self.producto.nombre
@@ -49,6 +169,42 @@ class HistorialMovimiento(models.Model):
     def __str__(self):
         return f"{self.tipo} - {self.producto_nombre or 'Desconocido'} ({self.fecha})"
 
+class StockInsuficiente(Exception):
+    pass
+
+def registrar_movimiento_stock(producto_id, tipo, cantidad, usuario=None):
+    """
+    Aplica una ENTRADA o SALIDA y guarda su HistorialMovimiento en una sola
+    transacción. Devuelve el stock nuevo.
+
+    El stock se cambia con un único UPDATE condicional
+    (cantidad = cantidad ± n WHERE cantidad >= n) en lugar de leer, sumar en
+    Python y save(): dos salidas simultáneas no pueden vender el mismo
+    stock, y el bloqueo de la fila dura solo lo que falta para el commit.
+    Lanza StockInsuficiente si no alcanza y Producto.DoesNotExist si no existe.
+    """
+    if tipo not in ('ENTRADA', 'SALIDA'):
+        raise ValueError('Tipo de movimiento inválido.')
+    if cantidad <= 0:
+        raise ValueError('La cantidad debe ser mayor a 0.')
+    delta = cantidad if tipo == 'ENTRADA' else -cantidad
+
+    with transaction.atomic():
+        filas = Producto.objects.filter(pk=producto_id)
+        condicionadas = filas.filter(cantidad__gte=cantidad) if tipo == 'SALIDA' else filas
+        if not condicionadas.update(cantidad=models.F('cantidad') + delta):
+            if tipo == 'SALIDA' and filas.exists():
+                raise StockInsuficiente()
+            raise Producto.DoesNotExist()
+        # La fila ya está bloqueada por el UPDATE: esto lee el valor recién escrito
+        producto = filas.values('nombre', 'categoria', 'precio', 'cantidad').get()
+        HistorialMovimiento.objects.create(producto_id=producto_id, producto_nombre=producto['nombre'],
+                                           usuario=usuario, tipo=tipo, cantidad=cantidad)
+        # El resumen al final: su fila (compartida por la categoría) queda bloqueada el menor tiempo posible
+        ResumenCategoria.movimiento(producto['categoria'], producto['precio'], producto['cantidad'] - delta,
+                                    producto['cantidad'])
+    return producto['cantidad']
+
 class UserAudit(models.Model):
     """
     Log de auditoría para cambios en usuarios (Caja Negra).
@@ -65,6 +221,11 @@ class UserAudit(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     details = models.TextField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-timestamp'], name='useraudit_timestamp_idx'),
+        ]
+
     def __str__(self):
         return f"[{self.timestamp}] {self.admin} -> {self.action} -> {self.target_user}"
 
@@ -115,3 +276,13 @@ def log_user_delete(sender, instance, **kwargs):
         details="Usuario eliminado permanentemente."
     )
 
+# --- RESUMEN DE INVENTARIO ---
+from django.db.models.signals import pre_delete
+
+@receiver(pre_delete, sender=Producto)
+def quitar_del_resumen(sender, instance, **kwargs):
+    # pre_delete corre dentro de la transacción del borrado; se leen los valores guardados, no los de la instancia
+    actual = Producto.objects.select_for_update().filter(pk=instance.pk).values(
+        'categoria', 'precio', 'cantidad').first()
+    if actual is not None:
+        ResumenCategoria.restar(**actual)
@@ -0,0 +1,147 @@
+"""
+Paginación por cursor (keyset) para los listados.
+
+En vez de OFFSET, cada página pide "las N filas que siguen a la última
+mostrada" según las columnas de orden, así que la página mil cuesta lo
+mismo que la primera si hay un índice sobre esas columnas. La última
+columna del orden tiene que ser única (la clave primaria) para que el
+orden sea estable, y ninguna puede ser NULL.
+
+El cursor viaja en la URL (?despues=... o ?antes=...) con los valores de
+la fila límite en JSON/base64. Los demás parámetros de la URL (por
+ejemplo q) se conservan en los enlaces. El tamaño se elige con
+?por_pagina=, entre 1 y TAMANO_MAXIMO.
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+TAMANO_PAGINA = 25
+TAMANO_MAXIMO = 100
+
+
+class Pagina:
+    """Filas de una página y los enlaces a la anterior y la siguiente (None si no hay)."""
+
+    def __init__(self, objetos, url_anterior, url_siguiente, tamano):
+        self.objetos = objetos
+        self.url_anterior = url_anterior
+        self.url_siguiente = url_siguiente
+        self.tamano = tamano
+
+    def __iter__(self):
+        return iter(self.objetos)
+
+    def __len__(self):
+        return len(self.objetos)
+
+
+def _a_json(valor):
+    # isoformat completo: DjangoJSONEncoder recorta los microsegundos y el cursor dejaría de ser exacto
+    if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+        return valor.isoformat()
+    if isinstance(valor, decimal.Decimal):
+        return str(valor)
+    raise TypeError(f"No se puede usar {type(valor).__name__} en un cursor")
+
+
+def codificar_cursor(valores):
+    texto = json.dumps(valores, default=_a_json, separators=(',', ':'))
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor, columnas):
+    """Lista de valores del cursor, o None si falta o no es válido (se vuelve a la primera página)."""
+    if not cursor:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(valores, list) or len(valores) != columnas:
+        return None
+    if not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in valores):
+        return None
+    return valores
+
+
+def condicion_keyset(orden, valores, hacia_atras=False):
+    """
+    Filas que van después de 'valores' en 'orden' (antes, si hacia_atras).
+    Se arma como a >= x AND (a > x OR (a = x AND ...)): la primera
+    comparación es un rango simple que el índice puede recorrer.
+    """
+    columna = orden[0]
+    campo = columna.lstrip('-')
+    ascendente = columna.startswith('-') == hacia_atras
+    mayor, mayor_o_igual = ('gt', 'gte') if ascendente else ('lt', 'lte')
+    if len(orden) == 1:
+        return Q(**{f'{campo}__{mayor}': valores[0]})
+    return Q(**{f'{campo}__{mayor_o_igual}': valores[0]}) & (
+        Q(**{f'{campo}__{mayor}': valores[0]}) |
+        Q(**{campo: valores[0]}) & condicion_keyset(orden[1:], valores[1:], hacia_atras)
+    )
+
+
+def _invertir(columna):
+    return columna[1:] if columna.startswith('-') else '-' + columna
+
+
+def tamano_pedido(request, por_defecto=TAMANO_PAGINA):
+    try:
+        tamano = int(request.GET.get('por_pagina', por_defecto))
+    except ValueError:
+        return por_defecto
+    return max(1, min(tamano, TAMANO_MAXIMO))
+
+
+def _url(request, parametro, valores):
+    consulta = request.GET.copy()
+    consulta.pop('antes', None)
+    consulta.pop('despues', None)
+    consulta[parametro] = codificar_cursor(valores)
+    return '?' + consulta.urlencode()
+
+
+def paginar(request, queryset, orden, tamano=TAMANO_PAGINA):
+    """Página de 'queryset' ordenada por 'orden' según el cursor de la URL."""
+    tamano = tamano_pedido(request, tamano)
+    orden = list(orden)
+    antes = decodificar_cursor(request.GET.get('antes'), len(orden))
+    despues = None if antes else decodificar_cursor(request.GET.get('despues'), len(orden))
+
+    filas = None
+    try:
+        if antes is not None:
+            # Hacia atrás: se recorre en el orden inverso desde el cursor y se da vuelta la página
+            consulta = queryset.filter(condicion_keyset(orden, antes, hacia_atras=True))
+            filas = list(consulta.order_by(*map(_invertir, orden))[:tamano + 1])
+            if len(filas) > tamano:
+                hay_anterior, hay_siguiente = True, True
+                filas = filas[:tamano][::-1]
+            else:
+                # Se llegó al principio: se muestra la primera página completa
+                filas = None
+        elif despues is not None:
+            filas = list(queryset.filter(condicion_keyset(orden, despues)).order_by(*orden)[:tamano + 1])
+            hay_anterior, hay_siguiente = True, len(filas) > tamano
+            filas = filas[:tamano]
+    except (ValueError, TypeError, ValidationError):
+        # Cursor con valores que no corresponden a las columnas (URL editada a mano)
+        filas = None
+    if filas is None:
+        filas = list(queryset.order_by(*orden)[:tamano + 1])
+        hay_anterior, hay_siguiente = False, len(filas) > tamano
+        filas = filas[:tamano]
+
+    def valores(fila):
+        return [getattr(fila, columna.lstrip('-')) for columna in orden]
+
+    url_anterior = _url(request, 'antes', valores(filas[0])) if filas and hay_anterior else None
+    url_siguiente = _url(request, 'despues', valores(filas[-1])) if filas and hay_siguiente else None
+    return Pagina(filas, url_anterior, url_siguiente, tamano)
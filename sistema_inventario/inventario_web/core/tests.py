@@ -1,3 +1,343 @@
-from django.test import TestCase
+import threading
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from .busqueda import LIMITE_RESULTADOS, MotorFTS5, buscar_productos, coincidencias, obtener_motor
+from .models import (UMBRAL_STOCK_BAJO, Producto, HistorialMovimiento, ResumenCategoria, StockInsuficiente, UserAudit,
+                     registrar_movimiento_stock)
+from .paginacion import TAMANO_MAXIMO, codificar_cursor, paginar
+
+
+class IndicesConsultasTest(TestCase):
+    """
+    Las consultas de las páginas más visitadas tienen que resolverse con un
+    índice (ver Meta.indexes en models.py), no recorriendo la tabla entera.
+    Se revisa el plan con EXPLAIN.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Producto.objects.bulk_create([
+            Producto(sku=f"P{i:04d}", nombre=f"Producto {i}", categoria=f"Cat {i % 5}", precio=10, cantidad=i % 20)
+            for i in range(200)
+        ])
+        UserAudit.objects.create(action='CREATE', admin='admin', target_user='ana')
+
+    def plan(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Con tablas chicas PostgreSQL prefiere recorrerlas: se le pide que no lo haga
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+        return queryset.explain()
+
+    def assertUsaIndice(self, queryset, indice):
+        plan = self.plan(queryset)
+        self.assertIn(indice, plan, f"La consulta no usa {indice}:\n{plan}")
+
+    def test_dashboard_stock_bajo(self):
+        if not connection.features.supports_partial_indexes:
+            self.skipTest("El motor no soporta índices parciales")
+        self.assertUsaIndice(Producto.objects.filter(cantidad__lt=5), 'producto_stock_bajo_idx')
+
+    def test_dashboard_ultimos_movimientos(self):
+        consulta = HistorialMovimiento.objects.select_related('producto').order_by('-fecha')[:5]
+        self.assertUsaIndice(consulta, 'historial_fecha_idx')
+
+    def test_catalogo_publico_ordenado(self):
+        self.assertUsaIndice(Producto.objects.all().order_by('categoria', 'nombre'), 'producto_cat_nombre_idx')
+
+    def test_auditoria_ultimos_registros(self):
+        self.assertUsaIndice(UserAudit.objects.all().order_by('-timestamp')[:100], 'useraudit_timestamp_idx')
+
+    def test_lista_usuarios_por_clave_primaria(self):
+        # La página siguiente de lista_usuarios: rango sobre la clave primaria, sin ordenar aparte
+        plan = self.plan(User.objects.filter(id__gt=1).order_by('id')[:26])
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', plan, plan)
+            self.assertIn('PRIMARY KEY', plan, plan)
+        else:
+            self.assertIn('auth_user_pkey', plan, plan)
+
+
+class BusquedaProductosTest(TestCase):
+    """Búsqueda por texto del catálogo (core/busqueda.py): prefijos, relevancia y sincronía con los cambios."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.laptop = Producto.objects.create(sku="LAP-01", nombre="Laptop Dell", categoria="Computación",
+                                             precio=900, cantidad=3)
+        cls.mouse = Producto.objects.create(sku="MOU-01", nombre="Mouse inalámbrico", categoria="Accesorios",
+                                            precio=20, cantidad=40)
+        cls.funda = Producto.objects.create(sku="FUN-01", nombre="Funda para laptop", categoria="Accesorios",
+                                            precio=15, cantidad=10)
+
+    def buscar(self, texto):
+        return list(buscar_productos(Producto.objects.all(), texto))
+
+    def test_motor_segun_base(self):
+        if connection.vendor == 'sqlite':
+            self.assertIsInstance(obtener_motor(), MotorFTS5)
+
+    def test_busca_por_prefijo(self):
+        self.assertEqual(self.buscar("lap del"), [self.laptop])
+        self.assertEqual(self.buscar("inalam"), [self.mouse])
+        self.assertEqual(self.buscar("zzz"), [])
+        self.assertEqual(self.buscar("  "), [])
+
+    def test_ordena_por_relevancia(self):
+        # El SKU pesa más que el nombre
+        self.assertEqual(self.buscar("lap"), [self.laptop, self.funda])
+
+    def test_sigue_los_cambios(self):
+        self.mouse.nombre = "Teclado mecánico"
+        self.mouse.save()
+        self.assertEqual(self.buscar("mouse"), [])
+        self.assertEqual(self.buscar("teclado"), [self.mouse])
+        self.funda.delete()
+        self.assertEqual(self.buscar("funda"), [])
+
+    def test_catalogo_publico(self):
+        respuesta = self.client.get(reverse('public_catalog'), {'q': 'lapt'})
+        self.assertEqual(list(respuesta.context['productos']), [self.laptop, self.funda])
+
+    def test_en_medio_de_una_palabra(self):
+        # FTS5 no encuentra "ador" en "Procesador": se busca como con icontains
+        procesador = Producto.objects.create(sku="CPU-01", nombre="Procesador Intel", categoria="Computación",
+                                             precio=300, cantidad=5)
+        self.assertEqual(self.buscar("ador"), [procesador])
+        self.assertEqual(list(Producto.objects.filter(coincidencias("ador"))), [procesador])
+
+
+class PaginacionKeysetTest(TestCase):
+    """Paginación por cursor (core/paginacion.py): recorre todo sin repetir ni saltear filas."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Nombres repetidos dentro de cada categoría: el desempate lo hace el id
+        Producto.objects.bulk_create([
+            Producto(sku=f"K{i:03d}", nombre=f"Item {i % 4}", categoria=f"Cat {i % 3}", precio=5, cantidad=i)
+            for i in range(53)
+        ])
+        # bulk_create no dispara señales: el índice de búsqueda se carga a mano
+        call_command('reconstruir_busqueda', stdout=StringIO())
+
+    def recorrer(self, url, parametros, enlace):
+        vistos = []
+        while url is not None:
+            respuesta = self.client.get(url, parametros)
+            pagina = respuesta.context['pagina']
+            vistos.extend(pagina.objetos)
+            siguiente = getattr(pagina, enlace)
+            url, parametros = (reverse('public_catalog') + siguiente, None) if siguiente else (None, None)
+        return vistos
+
+    def test_recorre_el_catalogo_en_orden(self):
+        esperados = list(Producto.objects.order_by('categoria', 'nombre', 'id'))
+        vistos = self.recorrer(reverse('public_catalog'), {'por_pagina': 10}, 'url_siguiente')
+        self.assertEqual(vistos, esperados)
+
+    def test_vuelve_hacia_atras(self):
+        respuesta = self.client.get(reverse('public_catalog'), {'por_pagina': 10})
+        for _ in range(3):
+            siguiente = respuesta.context['pagina'].url_siguiente
+            respuesta = self.client.get(reverse('public_catalog') + siguiente)
+        tercera = list(respuesta.context['pagina'])
+        anterior = self.client.get(reverse('public_catalog') + respuesta.context['pagina'].url_anterior)
+        esperados = list(Producto.objects.order_by('categoria', 'nombre', 'id')[20:30])
+        self.assertEqual(list(anterior.context['pagina']), esperados)
+        self.assertNotEqual(tercera, esperados)
+
+    def test_conserva_la_busqueda(self):
+        respuesta = self.client.get(reverse('public_catalog'), {'q': 'item', 'por_pagina': 5})
+        pagina = respuesta.context['pagina']
+        self.assertIn('q=item', pagina.url_siguiente)
+        self.assertIsNone(pagina.url_anterior)
+        siguiente = self.client.get(reverse('public_catalog') + pagina.url_siguiente).context['pagina']
+        self.assertTrue(set(pagina.objetos).isdisjoint(siguiente.objetos))
+
+    def test_busqueda_sin_tope_de_resultados(self):
+        # Más coincidencias que LIMITE_RESULTADOS: las páginas siguen hasta el último, sin repetir
+        Producto.objects.bulk_create([
+            Producto(sku=f"M{i:03d}", nombre=f"Item extra {i}", categoria="Cat 9", precio=5, cantidad=i)
+            for i in range(LIMITE_RESULTADOS)
+        ])
+        call_command('reconstruir_busqueda', stdout=StringIO())
+        vistos = self.recorrer(reverse('public_catalog'), {'q': 'item', 'por_pagina': 40}, 'url_siguiente')
+        self.assertEqual(len(vistos), LIMITE_RESULTADOS + 53)
+        self.assertEqual(len(set(vistos)), len(vistos))
+
+        # Y hacia atrás desde la última página, también más allá del tope anterior
+        respuesta = self.client.get(reverse('public_catalog'), {'q': 'item', 'por_pagina': 40})
+        while respuesta.context['pagina'].url_siguiente:
+            respuesta = self.client.get(reverse('public_catalog') + respuesta.context['pagina'].url_siguiente)
+        ultima = len(respuesta.context['pagina'].objetos)
+        anterior = self.client.get(reverse('public_catalog') + respuesta.context['pagina'].url_anterior)
+        self.assertEqual(list(anterior.context['pagina']), vistos[-40 - ultima:-ultima])
+
+    def test_limita_el_tamano_y_tolera_cursores_invalidos(self):
+        pagina = paginar(RequestFactory().get('/', {'por_pagina': 100000}), Producto.objects.all(), ('id',))
+        self.assertEqual(pagina.tamano, TAMANO_MAXIMO)
+        for cursor in ('basura', codificar_cursor(['no es un id'])):
+            pagina = paginar(RequestFactory().get('/', {'despues': cursor}), Producto.objects.all(), ('id',))
+            self.assertEqual(list(pagina), list(Producto.objects.order_by('id')[:len(pagina)]))
+            self.assertIsNone(pagina.url_anterior)
+
+    def test_orden_descendente(self):
+        for i in range(7):
+            UserAudit.objects.create(action='UPDATE', admin='admin', target_user=f'u{i}')
+        request = RequestFactory().get('/', {'por_pagina': 3})
+        pagina = paginar(request, UserAudit.objects.all(), ('-timestamp', '-id'))
+        vistos = list(pagina)
+        while pagina.url_siguiente:
+            pagina = paginar(RequestFactory().get('/' + pagina.url_siguiente), UserAudit.objects.all(),
+                             ('-timestamp', '-id'))
+            vistos.extend(pagina)
+        self.assertEqual(vistos, list(UserAudit.objects.order_by('-timestamp', '-id')))
+
+
+class ResumenInventarioTest(TestCase):
+    """El resumen por categoría (ResumenCategoria) tiene que coincidir siempre con sumar la tabla de productos."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        self.client.force_login(self.usuario)
+        self.teclado = Producto.objects.create(sku="TEC-01", nombre="Teclado", categoria="Accesorios",
+                                               precio=Decimal("25.50"), cantidad=10)
+        self.monitor = Producto.objects.create(sku="MON-01", nombre="Monitor", categoria="Pantallas",
+                                               precio=Decimal("199.99"), cantidad=2)
+
+    def assertResumenAlDia(self):
+        esperado = {
+            fila['categoria']: fila for fila in Producto.objects.values('categoria').annotate(
+                productos=Count('id'), unidades=Sum('cantidad'),
+                valor=Sum(F('precio') * F('cantidad'), output_field=DecimalField()),
+                bajo_stock=Count('id', filter=Q(cantidad__lt=UMBRAL_STOCK_BAJO)),
+            ).order_by()
+        }
+        actual = {
+            fila['categoria']: fila
+            for fila in ResumenCategoria.objects.exclude(productos=0).values(
+                'categoria', 'productos', 'unidades', 'valor', 'bajo_stock')
+        }
+        self.assertEqual(actual, esperado)
+
+    def test_alta_edicion_y_baja(self):
+        self.assertResumenAlDia()
+        self.teclado.cantidad = 3
+        self.teclado.precio = Decimal("30.00")
+        self.teclado.save()
+        self.assertResumenAlDia()
+        self.monitor.categoria = "Accesorios"
+        self.monitor.save()
+        self.assertResumenAlDia()
+        self.teclado.delete()
+        self.assertResumenAlDia()
+        Producto.objects.all().delete()
+        self.assertResumenAlDia()
+        self.assertEqual(ResumenCategoria.totales()['unidades'], 0)
+
+    def test_movimientos_desde_las_vistas(self):
+        respuesta = self.client.post(reverse('api_registrar_movimiento', args=[self.teclado.pk]),
+                                     data={'tipo': 'SALIDA', 'cantidad': 8}, content_type='application/json')
+        self.assertTrue(respuesta.json()['success'])
+        self.assertResumenAlDia()
+        self.assertEqual(Decimal(str(respuesta.json()['total_valor'])), ResumenCategoria.totales()['valor'])
+        self.client.post(reverse('registrar_movimiento', args=[self.monitor.pk]), {'tipo': 'ENTRADA', 'cantidad': 5})
+        self.assertResumenAlDia()
+
+        respuesta = self.client.get(reverse('dashboard'))
+        self.assertEqual(respuesta.context['total_productos'], 2 + 7)
+        self.assertEqual(respuesta.context['productos_bajo_stock'], 1)
+
+    def test_reconstruir(self):
+        Producto.objects.filter(pk=self.teclado.pk).update(cantidad=1)  # update() no pasa por save()
+        call_command('reconstruir_resumen', stdout=StringIO())
+        self.assertResumenAlDia()
+
+
+class MovimientosStockTest(TestCase):
+    """Movimientos con UPDATE condicional (registrar_movimiento_stock) y el CHECK de stock no negativo."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = User.objects.create_user('operador', password='clave')
+        cls.producto = Producto.objects.create(sku="CAB-01", nombre="Cable HDMI", categoria="Accesorios",
+                                               precio=Decimal("8.00"), cantidad=6)
+
+    def test_salida_y_entrada(self):
+        self.assertEqual(registrar_movimiento_stock(self.producto.pk, 'SALIDA', 4, self.usuario), 2)
+        self.assertEqual(registrar_movimiento_stock(self.producto.pk, 'ENTRADA', 10, self.usuario), 12)
+        movimientos = HistorialMovimiento.objects.filter(producto=self.producto).order_by('id')
+        self.assertEqual([(m.tipo, m.cantidad, m.producto_nombre) for m in movimientos],
+                         [('SALIDA', 4, 'Cable HDMI'), ('ENTRADA', 10, 'Cable HDMI')])
+        self.assertEqual(ResumenCategoria.totales()['unidades'], 12)
+
+    def test_salida_sin_stock_no_cambia_nada(self):
+        with self.assertRaises(StockInsuficiente):
+            registrar_movimiento_stock(self.producto.pk, 'SALIDA', 7, self.usuario)
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 6)
+        self.assertFalse(HistorialMovimiento.objects.exists())
+        with self.assertRaises(Producto.DoesNotExist):
+            registrar_movimiento_stock(999999, 'ENTRADA', 1, self.usuario)
+
+    def test_la_base_rechaza_stock_negativo(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Producto.objects.filter(pk=self.producto.pk).update(cantidad=-1)
+
+
+class MovimientosConcurrentesTest(TransactionTestCase):
+    """
+    Muchas salidas simultáneas contra el mismo SKU: se venden exactamente
+    las unidades que había, ni una más. Necesita una base de pruebas con
+    varias conexiones: PostgreSQL, o SQLite en archivo (la que configura
+    settings.py; se saltea solo si otra configuración la deja en memoria).
+    """
+    SOLICITUDES = 24
+    STOCK = 10
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest("SQLite en memoria no admite varias conexiones a la base de pruebas")
+        self.usuario = User.objects.create_superuser('admin', 'admin@example.com', 'clave')
+        self.producto = Producto.objects.create(sku="HOT-01", nombre="Producto caliente", categoria="Ofertas",
+                                                precio=Decimal("3.00"), cantidad=self.STOCK)
+
+    def salida(self, barrera, resultados):
+        try:
+            cliente = Client()
+            cliente.force_login(self.usuario)
+            barrera.wait()
+            respuesta = cliente.post(reverse('api_registrar_movimiento', args=[self.producto.pk]),
+                                     data={'tipo': 'SALIDA', 'cantidad': 1}, content_type='application/json')
+            resultados.append(respuesta.json())
+        finally:
+            connection.close()
+
+    def test_salidas_simultaneas_no_sobrevenden(self):
+        barrera = threading.Barrier(self.SOLICITUDES)
+        resultados = []
+        hilos = [threading.Thread(target=self.salida, args=(barrera, resultados)) for _ in range(self.SOLICITUDES)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        exitosas = [r for r in resultados if r['success']]
+        self.assertEqual(len(resultados), self.SOLICITUDES)
+        self.assertEqual(len(exitosas), self.STOCK, resultados)
+        self.assertTrue(all(r['error'] == 'Stock insuficiente.' for r in resultados if not r['success']))
+        self.assertEqual(sorted(r['new_stock'] for r in exitosas), list(range(self.STOCK)))
+
+        self.producto.refresh_from_db()
+        self.assertEqual(self.producto.cantidad, 0)
+        self.assertEqual(HistorialMovimiento.objects.filter(tipo='SALIDA').count(), self.STOCK)
+        resumen = ResumenCategoria.objects.get(categoria="Ofertas")
+        self.assertEqual((resumen.unidades, resumen.bajo_stock), (0, 1))
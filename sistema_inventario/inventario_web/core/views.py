@@ -5,10 +5,13 @@ from django.contrib.auth import update_session_auth_hash
 from django.contrib.auth.forms import PasswordChangeForm
 from django.contrib.auth.decorators import login_required, permission_required
 from django.db.models import Sum, F
-from django.db import models
-from django.http import HttpResponse
-from .models import Producto, HistorialMovimiento, UserAudit, validar_positivo
+from django.db import models, transaction
+from django.http import Http404, HttpResponse
+from .models import (Producto, HistorialMovimiento, ResumenCategoria, UserAudit, StockInsuficiente,
+                     registrar_movimiento_stock, validar_positivo)
 from .forms import ProductoForm, MovimientoForm
+from .busqueda import buscar_productos, coincidencias, ventana_pagina
+from .paginacion import paginar
 from django.utils import timezone
 import csv
 from io import StringIO
@@ -27,23 +30,21 @@ def home(request):
     return render(request, 'core/landing.html')
 
 def public_catalog(request):
-    productos = Producto.objects.all().order_by('categoria', 'nombre')
+    productos = Producto.objects.all()
+    orden = ('categoria', 'nombre', 'id')
     query = request.GET.get('q')
     if query:
-        productos = productos.filter(
-            models.Q(nombre__icontains=query) | 
-            models.Q(categoria__icontains=query) |
-            models.Q(sku__icontains=query)
-        )
-    return render(request, 'core/public_catalog.html', {'productos': productos})
+        productos = buscar_productos(productos, query, *ventana_pagina(request))
+        orden = ('relevancia', 'id')
+    pagina = paginar(request, productos, orden)
+    return render(request, 'core/public_catalog.html', {'productos': pagina, 'pagina': pagina})
 
 @login_required
 def dashboard(request):
-    total_productos = Producto.objects.aggregate(total=Sum('cantidad'))['total'] or 0
-    valor_inventario = Producto.objects.aggregate(
-        valor=Sum(F('precio') * F('cantidad'), output_field=models.DecimalField())
-    )['valor'] or 0
-    productos_bajo_stock = Producto.objects.filter(cantidad__lt=5).count()
+    resumen = ResumenCategoria.totales()
+    total_productos = resumen['unidades']
+    valor_inventario = resumen['valor']
+    productos_bajo_stock = resumen['bajo_stock']
     ultimos_movimientos = HistorialMovimiento.objects.select_related('producto').order_by('-fecha')[:5]
 
     context = {
@@ -58,17 +59,24 @@ def dashboard(request):
 @login_required
 def lista_productos(request):
     productos = Producto.objects.all()
+    orden = ('id',)
     query = request.GET.get('q')
     if query:
-        productos = productos.filter(models.Q(nombre__icontains=query) | models.Q(sku__icontains=query))
+        productos = buscar_productos(productos, query, *ventana_pagina(request))
+        orden = ('relevancia', 'id')
     
-    # Calculate Total Inventory Value
-    valor_inventario = productos.aggregate(
-        valor=Sum(F('precio') * F('cantidad'), output_field=models.DecimalField())
-    )['valor'] or 0
+    # Calculate Total Inventory Value (del resumen; con búsqueda, de todos los resultados)
+    if query:
+        valor_inventario = Producto.objects.filter(coincidencias(query)).aggregate(
+            valor=Sum(F('precio') * F('cantidad'), output_field=models.DecimalField())
+        )['valor'] or 0
+    else:
+        valor_inventario = ResumenCategoria.totales()['valor']
 
+    pagina = paginar(request, productos, orden)
     return render(request, 'core/lista_productos.html', {
-        'productos': productos, 
+        'productos': pagina, 
+        'pagina': pagina,
         'valor_inventario': valor_inventario
     })
 
@@ -78,13 +86,14 @@ def crear_producto(request):
     if request.method == 'POST':
         form = ProductoForm(request.POST)
         if form.is_valid():
-            producto = form.save()
-            HistorialMovimiento.objects.create(
-                producto=producto,
-                usuario=request.user,
-                tipo='CREACION',
-                cantidad=producto.cantidad
-            )
+            with transaction.atomic():
+                producto = form.save()
+                HistorialMovimiento.objects.create(
+                    producto=producto,
+                    usuario=request.user,
+                    tipo='CREACION',
+                    cantidad=producto.cantidad
+                )
             messages.success(request, _('Producto "%(nombre)s" creado correctamente.') % {'nombre': producto.nombre})
             return redirect('lista_productos')
     else:
@@ -99,13 +108,14 @@ def editar_producto(request, pk):
     if request.method == 'POST':
         form = ProductoForm(request.POST, instance=producto)
         if form.is_valid():
-            form.save()
-            HistorialMovimiento.objects.create(
-                producto=producto,
-                usuario=request.user,
-                tipo='EDICION',
-                cantidad=0 # No changed stock, just details
-            )
+            with transaction.atomic():
+                form.save()
+                HistorialMovimiento.objects.create(
+                    producto=producto,
+                    usuario=request.user,
+                    tipo='EDICION',
+                    cantidad=0 # No changed stock, just details
+                )
             messages.success(request, _('Producto "%(nombre)s" actualizado correctamente.') % {'nombre': producto.nombre})
             return redirect('lista_productos')
     else:
@@ -117,14 +127,15 @@ def editar_producto(request, pk):
 def eliminar_producto(request, pk):
     producto = get_object_or_404(Producto, pk=pk)
     if request.method == 'POST':
-        HistorialMovimiento.objects.create(
-            producto_nombre=producto.nombre,
-            usuario=request.user,
-            tipo='ELIMINACION',
-            cantidad=producto.cantidad
-        )
-        nombre = producto.nombre
-        producto.delete()
+        with transaction.atomic():
+            HistorialMovimiento.objects.create(
+                producto_nombre=producto.nombre,
+                usuario=request.user,
+                tipo='ELIMINACION',
+                cantidad=producto.cantidad
+            )
+            nombre = producto.nombre
+            producto.delete()
         messages.success(request, _('Producto "%(nombre)s" eliminado correctamente.') % {'nombre': nombre})
         return redirect('lista_productos')
     return render(request, 'core/confirmar_eliminar.html', {'producto': producto})
@@ -136,26 +147,24 @@ def registrar_movimiento(request, pk):
     if request.method == 'POST':
         form = MovimientoForm(request.POST)
         if form.is_valid():
-            movimiento = form.save(commit=False)
-            movimiento.producto = producto
-            movimiento.usuario = request.user
-            
-            tipo = movimiento.tipo
-            cantidad = movimiento.cantidad
-            
+            tipo = form.cleaned_data['tipo']
+            cantidad = form.cleaned_data['cantidad']
+
+            try:
+                registrar_movimiento_stock(producto.pk, tipo, cantidad, request.user)
+            except StockInsuficiente:
+                form.add_error('cantidad', _('No hay suficiente stock.'))
+                return render(request, 'core/form_movimiento.html', {'form': form, 'producto': producto})
+            except ValueError as e:
+                form.add_error(None, str(e))
+                return render(request, 'core/form_movimiento.html', {'form': form, 'producto': producto})
+            except Producto.DoesNotExist:
+                raise Http404
+
             if tipo == 'ENTRADA':
-                producto.cantidad += cantidad
                 messages.success(request, _('Entrada de %(cantidad)s unidades registrada.') % {'cantidad': cantidad})
-            elif tipo == 'SALIDA':
-                if producto.cantidad >= cantidad:
-                    producto.cantidad -= cantidad
-                    messages.success(request, _('Salida de %(cantidad)s unidades registrada.') % {'cantidad': cantidad})
-                else:
-                    form.add_error('cantidad', _('No hay suficiente stock.'))
-                    return render(request, 'core/form_movimiento.html', {'form': form, 'producto': producto})
-            
-            producto.save()
-            movimiento.save()
+            else:
+                messages.success(request, _('Salida de %(cantidad)s unidades registrada.') % {'cantidad': cantidad})
             return redirect('lista_productos')
     else:
         form = MovimientoForm()
@@ -168,7 +177,6 @@ from django.views.decorators.http import require_POST
 @login_required
 @require_POST
 def api_registrar_movimiento(request, pk):
-    producto = get_object_or_404(Producto, pk=pk)
     try:
         data = json.loads(request.body)
         tipo = data.get('tipo')
@@ -178,36 +186,27 @@ def api_registrar_movimiento(request, pk):
             return JsonResponse({'success': False, 'error': _('La cantidad debe ser mayor a 0.')})
 
         if tipo == 'ENTRADA':
-            producto.cantidad += cantidad
             action_msg = f'Entrada de {cantidad}'
         elif tipo == 'SALIDA':
-            if producto.cantidad >= cantidad:
-                producto.cantidad -= cantidad
-                action_msg = f'Salida de {cantidad}'
-            else:
-                return JsonResponse({'success': False, 'error': _('Stock insuficiente.')})
+            action_msg = f'Salida de {cantidad}'
         else:
             return JsonResponse({'success': False, 'error': _('Tipo de movimiento inválido.')})
 
-        producto.save()
-        
-        # Guardar historial
-        HistorialMovimiento.objects.create(
-            producto=producto,
-            usuario=request.user,
-            tipo=tipo,
-            cantidad=cantidad
-        )
+        # Un UPDATE condicional + historial en una transacción (ver registrar_movimiento_stock)
+        try:
+            nuevo_stock = registrar_movimiento_stock(pk, tipo, cantidad, request.user)
+        except StockInsuficiente:
+            return JsonResponse({'success': False, 'error': _('Stock insuficiente.')})
+        except Producto.DoesNotExist:
+            return JsonResponse({'success': False, 'error': _('Producto no encontrado.')}, status=404)
         
-        # Recalcular valor total del inventario para devolverlo
-        total_valor = Producto.objects.aggregate(
-            valor=Sum(F('precio') * F('cantidad'), output_field=models.DecimalField())
-        )['valor'] or 0
+        # Valor total del inventario para devolverlo (del resumen, sin recorrer productos)
+        total_valor = ResumenCategoria.totales()['valor']
 
         return JsonResponse({
             'success': True, 
             'message': f'{action_msg} registrada correctamente.',
-            'new_stock': producto.cantidad,
+            'new_stock': nuevo_stock,
             'total_valor': float(total_valor) # Convert to float for JSON
         })
         
@@ -253,8 +252,9 @@ from django.contrib.auth.forms import UserCreationForm
 @login_required
 @permission_required('auth.view_user', raise_exception=True)
 def lista_usuarios(request):
-    usuarios = User.objects.all().order_by('date_joined')
-    return render(request, 'core/lista_usuarios.html', {'usuarios': usuarios})
+    # Por id (orden de alta): auth_user no tiene índice sobre date_joined y ordenar por él recorre la tabla
+    pagina = paginar(request, User.objects.all(), ('id',))
+    return render(request, 'core/lista_usuarios.html', {'usuarios': pagina, 'pagina': pagina})
 
 @login_required
 @permission_required('auth.add_user', raise_exception=True)
@@ -332,8 +332,8 @@ def audit_logs(request):
         messages.error(request, 'Acceso denegado. Solo administradores pueden ver los registros de auditoría.')
         return redirect('dashboard')
     
-    logs = UserAudit.objects.all().order_by('-timestamp')[:100] # Limit to 100 for perf
-    return render(request, 'core/admin_audit.html', {'logs': logs})
+    pagina = paginar(request, UserAudit.objects.all(), ('-timestamp', '-id'))
+    return render(request, 'core/admin_audit.html', {'logs': pagina, 'pagina': pagina})
 
 @login_required
 def admin_backup(request):
@@ -546,11 +546,10 @@ def api_chat(request):
         client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
         
         # 1. Gather Real-Time Data
-        total_productos = Producto.objects.aggregate(total=Sum('cantidad'))['total'] or 0
-        bajos_stock = Producto.objects.filter(cantidad__lt=5).count()
-        valor_inventario = Producto.objects.aggregate(
-            valor=Sum(F('precio') * F('cantidad'), output_field=models.DecimalField())
-        )['valor'] or 0
+        resumen = ResumenCategoria.totales()
+        total_productos = resumen['unidades']
+        bajos_stock = resumen['bajo_stock']
+        valor_inventario = resumen['valor']
 
         # 2. Define User Role and Capabilities
         user_role = "Administrador" if request.user.is_superuser else "Miembro del Staff"
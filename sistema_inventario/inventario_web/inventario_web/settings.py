@@ -148,3 +148,11 @@ DATABASES = {
         conn_max_age=600
     )
 }
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # Las pruebas usan una base en archivo: en memoria cada conexión tendría
+    # su propia base y no se podrían probar las escrituras simultáneas
+    # (core.tests.MovimientosConcurrentesTest). Con timeout, una escritura
+    # espera a la otra en vez de fallar con "database is locked".
+    DATABASES['default'].setdefault('OPTIONS', {})['timeout'] = 20
+    DATABASES['default']['TEST'] = {'NAME': str(BASE_DIR / 'test_db.sqlite3')}